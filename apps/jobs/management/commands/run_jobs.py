@@ -0,0 +1,54 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.jobs.manager.job_manager import JobService
+
+
+class Command(BaseCommand):
+    """
+    Run the background job workers
+
+        python manage.py run_jobs
+        python manage.py run_jobs --processes 4
+        python manage.py run_jobs --burst
+
+    Workers poll the jobs table (JOB_QUEUE_BACKEND=database, no Redis needed) or block on the
+    Redis queue (JOB_QUEUE_BACKEND=redis). Start as many of them, on as many hosts, as needed:
+    a job is only ever claimed by one of them.
+    """
+    help = 'Run background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='worker processes to fork')
+        parser.add_argument('--burst', action='store_true', help='exit once no job is due instead of waiting')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='seconds between two looks at the queue when idle (default JOB_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            done = JobService.work(burst=options['burst'], poll_interval=options['poll_interval'])
+            self.stdout.write(f'{done} jobs run')
+            return
+
+        # forked children must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=JobService.work, args=(options['burst'], options['poll_interval']), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'{len(workers)} workers started')
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers:
+                worker.join()
+        self.stdout.write('workers stopped')
@@ -0,0 +1,216 @@
+import logging
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.jobs.models import Job
+from apps.utils.db_router import read_from_primary
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReused(Exception):
+    """
+    Raised when an idempotency key already queued a job with a different payload
+    """
+
+    def __init__(self, job):
+        super().__init__(f'Idempotency key already used by job {job.pk}')
+        self.job = job
+
+
+class JobService:
+    """
+    This class is responsible to queue background jobs and to run them in the workers
+
+    The jobs table is the queue and the source of truth: a worker claims a due job with a conditional
+    `UPDATE ... WHERE status = <read status> AND locked_at = <read lock>`, so two workers never run
+    the same attempt, on any database. With JOB_QUEUE_BACKEND=redis, queued job ids are also pushed
+    to a Redis list the idle workers block on, so they start at once instead of at the next poll.
+
+    Jobs run at least once: a worker dying mid-job leaves it running until JOB_LOCK_TIMEOUT, then it
+    is run again. Handlers should be safe to repeat, e.g. by doing all their writes in one transaction.
+    """
+    DATABASE = 'database'
+    REDIS = 'redis'
+    REDIS_QUEUE_KEY = 'jobs:queue'
+
+    # due jobs read per claim attempt, the next ones are tried when another worker wins the first
+    CLAIM_CANDIDATES = 10
+
+    _handlers = {}
+    _redis = None
+
+    @classmethod
+    def register(cls, name):
+        """
+        Decorator registering a job handler, a function taking the JSON payload and returning a JSON result
+        """
+        def decorator(handler):
+            cls._handlers[name] = handler
+            return handler
+        return decorator
+
+    @classmethod
+    def enqueue(cls, name, payload=None, idempotency_key=None, max_attempts=None, owner_id=None):
+        """
+        Queue a job
+        :param name: registered handler name
+        :param payload: JSON-serializable handler argument
+        :param idempotency_key: client key, queuing the same job again returns the first one (optional)
+            keys are scoped to the owner, the same key of two users queues two jobs
+        :param max_attempts: attempts before the job fails (default settings.JOB_MAX_ATTEMPTS)
+        :param owner_id: id of the user queuing the job, who can follow it (optional)
+        raise IdempotencyKeyReused when the key was used for another payload
+        return (job, created)
+        """
+        if name not in cls._handlers:
+            raise ValueError(f'No handler registered for job {name}')
+        payload = payload or {}
+        if idempotency_key:
+            job = Job.objects.filter(owner_id=owner_id, name=name, idempotency_key=idempotency_key).first()
+            if job is not None:
+                return cls._check_same_payload(job, payload), False
+
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(
+                    name=name, owner_id=owner_id, payload=payload, idempotency_key=idempotency_key or None,
+                    max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+                )
+        except IntegrityError:
+            # the same key was queued concurrently
+            job = Job.objects.get(owner_id=owner_id, name=name, idempotency_key=idempotency_key)
+            return cls._check_same_payload(job, payload), False
+
+        if settings.JOB_QUEUE_BACKEND == cls.REDIS:
+            transaction.on_commit(lambda: cls._get_redis().lpush(cls.REDIS_QUEUE_KEY, str(job.pk)))
+        return job, True
+
+    @classmethod
+    def _check_same_payload(cls, job, payload):
+        if job.payload != payload:
+            raise IdempotencyKeyReused(job)
+        return job
+
+    @classmethod
+    def _get_redis(cls):
+        if cls._redis is None:
+            import redis
+            cls._redis = redis.Redis.from_url(settings.REDIS_URL)
+        return cls._redis
+
+    @classmethod
+    def _claim(cls, pk, status, locked_at, now):
+        """
+        Take a job for a new attempt, unless another worker took it since it was read
+        return the claimed job or None
+        """
+        claimed = Job.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+            status=Job.JobStatus.RUNNING, locked_at=now, attempts=F('attempts') + 1, updated_at=now
+        )
+        return Job.objects.get(pk=pk) if claimed else None
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Claim the oldest due job: queued and due, or running past JOB_LOCK_TIMEOUT (its worker died)
+        return the claimed job or None when there is nothing to run
+        """
+        now = timezone.now()
+        lost = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+        candidates = Job.objects.filter(
+            Q(status=Job.JobStatus.QUEUED, run_at__lte=now) | Q(status=Job.JobStatus.RUNNING, locked_at__lt=lost)
+        ).order_by('run_at').values_list('pk', 'status', 'locked_at')[:cls.CLAIM_CANDIDATES]
+        for pk, status, locked_at in candidates:
+            job = cls._claim(pk, status, locked_at, now)
+            if job is not None:
+                return job
+        return None
+
+    @classmethod
+    def claim(cls, pk):
+        """
+        Claim a given job if it is queued and due
+        """
+        now = timezone.now()
+        job = Job.objects.filter(pk=pk, status=Job.JobStatus.QUEUED, run_at__lte=now).only('locked_at').first()
+        if job is None:
+            return None
+        return cls._claim(pk, Job.JobStatus.QUEUED, job.locked_at, now)
+
+    @classmethod
+    def run(cls, job):
+        """
+        Run one claimed attempt of a job and record its outcome
+        A failed attempt is retried after JOB_RETRY_BACKOFF * 2^(attempt - 1) seconds, up to max_attempts
+        """
+        handler = cls._handlers.get(job.name)
+        try:
+            if handler is None:
+                raise LookupError(f'No handler registered for job {job.name}')
+            # a job validates and writes what its request queued moments ago, replicas may not have it yet
+            with read_from_primary():
+                result = handler(job.payload)
+        except Exception as error:
+            cls._record_failure(job, error)
+            return False
+
+        # a job taken over after a lock timeout belongs to the other worker now
+        Job.objects.filter(pk=job.pk, locked_at=job.locked_at).update(
+            status=Job.JobStatus.SUCCEEDED, result=result, error='', finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        return True
+
+    @classmethod
+    def _record_failure(cls, job, error):
+        """
+        Schedule the retry of a failed attempt, or fail the job after its last attempt
+        The traceback goes to the logs, the job only keeps the error message shown by the status endpoint
+        """
+        now = timezone.now()
+        updates = {'error': f'{type(error).__name__}: {error}', 'locked_at': None, 'updated_at': now}
+        if job.attempts >= job.max_attempts:
+            logger.error(f'Job {job.name} {job.pk} failed after {job.attempts} attempts', exc_info=error)
+            updates.update(status=Job.JobStatus.FAILED, finished_at=now)
+        else:
+            delay = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            logger.warning(f'Job {job.name} {job.pk} attempt {job.attempts} failed, retry in {delay}s', exc_info=error)
+            updates.update(status=Job.JobStatus.QUEUED, run_at=now + timedelta(seconds=delay))
+        Job.objects.filter(pk=job.pk, locked_at=job.locked_at).update(**updates)
+
+    @classmethod
+    def work(cls, burst=False, poll_interval=None, max_jobs=None):
+        """
+        Worker loop: claim and run jobs until stopped
+        :param burst: return as soon as no job is due, instead of waiting for new ones
+        :param poll_interval: seconds between two looks at the queue when idle (default settings.JOB_POLL_INTERVAL)
+        :param max_jobs: return after running this many jobs (optional)
+        return number of jobs run
+        """
+        poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        use_redis = settings.JOB_QUEUE_BACKEND == cls.REDIS
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            # a worker lives for long, never keep a broken or expired connection across jobs
+            close_old_connections()
+            job = cls.claim_next()
+            if job is None and burst:
+                return done
+            if job is None:
+                if use_redis:
+                    # retries coming due are found by claim_next() once the wait times out
+                    item = cls._get_redis().brpop(cls.REDIS_QUEUE_KEY, timeout=max(1, math.ceil(poll_interval)))
+                    job = cls.claim(item[1].decode()) if item else None
+                else:
+                    time.sleep(poll_interval)
+            if job is not None:
+                cls.run(job)
+                done += 1
+        return done
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='job',
+            name='jobs_job_name_idempotency_key_uniq',
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(fields=('owner', 'name', 'idempotency_key'), name='jobs_job_owner_name_idempotency_key_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('name', 'idempotency_key'), name='jobs_job_name_idempotency_key_ownerless_uniq'),
+        ),
+    ]
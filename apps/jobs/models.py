@@ -0,0 +1,63 @@
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from apps.users.models import User
+from apps.utils.models import TimestampedModel
+
+
+class Job(TimestampedModel):
+    """
+    A unit of background work, queued by the API and run by the `run_jobs` workers
+    The table is the queue: workers claim due rows with a conditional UPDATE
+    """
+
+    class JobStatus(models.TextChoices):
+        QUEUED = 'queued', _('Queued')
+        RUNNING = 'running', _('Running')
+        SUCCEEDED = 'succeeded', _('Succeeded')
+        FAILED = 'failed', _('Failed')
+
+    # not guessable, the status URL of a job does not reveal the number of jobs
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(_('handler name'), max_length=100)
+    # user who queued the job through the API, the only one who can see it; none for jobs queued by the code
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name='jobs')
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # not run before, pushed back after a failed attempt
+    run_at = models.DateTimeField(default=timezone.now)
+    # when the current attempt started, a job running for too long is considered lost and claimed again
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # handler return value, serializer output with dates and decimals
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            # idempotency keys are chosen by the clients, so they are unique per owner
+            # nulls are distinct: jobs without a key never collide, and ownerless jobs get their own constraint
+            models.UniqueConstraint(
+                fields=['owner', 'name', 'idempotency_key'], name='jobs_job_owner_name_idempotency_key_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['name', 'idempotency_key'], condition=models.Q(owner__isnull=True),
+                name='jobs_job_name_idempotency_key_ownerless_uniq'
+            ),
+        ]
+        indexes = [
+            # due jobs, oldest first
+            models.Index(fields=['status', 'run_at'], name='jobs_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.id} ({self.status})'
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from apps.jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    this serializer class is used to show the status of a background job
+    """
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'result', 'error',
+            'created_at', 'updated_at',
+        )
@@ -0,0 +1,177 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.jobs.manager.job_manager import IdempotencyKeyReused, JobService
+from apps.jobs.models import Job
+from apps.tasks.models import Task, TaskAssignment
+from apps.utils.testing import APITestCase, create_test_user
+
+
+@JobService.register('tests.flaky')
+def flaky(payload):
+    """
+    Fails until the given attempt number
+    """
+    job = Job.objects.get(name='tests.flaky', status=Job.JobStatus.RUNNING)
+    if job.attempts < payload['succeed_at']:
+        raise RuntimeError(f'attempt {job.attempts} failed')
+    return {'attempts': job.attempts}
+
+
+class AsyncTaskEndpointTest(APITestCase):
+    """
+    Create and assign endpoints queue a job with `Prefer: respond-async`, run later by a worker
+    """
+    TASK_URL = '/api/v1/task/'
+    ASSIGN_URL = '/api/v1/task/assign-task/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = create_test_user('other')
+
+    def _post_async(self, url, data, **headers):
+        return self.client.post(url, data, format='json', HTTP_PREFER='respond-async', **headers)
+
+    def test_create_returns_202_and_worker_creates_the_task(self):
+        response = self._post_async(
+            self.TASK_URL, {'name': 'async task', 'priority': 3, 'assigned_users': [self.user.id]}
+        )
+
+        self.assertEqual(response.status_code, 202)
+        body = response.data
+        self.assertEqual(body['data']['status'], Job.JobStatus.QUEUED)
+        self.assertEqual(response['Location'], body['data']['status_url'])
+        self.assertFalse(Task.objects.filter(name='async task').exists())
+
+        self.assertEqual(JobService.work(burst=True), 1)
+
+        task = Task.objects.get(name='async task')
+        self.assertEqual(task.priority, 3)
+        self.assertTrue(TaskAssignment.objects.filter(task=task, user=self.user).exists())
+        status_response = self.client.get(body['data']['status_url'])
+        job = status_response.data['data']
+        self.assertEqual(job['status'], Job.JobStatus.SUCCEEDED)
+        self.assertEqual(job['attempts'], 1)
+        self.assertEqual(job['result']['id'], task.id)
+
+    def test_assign_runs_in_a_job(self):
+        task = Task.objects.create(name='task')
+        response = self._post_async(self.ASSIGN_URL, {'task': task.id, 'assigned_users': [self.user.id]})
+        self.assertEqual(response.status_code, 202)
+
+        JobService.work(burst=True)
+
+        job = Job.objects.get(pk=response.data['data']['job'])
+        self.assertEqual(job.status, Job.JobStatus.SUCCEEDED)
+        self.assertEqual(job.result['assignment_results'], {str(self.user.id): 'assigned'})
+        self.assertTrue(TaskAssignment.objects.filter(task=task, user=self.user).exists())
+
+    def test_invalid_request_is_rejected_before_queuing(self):
+        response = self._post_async(self.ASSIGN_URL, {'task': 0, 'assigned_users': [self.user.id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+    def test_without_prefer_header_the_request_runs_synchronously(self):
+        response = self.client.post(self.TASK_URL, {'name': 'sync task', 'priority': 1}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.get(name='sync task').priority, 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_idempotency_key_queues_the_work_once(self):
+        data = {'name': 'once', 'assigned_users': [self.user.id]}
+        first = self._post_async(self.TASK_URL, data, HTTP_IDEMPOTENCY_KEY='create-once')
+        retry = self._post_async(self.TASK_URL, data, HTTP_IDEMPOTENCY_KEY='create-once')
+
+        self.assertEqual(first.data['data']['job'], retry.data['data']['job'])
+        self.assertEqual(Job.objects.count(), 1)
+        JobService.work(burst=True)
+        self.assertEqual(Task.objects.filter(name='once').count(), 1)
+
+        reused = self._post_async(self.TASK_URL, {'name': 'other'}, HTTP_IDEMPOTENCY_KEY='create-once')
+        self.assertEqual(reused.status_code, 409)
+
+    def test_jobs_belong_to_their_owner(self):
+        data = {'name': 'mine', 'assigned_users': [self.user.id]}
+        first = self._post_async(self.TASK_URL, data, HTTP_IDEMPOTENCY_KEY='shared-key')
+        job = Job.objects.get(pk=first.data['data']['job'])
+        self.assertEqual(job.owner_id, self.user.id)
+
+        other_client = self.client_for(self.other_user)
+        self.assertEqual(other_client.get(first.data['data']['status_url']).status_code, 404)
+        # the key of another user is not reused, nor reported as a conflict
+        other = other_client.post(
+            self.TASK_URL, data, format='json', HTTP_PREFER='respond-async', HTTP_IDEMPOTENCY_KEY='shared-key'
+        )
+        self.assertEqual(other.status_code, 202)
+        self.assertNotEqual(other.data['data']['job'], first.data['data']['job'])
+        self.assertEqual(self.client.get(first.data['data']['status_url']).status_code, 200)
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get('/api/v1/jobs/0b2c9a4e-52d1-4a7e-9b61-0f7c1ad0c1b3/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/jobs/not-a-uuid/').status_code, 404)
+
+
+@override_settings(JOB_RETRY_BACKOFF=60, JOB_LOCK_TIMEOUT=300)
+class JobServiceTest(TestCase):
+    """
+    Claims, retries with backoff, failures and lost workers
+    """
+
+    def _make_due(self, job):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+    def test_failed_attempt_is_retried_after_a_backoff(self):
+        job, created = JobService.enqueue('tests.flaky', {'succeed_at': 2})
+        self.assertTrue(created)
+
+        self.assertEqual(JobService.work(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.JobStatus.QUEUED)
+        self.assertEqual(job.error, 'RuntimeError: attempt 1 failed')
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        # not due yet
+        self.assertEqual(JobService.work(burst=True), 0)
+
+        self._make_due(job)
+        JobService.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {'attempts': 2})
+        self.assertEqual(job.error, '')
+
+    def test_job_fails_after_max_attempts(self):
+        job, _ = JobService.enqueue('tests.flaky', {'succeed_at': 10}, max_attempts=2)
+        JobService.work(burst=True)
+        self._make_due(job)
+        JobService.work(burst=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.JobStatus.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_a_job_is_claimed_once(self):
+        JobService.enqueue('tests.flaky', {'succeed_at': 1})
+        self.assertIsNotNone(JobService.claim_next())
+        self.assertIsNone(JobService.claim_next())
+
+    def test_job_of_a_dead_worker_is_claimed_again(self):
+        job, _ = JobService.enqueue('tests.flaky', {'succeed_at': 1})
+        claimed = JobService.claim_next()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+
+        reclaimed = JobService.claim_next()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        # the first worker's late result is dropped, the job belongs to the second one
+        self.assertTrue(JobService.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.JobStatus.RUNNING)
+
+    def test_idempotency_key_with_another_payload(self):
+        JobService.enqueue('tests.flaky', {'succeed_at': 1}, idempotency_key='key')
+        with self.assertRaises(IdempotencyKeyReused):
+            JobService.enqueue('tests.flaky', {'succeed_at': 2}, idempotency_key='key')
@@ -0,0 +1,18 @@
+"""
+This file is used for urls or creating endpoint for API'S
+"""
+# Third party imports
+from django.urls import path, include
+from rest_framework import routers
+
+from apps.jobs.views import JobViewSet
+
+# Local imports
+
+router = routers.DefaultRouter()
+
+router.register('jobs', JobViewSet, basename='jobs')
+
+urlpatterns = [
+    path(r'', include(router.urls)),
+]
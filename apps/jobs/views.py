@@ -0,0 +1,70 @@
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.viewsets import GenericViewSet
+
+from apps.jobs.manager.job_manager import IdempotencyKeyReused, JobService
+from apps.jobs.models import Job
+from apps.jobs.serializer import JobSerializer
+from apps.utils.messages import CustomError
+from apps.utils.utils import CustomAPIResponseMixin
+
+
+class AsyncJobMixin:
+    """
+    Mixin letting a write endpoint run in the background
+
+    A client sending `Prefer: respond-async` gets a 202 with the job id and its status URL instead of
+    waiting for the work. An `Idempotency-Key` header makes retries of the same request return the
+    first job instead of queuing the work twice.
+    """
+    RESPOND_ASYNC = 'respond-async'
+
+    def wants_async(self, request):
+        """
+        Prefer header (RFC 7240), e.g. `Prefer: respond-async, wait=10`
+        """
+        preferences = request.headers.get('Prefer', '').split(',')
+        return any(preference.split(';')[0].strip() == self.RESPOND_ASYNC for preference in preferences)
+
+    def enqueue_response(self, request, name, payload):
+        """
+        Queue the job of the user and return the 202 response pointing at its status endpoint
+        """
+        try:
+            job, _ = JobService.enqueue(
+                name, payload, idempotency_key=request.headers.get('Idempotency-Key'), owner_id=request.user.id
+            )
+        except IdempotencyKeyReused as error:
+            return self.failure_response(
+                status_code=status.HTTP_409_CONFLICT, data={'job': str(error.job.pk)},
+                message=CustomError.get_error_message('IDEMPOTENCY_KEY_REUSED')
+            )
+        status_url = reverse('jobs-detail', args=[job.pk])
+        response = self.accepted_response(data={'job': str(job.pk), 'status': job.status, 'status_url': status_url})
+        response['Location'] = status_url
+        return response
+
+
+class JobViewSet(CustomAPIResponseMixin, GenericViewSet):
+    """
+    this class is used to follow the background jobs queued by the API, users only see their own jobs
+    """
+    http_method_names = ('get',)
+    permission_classes = (IsAuthenticated,)
+    serializer_class = JobSerializer
+    queryset = Job.objects.all()
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            job = Job.objects.filter(pk=kwargs['pk'], owner_id=request.user.id).first()
+        except ValidationError:
+            # not a UUID
+            job = None
+        if job is None:
+            return self.failure_response(
+                status_code=status.HTTP_404_NOT_FOUND, data=CustomError.get_error_message('JOB_NOT_FOUND')
+            )
+        return self.success_response(status_code=status.HTTP_200_OK, data=self.serializer_class(job).data)
+
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tasks'
+
+    def ready(self):
+        # register the background job handlers
+        from apps.tasks import jobs  # noqa: F401
+
+        from apps.tasks.manager.search_manager import TaskSearchService
+        # a later migration altering tasks_task on SQLite drops the search triggers
+        post_migrate.connect(TaskSearchService.repair_triggers, sender=self, dispatch_uid='task_search_repair_triggers')
@@ -0,0 +1,98 @@
+"""
+Async (ASGI-native) read path for tasks
+
+These views use the async ORM end to end, so under an ASGI server (uvicorn) a request waiting on a
+slow client or on the database does not hold a worker thread. They return the same body as the DRF
+views in apps/tasks/views.py. Under a WSGI server they still work, Django runs them in an event loop.
+"""
+from django.http import HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.tasks.manager.task_manager import TaskService
+from apps.tasks.models import Task
+from apps.tasks.serializer import FastGetTaskSerializer, UserTaskFilterSerializer
+from apps.users.authentication import CachedJWTAuthentication, get_user_id
+from apps.utils.messages import CustomError
+from apps.utils.pagination import InvalidCursor
+from apps.utils.utils import CustomAPIResponseMixin, RenderedJsonResponse
+
+authentication = CachedJWTAuthentication()
+
+
+def _exception_response(error):
+    """
+    Same response as DRF's exception handler for the authentication and permission errors
+    """
+    response = RenderedJsonResponse({'detail': error.detail}, status=error.status_code)
+    if error.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = authentication.authenticate_header(None)
+    return response
+
+
+async def get_user_task(request):
+    """
+    Async counterpart of TaskViewSet.get_user_task
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        user_id = get_user_id(await authentication.aauthenticate(request), request.GET.get('user'))
+    except APIException as error:
+        return _exception_response(error)
+    filter_serializer = UserTaskFilterSerializer(data=request.GET)
+    if not filter_serializer.is_valid():
+        return CustomAPIResponseMixin.json_failure_response(
+            status_code=status.HTTP_400_BAD_REQUEST, data=filter_serializer.errors
+        )
+    filters = filter_serializer.validated_data
+    counts_by_status = filters.pop('counts_by_status')
+
+    if counts_by_status:
+        counts = await TaskService.acount_user_tasks_by_status(user_id, **filters)
+        return CustomAPIResponseMixin.json_success_response(status_code=status.HTTP_200_OK, data=counts)
+
+    try:
+        tasks, cursors = await TaskService.aget_user_task_page(
+            user_id,
+            cursor=request.GET.get('cursor'),
+            page_size=request.GET.get('page_size'),
+            **filters
+        )
+    except InvalidCursor:
+        return CustomAPIResponseMixin.json_failure_response(
+            status_code=status.HTTP_400_BAD_REQUEST, data=CustomError.get_error_message('INVALID_CURSOR')
+        )
+    except ValueError:
+        return CustomAPIResponseMixin.json_failure_response(
+            status_code=status.HTTP_400_BAD_REQUEST, data=CustomError.get_error_message('INVALID_PAGE_SIZE')
+        )
+    # every relation the serializer reads was attached by TaskService, so this runs no query
+    data = FastGetTaskSerializer.many(tasks, context={'user_id': user_id})
+    return CustomAPIResponseMixin.json_success_response(status_code=status.HTTP_200_OK, data=data, cursors=cursors)
+
+
+async def get_task(request, pk):
+    """
+    Retrieve a single task, with the assignment of the authenticated user when `?user=<own id>` is given
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        user = await authentication.aauthenticate(request)
+        user_id = request.GET.get('user', None)
+        if user_id is not None:
+            user_id = get_user_id(user, user_id)
+    except APIException as error:
+        return _exception_response(error)
+
+    try:
+        task = await TaskService.aget_task(pk, user=user_id)
+    except Task.DoesNotExist:
+        return CustomAPIResponseMixin.json_failure_response(
+            status_code=status.HTTP_404_NOT_FOUND, data=CustomError.get_error_message('TASK_NOT_FOUND')
+        )
+    data = FastGetTaskSerializer.to_representation(task, context={'user_id': user_id})
+    return CustomAPIResponseMixin.json_success_response(status_code=status.HTTP_200_OK, data=data)
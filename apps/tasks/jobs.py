@@ -0,0 +1,33 @@
+"""
+Background jobs of the task endpoints, registered with JobService when the app is ready
+
+They run the same serializers as the synchronous endpoints, so a job validates its payload again
+(a user may have been deleted since it was queued) and its result is the synchronous response data.
+"""
+from apps.jobs.manager.job_manager import JobService
+from apps.tasks.serializer import AssignTaskSerializer, GetTaskSerializer, TaskSerializer
+
+CREATE_TASK = 'tasks.create_task'
+ASSIGN_TASK = 'tasks.assign_task'
+
+
+@JobService.register(CREATE_TASK)
+def create_task(payload):
+    """
+    :param payload: {"name", "description", "priority", "assigned_users": [user ids]}
+    """
+    serializer = TaskSerializer(data=payload)
+    serializer.is_valid(raise_exception=True)
+    return GetTaskSerializer(serializer.save()).data
+
+
+@JobService.register(ASSIGN_TASK)
+def assign_task(payload):
+    """
+    :param payload: {"task": task id, "assigned_users": [user ids]}
+    """
+    serializer = AssignTaskSerializer(data=payload)
+    serializer.is_valid(raise_exception=True)
+    data = TaskSerializer(serializer.save()).data
+    data['assignment_results'] = serializer.assignment_results
+    return data
@@ -0,0 +1,103 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from apps.tasks.manager.search_manager import TaskSearchService
+from apps.tasks.models import Task
+
+
+class Command(BaseCommand):
+    """
+    Compare the `icontains` scan with the full-text search on a table seeded with many tasks
+
+        python manage.py benchmark_task_search --seed 100000
+        python manage.py benchmark_task_search --seed 900000 --queries 500
+        python manage.py benchmark_task_search --cleanup
+
+    Seeded tasks are named after BENCH_PREFIX. Point it at a scratch database, not production.
+    """
+    help = 'Benchmark task search latency on a seeded tasks table'
+
+    BENCH_PREFIX = 'searchbench'
+    SEED_BATCH_SIZE = 10000
+    # made-up words, so a query matches a realistic fraction of the table instead of most of it
+    WORDS = tuple(
+        ''.join(random.Random(index).choices(string.ascii_lowercase, k=7)) for index in range(5000)
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='number of tasks to seed first')
+        parser.add_argument('--queries', type=int, default=200, help='queries per strategy')
+        parser.add_argument('--cleanup', action='store_true', help='delete the seeded tasks and exit')
+
+    def handle(self, *args, **options):
+        seeded = Task.objects.filter(name__startswith=self.BENCH_PREFIX)
+        if options['cleanup']:
+            deleted, _ = seeded.delete()
+            self.stdout.write(f'{deleted} rows deleted')
+            return
+
+        if options['seed']:
+            self._seed(options['seed'])
+        total = Task.objects.count()
+        if not seeded.exists():
+            self.stdout.write(self.style.ERROR('No seeded tasks, run with --seed first'))
+            return
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Task._meta.db_table}')
+
+        # one full word and one partially typed word, as sent by a search box
+        queries = [
+            f'{random.choice(self.WORDS)} {random.choice(self.WORDS)[:4]}' for _ in range(options['queries'])
+        ]
+        strategies = {
+            'icontains': self._icontains,
+            f'full-text ({connection.vendor})': lambda text: TaskSearchService.search(text, limit=50),
+        }
+        self.stdout.write(f'{total} tasks, {options["queries"]} queries per strategy, top 50 results')
+        for name, search in strategies.items():
+            latencies = []
+            for text in queries:
+                started = time.perf_counter()
+                search(text)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            self.stdout.write(
+                f'{name:<24} p50 {self._percentile(latencies, 50):8.2f} ms'
+                f'  p95 {self._percentile(latencies, 95):8.2f} ms'
+                f'  p99 {self._percentile(latencies, 99):8.2f} ms'
+            )
+
+    def _icontains(self, text):
+        """
+        What clients could do before: every word as a substring of the name or description
+        """
+        tasks = Task.objects.all()
+        for term in TaskSearchService.get_terms(text):
+            tasks = tasks.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return list(tasks.order_by('-id')[:50])
+
+    @staticmethod
+    def _percentile(latencies, percentile):
+        return latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)]
+
+    def _seed(self, count):
+        """
+        Insert `count` tasks made of random words
+        """
+        for offset in range(0, count, self.SEED_BATCH_SIZE):
+            size = min(self.SEED_BATCH_SIZE, count - offset)
+            Task.objects.bulk_create(
+                Task(
+                    name=f'{self.BENCH_PREFIX} {" ".join(random.sample(self.WORDS, 3))}',
+                    description=' '.join(random.choices(self.WORDS, k=20)),
+                )
+                for _ in range(size)
+            )
+            self.stdout.write(f'seeded {offset + size}/{count}', ending='\r')
+        self.stdout.write('')
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.tasks.manager.export_manager import TaskExportService
+
+
+class Command(BaseCommand):
+    """
+    Dump every task or task assignment as NDJSON or CSV with constant memory
+
+        python manage.py export_tasks --kind assignments --format csv --output assignments.csv
+        python manage.py export_tasks --after-id 1500000 >> tasks.ndjson
+
+    Rows are written in id order, so an interrupted export is resumed with --after-id <last id written>,
+    which appends to --output (and writes no second CSV header).
+    """
+    help = 'Stream all tasks or task assignments as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=tuple(TaskExportService.EXPORTS), default='tasks')
+        parser.add_argument('--format', dest='file_format', choices=TaskExportService.FORMATS,
+                            default=TaskExportService.NDJSON)
+        parser.add_argument('--after-id', type=int, help='resume after this id')
+        parser.add_argument('--chunk-size', type=int, default=TaskExportService.DEFAULT_CHUNK_SIZE,
+                            help='rows fetched from the database at a time')
+        parser.add_argument('--output', help='file to write, default stdout')
+
+    def handle(self, *args, **options):
+        lines = TaskExportService.export(
+            options['kind'], options['file_format'],
+            after_id=options['after_id'], chunk_size=options['chunk_size']
+        )
+        mode = 'w' if options['after_id'] is None else 'a'
+        output = open(options['output'], mode, newline='') if options['output'] else sys.stdout
+        try:
+            for line in lines:
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,94 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Compare the WSGI and ASGI user task read paths under many concurrent slow clients
+
+    Start both servers first, e.g.
+        python manage.py runserver 127.0.0.1:8000
+        uvicorn task_management.asgi:application --port 8001
+    then
+        python manage.py loadtest_user_task \\
+            --wsgi-url "http://127.0.0.1:8000/api/v1/task/user-task/" \\
+            --asgi-url "http://127.0.0.1:8001/api/v1/task/async/user-task/" \\
+            --token "<access token from POST /api/v1/auth/token/>" \\
+            --concurrency 200 --requests 2000 --client-delay 0.5
+
+    Every client holds its connection open for `--client-delay` seconds before sending the request,
+    like a mobile client on a slow network, which is what ties up threads on a WSGI server.
+    """
+    help = 'Load test the sync (WSGI) and async (ASGI) user task endpoints with concurrent slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help='user task URL served by the WSGI server')
+        parser.add_argument('--asgi-url', help='async user task URL served by the ASGI server')
+        parser.add_argument('--concurrency', type=int, default=100, help='number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=1000, help='total number of requests per URL')
+        parser.add_argument('--client-delay', type=float, default=0.0,
+                            help='seconds each client waits between connecting and sending its request')
+        parser.add_argument('--timeout', type=float, default=30.0, help='per request timeout in seconds')
+        parser.add_argument('--token', required=True, help='JWT access token of the user whose tasks are read')
+
+    def handle(self, *args, **options):
+        targets = [(name, options[f'{name}_url']) for name in ('wsgi', 'asgi') if options[f'{name}_url']]
+        if not targets:
+            raise CommandError('Give at least one of --wsgi-url or --asgi-url')
+
+        for name, url in targets:
+            result = asyncio.run(self._run(url, options))
+            self._report(name, url, result)
+
+    async def _request(self, url, token, client_delay, timeout):
+        """
+        Send one GET over a fresh connection, return (status code, latency) with status 0 on errors
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parts.hostname, parts.port or 80), timeout
+            )
+            await asyncio.sleep(client_delay)
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAuthorization: Bearer {token}\r\n'
+                f'Connection: close\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+            status_code = int(response.split(b' ', 2)[1])
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            status_code = 0
+        return status_code, time.perf_counter() - started
+
+    async def _run(self, url, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def worker():
+            async with semaphore:
+                return await self._request(url, options['token'], options['client_delay'], options['timeout'])
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(worker() for _ in range(options['requests'])))
+        return results, time.perf_counter() - started
+
+    def _report(self, name, url, result):
+        results, elapsed = result
+        latencies = sorted(latency for status_code, latency in results if status_code == 200)
+        errors = len(results) - len(latencies)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name.upper()} {url}'))
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'  all {errors} requests failed'))
+            return
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(f'  requests/sec : {len(latencies) / elapsed:.1f}')
+        self.stdout.write(f'  p50 / p95 / p99 (ms) : {quantiles[49] * 1000:.1f} / '
+                          f'{quantiles[94] * 1000:.1f} / {quantiles[98] * 1000:.1f}')
+        self.stdout.write(f'  errors : {errors}')
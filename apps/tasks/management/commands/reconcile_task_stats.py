@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.tasks.manager.stats_manager import UserTaskStatsService
+
+
+class Command(BaseCommand):
+    """
+    Recompute the UserTaskStats summary rows from the task assignments and fix the ones that drifted
+
+        python manage.py reconcile_task_stats
+        python manage.py reconcile_task_stats --batch-size 5000
+
+    Safe to run while the API is serving, schedule it periodically (e.g. hourly from cron).
+    """
+    help = 'Repair drifted per-user task stats from the task assignments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=UserTaskStatsService.RECONCILE_BATCH_SIZE,
+                            help='users recomputed per GROUP BY query')
+
+    def handle(self, *args, **options):
+        repaired = UserTaskStatsService.reconcile(batch_size=options['batch_size'])
+        self.stdout.write(f'{repaired} user task stats repaired')
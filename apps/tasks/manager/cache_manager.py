@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.utils.db_router import pin_to_primary
+from apps.utils.middleware import record_cache_access
+
+
+class UserTaskCache:
+    """
+    Read-through cache for per-user task listings
+
+    Every user has a version counter; cached entries embed it in their key, so invalidating a
+    user is a single INCR and the stale entries simply expire. Only one worker rebuilds a
+    missing key at a time (stampede protection), the others wait for it to land in the cache.
+    Works with any Django cache backend, Redis in production and locmem in tests.
+    """
+    KEY_PREFIX = 'user_tasks'
+    LOCK_TIMEOUT = 10
+    LOCK_WAIT = 2
+    LOCK_POLL_INTERVAL = 0.05
+
+    # per-process hit/miss counters
+    _stats = Counter()
+    _stats_lock = threading.Lock()
+
+    @classmethod
+    def _version_key(cls, user_id):
+        return f'{cls.KEY_PREFIX}:{user_id}:version'
+
+    @classmethod
+    def _record(cls, outcome):
+        with cls._stats_lock:
+            cls._stats[outcome] += 1
+        record_cache_access(outcome == 'hits')
+
+    @classmethod
+    def stats(cls):
+        """
+        return hit/miss counters of this process
+        """
+        with cls._stats_lock:
+            return {'hits': cls._stats['hits'], 'misses': cls._stats['misses']}
+
+    @classmethod
+    def get_version(cls, user_id):
+        """
+        Current cache version of the user
+        A missing version (never set or evicted) starts from the clock, so entries cached
+        under an older version can never come back to life
+        """
+        version_key = cls._version_key(user_id)
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, time.time_ns(), timeout=None)
+            version = cache.get(version_key)
+        return version
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        """
+        Drop every cached listing of the given users
+        They also read from the primary for a while, so a lagging replica does not cache their listing again
+        from the rows preceding the change
+        """
+        user_ids = set(user_ids)
+        pin_to_primary(user_ids)
+        for user_id in user_ids:
+            try:
+                cache.incr(cls._version_key(user_id))
+            except ValueError:
+                # no version yet, nothing was cached for this user
+                pass
+
+    @classmethod
+    def get_or_build(cls, user_id, key, builder):
+        """
+        Return the cached value for the user, building and caching it on a miss
+        :param user_id: id of the user owning the listing
+        :param key: identifies the listing (page, filters...) within the user's entries
+        :param builder: callable computing the value on a miss
+        """
+        # hashed so cursors and filter values never produce over-long or invalid keys
+        key = hashlib.md5(key.encode()).hexdigest()
+        cache_key = f'{cls.KEY_PREFIX}:{user_id}:{cls.get_version(user_id)}:{key}'
+        value = cache.get(cache_key)
+        if value is not None:
+            cls._record('hits')
+            return value
+
+        cls._record('misses')
+        lock_key = f'{cache_key}:lock'
+        if not cache.add(lock_key, 1, timeout=cls.LOCK_TIMEOUT):
+            # another worker is rebuilding this key, give it a chance to finish
+            deadline = time.monotonic() + cls.LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(cls.LOCK_POLL_INTERVAL)
+                value = cache.get(cache_key)
+                if value is not None:
+                    return value
+            return builder()
+
+        try:
+            value = builder()
+            cache.set(cache_key, value, timeout=settings.USER_TASK_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return value
@@ -0,0 +1,94 @@
+import csv
+import json
+
+from django.db import connection
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.tasks.models import Task, TaskAssignment
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, lets csv.writer produce lines for streaming
+    """
+
+    def write(self, value):
+        return value
+
+
+class TaskExportService:
+    """
+    This class is responsible to export every task or task assignment as NDJSON or CSV
+
+    Rows are read in primary key order with a server-side cursor (or keyset batches when
+    server-side cursors are disabled, e.g. behind PgBouncer), and encoded one by one, so memory
+    stays constant whatever the table size. Since rows come in id order, an interrupted export is
+    resumed by passing the last id received as `after_id`.
+    """
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+    FORMATS = (NDJSON, CSV)
+    CONTENT_TYPES = {NDJSON: 'application/x-ndjson', CSV: 'text/csv'}
+
+    EXPORTS = {
+        'tasks': (Task, ('id', 'name', 'description', 'priority', 'created_at', 'updated_at')),
+        'assignments': (TaskAssignment, (
+            'id', 'task_id', 'user_id', 'assigned_by_id', 'status', 'is_primary_assignee',
+            'completed_at', 'version', 'created_at', 'updated_at',
+        )),
+    }
+
+    DEFAULT_CHUNK_SIZE = 2000
+
+    @classmethod
+    def iter_rows(cls, kind, after_id=None, chunk_size=None):
+        """
+        Yield the rows of an export as dicts, in id order
+        :param kind: one of EXPORTS
+        :param after_id: only rows with a greater id, to resume an interrupted export (optional)
+        :param chunk_size: rows fetched from the database at a time
+        """
+        model, fields = cls.EXPORTS[kind]
+        chunk_size = chunk_size or cls.DEFAULT_CHUNK_SIZE
+        queryset = model.objects.order_by('id').values(*fields)
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+
+        if not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+            yield from queryset.iterator(chunk_size=chunk_size)
+            return
+
+        # without server-side cursors iterator() would load the whole result, page by id instead
+        while True:
+            rows = list(queryset[:chunk_size])
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            queryset = queryset.filter(id__gt=rows[-1]['id'])
+
+    @classmethod
+    def export(cls, kind, file_format, after_id=None, chunk_size=None):
+        """
+        Yield the encoded export line by line
+        :param kind: one of EXPORTS
+        :param file_format: NDJSON or CSV (with a header line, except when resumed: the output is appended
+            to the partial export)
+        :param after_id: resume after this id
+        """
+        rows = cls.iter_rows(kind, after_id=after_id, chunk_size=chunk_size)
+        if file_format == cls.NDJSON:
+            encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+            for row in rows:
+                yield encoder.encode(row) + '\n'
+            return
+
+        _, fields = cls.EXPORTS[kind]
+        # dates are formatted like in the JSON output
+        encoder = JSONEncoder()
+        writer = csv.writer(_Echo())
+        if after_id is None:
+            yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(
+                encoder.default(value) if hasattr(value, 'isoformat') else value for value in row.values()
+            )
@@ -0,0 +1,155 @@
+import logging
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from apps.tasks.manager.task_manager import TaskService
+from apps.tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSearchService:
+    """
+    This class is responsible to search tasks by name and description
+
+    PostgreSQL matches against the GIN-indexed `tasks_task.search_vector` column, SQLite against the
+    `tasks_task_fts` FTS5 table, both kept up to date on write by triggers (see migration 0005_task_search).
+    Every word of the query must match, as a prefix, so partially typed words already find their tasks.
+    Name matches rank above description matches.
+    """
+    # must match the text search configuration used by the trigger
+    POSTGRESQL_CONFIG = 'english'
+    # bm25 weights of the name and description columns
+    SQLITE_WEIGHTS = (10.0, 1.0)
+
+    TERM_RE = re.compile(r'\w+')
+
+    SQLITE_FTS_TABLE = 'tasks_task_fts'
+    # same definitions as migration 0005_task_search, recreated by ensure_sqlite_triggers()
+    SQLITE_TRIGGERS = {
+        'tasks_task_fts_insert': """
+            CREATE TRIGGER tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+                INSERT INTO tasks_task_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END
+        """,
+        'tasks_task_fts_delete': """
+            CREATE TRIGGER tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+                INSERT INTO tasks_task_fts (tasks_task_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        """,
+        'tasks_task_fts_update': """
+            CREATE TRIGGER tasks_task_fts_update AFTER UPDATE OF name, description ON tasks_task BEGIN
+                INSERT INTO tasks_task_fts (tasks_task_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO tasks_task_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+            END
+        """,
+    }
+
+    @classmethod
+    def get_terms(cls, text):
+        """
+        Split the query into words, dropping the operators of the underlying search syntaxes
+        """
+        return cls.TERM_RE.findall(text.lower())
+
+    @classmethod
+    def search(cls, text, user=None, limit=None):
+        """
+        Best matching tasks first
+        :param text: words to look for
+        :param user: only tasks assigned to this user, instance or id (optional)
+        :param limit: max number of tasks (default settings.DEFAULT_PAGE_SIZE, capped by settings.MAX_PAGE_SIZE)
+        return list of tasks, empty when the text has no word
+        """
+        limit = min(int(limit or settings.DEFAULT_PAGE_SIZE), settings.MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be a positive integer')
+        terms = cls.get_terms(text)
+        if not terms:
+            return []
+
+        # scoped searches reuse the user task listing, with the user's assignment prefetched
+        tasks = Task.objects.all() if user is None else TaskService.get_user_tasks(user)
+
+        if connection.vendor == 'postgresql':
+            tasks = cls._postgresql_search(tasks, terms)
+        elif connection.vendor == 'sqlite':
+            tasks = cls._sqlite_search(tasks, terms)
+        else:
+            # no full-text support, plain (scanning) substring match
+            for term in terms:
+                tasks = tasks.filter(Q(name__icontains=term) | Q(description__icontains=term))
+            return list(tasks.order_by('-id')[:limit])
+        return list(tasks.order_by('-rank', '-id')[:limit])
+
+    @classmethod
+    def ensure_sqlite_triggers(cls, using=DEFAULT_DB_ALIAS):
+        """
+        Recreate the FTS triggers of a SQLite database that lost them, SQLite drops the triggers of a table
+        it rebuilds on an ALTER (PostgreSQL keeps them). The index is rebuilt when one was missing, since
+        the writes made without it were not indexed.
+        return names of the recreated triggers
+        """
+        db = connections[using]
+        if db.vendor != 'sqlite':
+            return []
+        names = (cls.SQLITE_FTS_TABLE, *cls.SQLITE_TRIGGERS)
+        with db.cursor() as cursor:
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            existing = {name for name, in cursor.fetchall()}
+            if cls.SQLITE_FTS_TABLE not in existing:
+                # migration 0005_task_search not applied (yet)
+                return []
+            missing = [name for name in cls.SQLITE_TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(cls.SQLITE_TRIGGERS[name])
+            if missing:
+                cursor.execute(f"INSERT INTO {cls.SQLITE_FTS_TABLE} ({cls.SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+        return missing
+
+    @classmethod
+    def repair_triggers(cls, sender, using=DEFAULT_DB_ALIAS, **kwargs):
+        """
+        post_migrate receiver of the tasks app
+        """
+        missing = cls.ensure_sqlite_triggers(using)
+        if missing:
+            logger.warning('Recreated the task search triggers %s on %s', ', '.join(missing), using)
+
+    @classmethod
+    def _postgresql_search(cls, tasks, terms):
+        """
+        Filter and rank on the stored tsvector, `word:*` is a prefix match
+        """
+        query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms), config=cls.POSTGRESQL_CONFIG, search_type='raw'
+        )
+        vector = RawSQL('tasks_task.search_vector', [], output_field=SearchVectorField())
+        return tasks.alias(search_vector=vector).filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+    @classmethod
+    def _sqlite_search(cls, tasks, terms):
+        """
+        Filter and rank through the FTS5 table, `"word"*` is a prefix match
+        bm25() is lower for better matches, so it is negated into a rank
+        """
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in cls.SQLITE_WEIGHTS)
+        matches = RawSQL('SELECT rowid FROM tasks_task_fts WHERE tasks_task_fts MATCH %s', [match])
+        rank = RawSQL(
+            f'SELECT -bm25(tasks_task_fts, {weights}) FROM tasks_task_fts '
+            f'WHERE tasks_task_fts MATCH %s AND rowid = tasks_task.id',
+            [match], output_field=FloatField()
+        )
+        return tasks.filter(id__in=matches).annotate(rank=rank)
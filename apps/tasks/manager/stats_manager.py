@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Greatest
+
+from apps.tasks.models import TaskAssignment, UserTaskStats
+
+
+class UserTaskStatsService:
+    """
+    This class is responsible to keep the UserTaskStats summary rows in step with the assignments
+
+    Writers describe what changed as per-user deltas, which are applied with relative
+    `UPDATE ... SET count = count + delta` statements in the writer's transaction, so concurrent
+    writers never overwrite each other. Anything that bypasses TaskService (admin edits, cascading
+    deletes, raw SQL) makes the rows drift, reconcile() recomputes them from the assignments.
+    """
+    # UserTaskStats has one counter field per assignment status, named after the status value
+    STATUS_FIELDS = tuple(TaskAssignment.TaskStatus.values)
+    COMPLETED = TaskAssignment.TaskStatus.COMPLETED
+
+    RECONCILE_BATCH_SIZE = 1000
+
+    @classmethod
+    def get_stats(cls, user_id):
+        """
+        Read the summary of a user with a single primary key lookup
+        return UserTaskStats, an unsaved all-zero one when the user never had an assignment
+        """
+        stats = UserTaskStats.objects.filter(user_id=user_id).first()
+        return stats or UserTaskStats(user_id=user_id)
+
+    @classmethod
+    def transition_delta(cls, from_status, to_status, completion_time=None):
+        """
+        Delta of one assignment moving between statuses
+        :param from_status: previous status, None for a new assignment
+        :param to_status: new status
+        :param completion_time: completed_at - created_at of the assignment, when entering or leaving completed
+        """
+        delta = defaultdict(int)
+        if from_status == to_status:
+            return delta
+        if from_status is not None:
+            delta[from_status] -= 1
+        delta[to_status] += 1
+        if completion_time is not None:
+            if to_status == cls.COMPLETED:
+                delta['total_completion_time'] = completion_time
+            elif from_status == cls.COMPLETED:
+                delta['total_completion_time'] = -completion_time
+        return delta
+
+    @classmethod
+    def record_assignments(cls, user_ids):
+        """
+        Count a new pending assignment for every given user, a user given n times gets n assignments
+        """
+        cls.apply_deltas({
+            user_id: {TaskAssignment.TaskStatus.PENDING: count} for user_id, count in Counter(user_ids).items()
+        })
+
+    @classmethod
+    def record_transitions(cls, transitions):
+        """
+        Apply a set of status changes
+        :param transitions: iterable of (user_id, from_status, to_status, completion_time)
+        """
+        deltas = defaultdict(dict)
+        for user_id, from_status, to_status, completion_time in transitions:
+            user_delta = deltas[user_id]
+            for field, value in cls.transition_delta(from_status, to_status, completion_time).items():
+                user_delta[field] = user_delta[field] + value if field in user_delta else value
+        cls.apply_deltas(deltas)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Add per-user deltas to the summary rows, creating the missing rows first
+        Users sharing the same delta (the common case for a bulk assignment) are updated by one statement
+        :param deltas: dict of user_id -> {field: delta}
+        """
+        groups = defaultdict(list)
+        for user_id, delta in deltas.items():
+            delta = tuple(sorted((field, value) for field, value in delta.items() if value))
+            if delta:
+                groups[delta].append(user_id)
+        if not groups:
+            return
+
+        UserTaskStats.objects.bulk_create(
+            [UserTaskStats(user_id=user_id) for user_ids in groups.values() for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        for delta, user_ids in groups.items():
+            updates = {}
+            for field, value in delta:
+                if field in cls.STATUS_FIELDS:
+                    # a drifted row must not break a write, reconcile repairs it
+                    updates[field] = Greatest(F(field) + value, Value(0))
+                else:
+                    updates[field] = F(field) + value
+            UserTaskStats.objects.filter(user_id__in=user_ids).update(**updates)
+
+    @classmethod
+    def _compute(cls, user_ids):
+        """
+        Recompute the summary of the given users from their assignments with one GROUP BY query
+        return dict of user_id -> field values
+        """
+        completion_time = ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField())
+        rows = TaskAssignment.objects.filter(user_id__in=user_ids).order_by().values('user_id', 'status').annotate(
+            count=Count('id'),
+            total_completion_time=Sum(
+                completion_time, filter=Q(status=cls.COMPLETED, completed_at__isnull=False)
+            ),
+        )
+        summaries = {
+            user_id: dict(dict.fromkeys(cls.STATUS_FIELDS, 0), total_completion_time=timedelta())
+            for user_id in user_ids
+        }
+        for row in rows:
+            summary = summaries[row['user_id']]
+            summary[row['status']] = row['count']
+            if row['total_completion_time']:
+                summary['total_completion_time'] = row['total_completion_time']
+        return summaries
+
+    @classmethod
+    def reconcile(cls, batch_size=None):
+        """
+        Repair drifted summary rows, batch by batch of users in id order
+        return number of rows created or corrected
+        """
+        batch_size = batch_size or cls.RECONCILE_BATCH_SIZE
+        fields = cls.STATUS_FIELDS + ('total_completion_time',)
+        repaired = 0
+        last_user_id = 0
+        while True:
+            # users with assignments, or with a stale row left behind
+            user_ids = sorted(
+                set(
+                    TaskAssignment.objects.filter(user_id__gt=last_user_id).order_by('user_id')
+                    .values_list('user_id', flat=True).distinct()[:batch_size]
+                ) | set(
+                    UserTaskStats.objects.filter(user_id__gt=last_user_id).order_by('user_id')
+                    .values_list('user_id', flat=True)[:batch_size]
+                )
+            )[:batch_size]
+            if not user_ids:
+                return repaired
+            last_user_id = user_ids[-1]
+
+            with transaction.atomic():
+                # locking the rows before counting makes concurrent writers either land before the
+                # count or apply their delta on top of the repaired row
+                existing = UserTaskStats.objects.select_for_update().in_bulk(user_ids)
+                summaries = cls._compute(user_ids)
+                to_create, to_update = [], []
+                for user_id, summary in summaries.items():
+                    stats = existing.get(user_id)
+                    if stats is None:
+                        to_create.append(UserTaskStats(user_id=user_id, **summary))
+                    elif any(getattr(stats, field) != value for field, value in summary.items()):
+                        for field, value in summary.items():
+                            setattr(stats, field, value)
+                        to_update.append(stats)
+                UserTaskStats.objects.bulk_create(to_create, ignore_conflicts=True)
+                UserTaskStats.objects.bulk_update(to_update, fields)
+            repaired += len(to_create) + len(to_update)
@@ -1,5 +1,36 @@
-from django.db import transaction
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Prefetch, Q
+from django.utils import timezone
+from apps.tasks.manager.cache_manager import UserTaskCache
+from apps.tasks.manager.stats_manager import UserTaskStatsService
 from apps.tasks.models import Task, TaskAssignment
+from apps.users.models import User
+from apps.utils.messages import CustomError
+from apps.utils.metrics import record_task_operation
+from apps.utils.pagination import KeysetPagination
+
+
+class TransitionConflict(Exception):
+    """
+    Raised when assignments of a transition batch changed since the client read them, nothing is written
+    """
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts)
+        self.conflicts = conflicts
+
+
+class BulkTaskError(Exception):
+    """
+    Raised when tasks of an all-or-nothing bulk creation reference users that do not exist, nothing is written
+    `errors` is aligned with the input: {} for a valid task, the errors of the task otherwise
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
 
 
 class TaskService:
@@ -7,47 +38,469 @@ class TaskService:
     This class is responsible to Create task and assign a task
     """
 
+    # Outcome of a single user in a bulk assignment
+    ASSIGNED = 'assigned'
+    ALREADY_ASSIGNED = 'already_assigned'
+
+    # Outcome of a single task in a bulk creation
+    CREATED = 'created'
+    ERROR = 'error'
+
+    # Max number of rows written by a single INSERT statement
+    ASSIGNMENT_BATCH_SIZE = 500
+
+    # Tasks written together by a bulk creation, and max number of tasks per request
+    TASK_BATCH_SIZE = 500
+    MAX_BULK_TASKS = 10000
+
+    # Max number of assignments moved by a single transition request
+    MAX_TRANSITIONS = 500
+
     @classmethod
     @transaction.atomic
-    def create_task(cls, name, description, assigned_users=None):
+    def create_task(cls, name, description, assigned_users=None, priority=None):
         """
         Create a task with optional user assignments
         Implements Transaction and Validation
+        :param priority: Task priority, the model default when None
         """
-        task = Task.objects.create(
-            name=name,
-            description=description,
-        )
+        task = Task(name=name, description=description)
+        if priority is not None:
+            task.priority = priority
+        task.save(force_insert=True)
 
+        record_task_operation('create_task')
         if assigned_users:
             cls.assign_task_to_users(task, assigned_users)
         return task
 
+    @classmethod
+    def create_tasks(cls, tasks, atomic=True, batch_size=None):
+        """
+        Create many tasks with their assignments
+        The users of every task are looked up with a single IN query, then tasks and assignments are
+        written by chunks with bulk_create, so the number of queries grows with the chunks only.
+        :param tasks: list of dicts with name, description and priority (optional) and assigned_users
+            (optional list of user ids, the first one becomes the primary assignee)
+        :param atomic: all or nothing when True, otherwise the valid tasks are created and the others reported,
+            each chunk then commits on its own
+        :param batch_size: max tasks per chunk (default TASK_BATCH_SIZE)
+        raise BulkTaskError when atomic and a task references users that do not exist, including users
+            deleted between the lookup and the insert
+        return list of {'status': CREATED, 'id': <task id>} or {'status': ERROR, 'errors': ...}, in input order
+        """
+        batch_size = batch_size or cls.TASK_BATCH_SIZE
+        results = [None] * len(tasks)
+        valid = []
+        for index, (item, missing) in enumerate(zip(tasks, cls._missing_users(tasks))):
+            if missing:
+                results[index] = cls._bulk_error(missing)
+            else:
+                valid.append((index, item, list(dict.fromkeys(item.get('assigned_users', ())))))
+        if atomic and len(valid) != len(tasks):
+            cls._raise_bulk_error(results)
+
+        chunks = [valid[start:start + batch_size] for start in range(0, len(valid), batch_size)]
+        if atomic:
+            try:
+                with transaction.atomic():
+                    created = [cls._create_task_chunk(chunk) for chunk in chunks]
+            except IntegrityError:
+                # nothing was written, report the users deleted since the lookup
+                results = [cls._bulk_error(missing) if missing else None for missing in cls._missing_users(tasks)]
+                if not any(results):
+                    raise
+                cls._raise_bulk_error(results)
+        else:
+            created = [cls._create_task_chunk_best_effort(chunk) for chunk in chunks]
+
+        for chunk, task_ids in zip(chunks, created):
+            for (index, _, _), task_id in zip(chunk, task_ids):
+                if task_id is None:
+                    results[index] = {'status': cls.ERROR, 'errors': {'assigned_users': [CustomError.USER_NOT_FOUND]}}
+                else:
+                    results[index] = {'status': cls.CREATED, 'id': task_id}
+        created_count = sum(result['status'] == cls.CREATED for result in results)
+        record_task_operation('create_task', cls.CREATED, created_count)
+        record_task_operation('create_task', cls.ERROR, len(tasks) - created_count)
+        return results
+
+    @classmethod
+    def _missing_users(cls, tasks):
+        """
+        Ids of the assigned users that do not exist, per task, found by a single query
+        """
+        referenced = {user_id for item in tasks for user_id in item.get('assigned_users', ())}
+        existing = set()
+        if referenced:
+            existing = set(User.objects.filter(pk__in=referenced).order_by().values_list('pk', flat=True))
+        return [
+            [user_id for user_id in dict.fromkeys(item.get('assigned_users', ())) if user_id not in existing]
+            for item in tasks
+        ]
+
+    @classmethod
+    def _raise_bulk_error(cls, results):
+        """
+        Abort an all-or-nothing creation, `results` holds the error of every invalid task and None for the others
+        """
+        record_task_operation('create_task', cls.ERROR, sum(result is not None for result in results))
+        raise BulkTaskError([{} if result is None else result['errors'] for result in results])
+
+    @classmethod
+    def _create_task_chunk(cls, chunk):
+        """
+        Insert the tasks of a chunk and their assignments, two INSERT statements for most chunks
+        :param chunk: list of (input index, task dict, user ids)
+        return list of the task ids, in chunk order
+        """
+        tasks = [
+            Task(**{field: value for field, value in item.items() if field != 'assigned_users'})
+            for _, item, _ in chunk
+        ]
+        # the primary keys come back from the INSERT (RETURNING) on PostgreSQL and SQLite
+        Task.objects.bulk_create(tasks)
+        assignments = [
+            TaskAssignment(task=task, user_id=user_id, is_primary_assignee=(position == 0))
+            for task, (_, _, user_ids) in zip(tasks, chunk)
+            for position, user_id in enumerate(user_ids)
+        ]
+        TaskAssignment.objects.bulk_create(assignments, batch_size=cls.ASSIGNMENT_BATCH_SIZE)
+
+        assigned_user_ids = [assignment.user_id for assignment in assignments]
+        UserTaskStatsService.record_assignments(assigned_user_ids)
+        transaction.on_commit(lambda: UserTaskCache.invalidate(list(set(assigned_user_ids))))
+        # counted once committed, a chunk rolled back with its savepoint or the whole batch assigned nobody
+        transaction.on_commit(lambda: record_task_operation('assign', cls.ASSIGNED, len(assigned_user_ids)))
+        return [task.pk for task in tasks]
+
+    @classmethod
+    def _create_task_chunk_best_effort(cls, chunk):
+        """
+        Commit a chunk on its own, falling back to one transaction per task when a user was deleted
+        since the lookup; tasks that could not be created get the id None
+        """
+        try:
+            with transaction.atomic():
+                return cls._create_task_chunk(chunk)
+        except IntegrityError:
+            pass
+
+        task_ids = []
+        for entry in chunk:
+            try:
+                with transaction.atomic():
+                    task_ids.extend(cls._create_task_chunk([entry]))
+            except IntegrityError:
+                task_ids.append(None)
+        return task_ids
+
+    @classmethod
+    def _bulk_error(cls, missing_user_ids):
+        return {
+            'status': cls.ERROR,
+            'errors': {'assigned_users': [f'{CustomError.USER_NOT_FOUND}: {user_id}' for user_id in missing_user_ids]},
+        }
+
     @classmethod
     @transaction.atomic
-    def assign_task_to_users(cls, task, users, assigned_by=None):
+    def assign_task_to_users(cls, task, users, assigned_by=None, batch_size=None):
         """
-        Assign task to multiple users with validation
+        Assign task to multiple users in bulk.
+        Users that already hold the task are skipped instead of aborting the whole batch.
+        The task row is locked first, so concurrent assignments of the same task run one after the other.
+        :param task: task instance
+        :param users: iterable of users; unless the task already has a primary assignee, the first one
+            in this order that gets the task becomes it
+        :param assigned_by: user who made the assignment (optional)
+        :param batch_size: max rows per INSERT (default ASSIGNMENT_BATCH_SIZE)
+        return dict of user id -> outcome (ASSIGNED or ALREADY_ASSIGNED) in input order
         """
-        assignments = []
-        for index, user in enumerate(users):
-            assignment = TaskAssignment.objects.create(
-                task=task,
-                user=user,
-                assigned_by=assigned_by,
-                is_primary_assignee=(index == 0)
+        user_ids = list(dict.fromkeys(user.pk for user in users))
+        if not user_ids:
+            return {}
+
+        # locks the task row until commit (SQLite serializes writers anyway)
+        list(Task.objects.select_for_update().filter(pk=task.pk).values_list('pk', flat=True))
+        already_assigned = set()
+        has_primary = False
+        for user_id, is_primary_assignee in TaskAssignment.objects.filter(
+            Q(user_id__in=user_ids) | Q(is_primary_assignee=True), task=task
+        ).values_list('user_id', 'is_primary_assignee'):
+            has_primary = has_primary or is_primary_assignee
+            if user_id in user_ids:
+                already_assigned.add(user_id)
+
+        new_user_ids = [user_id for user_id in user_ids if user_id not in already_assigned]
+        primary_user_id = new_user_ids[0] if new_user_ids and not has_primary else None
+        assignments = [
+            TaskAssignment(
+                task=task, user_id=user_id, assigned_by=assigned_by, is_primary_assignee=user_id == primary_user_id
             )
-            assignments.append(assignment)
+            for user_id in new_user_ids
+        ]
+
+        assigned_user_ids = cls._insert_assignments(task, assignments, batch_size or cls.ASSIGNMENT_BATCH_SIZE)
+        assigned = set(assigned_user_ids)
+        results = {user_id: cls.ASSIGNED if user_id in assigned else cls.ALREADY_ASSIGNED for user_id in user_ids}
+        # only the newly assigned users see a different task list
+        UserTaskStatsService.record_assignments(assigned_user_ids)
+        transaction.on_commit(lambda: UserTaskCache.invalidate(assigned_user_ids))
+        record_task_operation('assign', cls.ASSIGNED, len(assigned_user_ids))
+        record_task_operation('assign', cls.ALREADY_ASSIGNED, len(user_ids) - len(assigned_user_ids))
+        return results
 
-        return assignments
+    @classmethod
+    def _insert_assignments(cls, task, assignments, batch_size):
+        """
+        Insert the assignments of a task, skipping the (task, user) pairs another writer inserted since they were read
+        return list of the ids of the users assigned by this call
+        """
+        while assignments:
+            try:
+                with transaction.atomic():
+                    TaskAssignment.objects.bulk_create(assignments, batch_size=batch_size)
+                return [assignment.user_id for assignment in assignments]
+            except IntegrityError:
+                # the conflicting rows are committed by now, read the pairs again and insert the others
+                taken = set(TaskAssignment.objects.filter(
+                    task=task, user_id__in=[assignment.user_id for assignment in assignments]
+                ).values_list('user_id', flat=True))
+                if not taken:
+                    raise
+                assignments = [assignment for assignment in assignments if assignment.user_id not in taken]
+        return []
 
     @classmethod
-    def get_user_tasks(cls, user, status=None):
+    @transaction.atomic
+    def transition(cls, user_id, transitions):
+        """
+        Move assignments of a user between statuses with optimistic concurrency, all or nothing.
+        The current rows are read once, then each target status is written by a single conditional
+        `UPDATE ... WHERE (id = .. AND status = <expected> AND version = <read>) OR ...`, so a concurrent
+        writer between the read and the write makes the UPDATE match fewer rows instead of being overwritten.
+        completed_at is set (or cleared) by the same statement, and the version is bumped.
+        Assignments of other users are reported like missing ones, so their ids cannot be probed.
+        :param user_id: id of the user moving their assignments
+        :param transitions: list of dicts with `assignment` (id), `from_status` (expected current status),
+            `to_status`, and optionally `version` and `updated_at` preconditions
+        raise TransitionConflict listing the current state of the assignments that failed a precondition,
+            status None for the missing ones
+        return list of the new state of every assignment, in input order
+        """
+        if not transitions:
+            return []
+        if len({item['assignment'] for item in transitions}) != len(transitions):
+            raise ValueError('An assignment can only be moved once per batch')
+        current = TaskAssignment.objects.filter(user_id=user_id).only(
+            'id', 'user_id', 'status', 'version', 'completed_at', 'created_at', 'updated_at'
+        ).in_bulk([item['assignment'] for item in transitions])
+
+        conflicts = []
+        by_target_status = defaultdict(list)
+        for item in transitions:
+            assignment = current.get(item['assignment'])
+            if assignment is None or not cls._transition_allowed(assignment, item):
+                conflicts.append(cls._conflict(item['assignment'], assignment))
+                continue
+            by_target_status[item['to_status']].append(assignment)
+        if conflicts:
+            record_task_operation('transition', 'conflict', len(conflicts))
+            raise TransitionConflict(conflicts)
+
+        now = timezone.now()
+        for to_status, assignments in by_target_status.items():
+            condition = Q()
+            for assignment in assignments:
+                # the row must still be exactly what was read
+                condition |= Q(
+                    pk=assignment.pk, status=assignment.status,
+                    version=assignment.version, completed_at=assignment.completed_at
+                )
+            updated = TaskAssignment.objects.filter(condition, user_id=user_id).update(
+                status=to_status,
+                version=F('version') + 1,
+                completed_at=now if to_status == TaskAssignment.TaskStatus.COMPLETED else None,
+                updated_at=now,
+            )
+            if updated != len(assignments):
+                # rows written by this statement carry `now`, the others lost the race
+                raced = TaskAssignment.objects.filter(
+                    pk__in=[assignment.pk for assignment in assignments]
+                ).exclude(updated_at=now)
+                record_task_operation('transition', 'conflict', len(assignments) - updated)
+                raise TransitionConflict([cls._conflict(assignment.pk, assignment) for assignment in raced])
+
+        changes = []
+        results = []
+        for item in transitions:
+            assignment = current[item['assignment']]
+            completion_time = None
+            if item['to_status'] == TaskAssignment.TaskStatus.COMPLETED:
+                completion_time = now - assignment.created_at
+            elif assignment.status == TaskAssignment.TaskStatus.COMPLETED and assignment.completed_at:
+                completion_time = assignment.completed_at - assignment.created_at
+            changes.append((assignment.user_id, assignment.status, item['to_status'], completion_time))
+            results.append({
+                'assignment': assignment.pk,
+                'status': item['to_status'],
+                'version': assignment.version + 1,
+                'completed_at': now if item['to_status'] == TaskAssignment.TaskStatus.COMPLETED else None,
+                'updated_at': now,
+            })
+        UserTaskStatsService.record_transitions(changes)
+        record_task_operation('transition', 'ok', len(transitions))
+        user_ids = list({assignment.user_id for assignment in current.values()})
+        transaction.on_commit(lambda: UserTaskCache.invalidate(user_ids))
+        return results
+
+    @classmethod
+    def _transition_allowed(cls, assignment, item):
+        """
+        Check the client preconditions of a transition against the current row
+        """
+        if assignment.status != item['from_status']:
+            return False
+        if item.get('version') is not None and assignment.version != item['version']:
+            return False
+        if item.get('updated_at') is not None and assignment.updated_at != item['updated_at']:
+            return False
+        return True
+
+    @classmethod
+    def _conflict(cls, assignment_id, assignment):
+        """
+        Current state of an assignment reported back on conflict, status None when it does not exist
+        """
+        if assignment is None:
+            return {
+                'assignment': assignment_id, 'status': None, 'version': None, 'completed_at': None, 'updated_at': None,
+            }
+        return {
+            'assignment': assignment_id, 'status': assignment.status, 'version': assignment.version,
+            'completed_at': assignment.completed_at, 'updated_at': assignment.updated_at,
+        }
+
+    @classmethod
+    def get_user_tasks(cls, user, status=None, priority=None, created_from=None, created_to=None):
         """
         Retrieve tasks for a specific user with optional filtering
+        All filters compile into a single query joined once through the user's assignment,
+        so the status filter applies to the user's own assignment and uses its (user, status) index.
+        The user's own assignment (with its user) is prefetched into `user_assignments`
+        so serializing the list costs a constant number of queries
+        :param user: user instance or id
+        :param status: assignment status (optional)
+        :param priority: task priority (optional)
+        :param created_from: only tasks created at or after this datetime (optional)
+        :param created_to: only tasks created at or before this datetime (optional)
         """
-        tasks = user.tasks.all()
+        record_task_operation('get_user_tasks')
+        # a single filter() call keeps every assignment condition on the same joined row
+        assignment_filters = {'task_assignment_set__user': user}
         if status:
-            tasks = tasks.filter(status=status)
+            assignment_filters['task_assignment_set__status'] = status
+        tasks = Task.objects.filter(**assignment_filters)
+
+        if priority:
+            tasks = tasks.filter(priority=priority)
+        if created_from:
+            tasks = tasks.filter(created_at__gte=created_from)
+        if created_to:
+            tasks = tasks.filter(created_at__lte=created_to)
+
+        return tasks.prefetch_related(
+            Prefetch(
+                'task_assignment_set',
+                queryset=TaskAssignment.objects.filter(user=user).select_related('user'),
+                to_attr='user_assignments'
+            )
+        ).order_by('-created_at', '-id')
 
-        return tasks
+    @classmethod
+    def get_user_task_page(cls, user, cursor=None, page_size=None, **filters):
+        """
+        Retrieve one page of the user's tasks, newest first, using keyset pagination
+        :param user: user instance or id
+        :param cursor: opaque cursor from a previous page (optional)
+        :param page_size: number of tasks per page (optional, capped by settings.MAX_PAGE_SIZE)
+        :param filters: filters accepted by get_user_tasks
+        return (tasks, {'next': <cursor>, 'prev': <cursor>})
+        """
+        paginator = KeysetPagination(page_size=page_size)
+        return paginator.paginate(cls.get_user_tasks(user, **filters), cursor=cursor)
+
+    @classmethod
+    def _get_status_count_queryset(cls, user, status=None, priority=None, created_from=None, created_to=None):
+        """
+        GROUP BY status query over the user's assignments, with the filters of get_user_tasks
+        """
+        assignments = TaskAssignment.objects.filter(user=user)
+        if status:
+            assignments = assignments.filter(status=status)
+        if priority:
+            assignments = assignments.filter(task__priority=priority)
+        if created_from:
+            assignments = assignments.filter(task__created_at__gte=created_from)
+        if created_to:
+            assignments = assignments.filter(task__created_at__lte=created_to)
+        return assignments.order_by().values_list('status').annotate(count=Count('id'))
+
+    @classmethod
+    def count_user_tasks_by_status(cls, user, **filters):
+        """
+        Count the user's tasks per assignment status with a single GROUP BY query
+        Takes the same filters as get_user_tasks
+        return dict of status -> count, including statuses without any task
+        """
+        counts = dict.fromkeys(TaskAssignment.TaskStatus.values, 0)
+        counts.update(cls._get_status_count_queryset(user, **filters))
+        return counts
+
+    @classmethod
+    async def acount_user_tasks_by_status(cls, user, **filters):
+        """
+        Async version of count_user_tasks_by_status
+        """
+        counts = dict.fromkeys(TaskAssignment.TaskStatus.values, 0)
+        async for status, count in cls._get_status_count_queryset(user, **filters):
+            counts[status] = count
+        return counts
+
+    @classmethod
+    async def _attach_user_assignments(cls, tasks, user):
+        """
+        Fill `user_assignments` of the tasks with one query
+        Django 4.2 cannot prefetch_related during async iteration, so the async read path does it by hand
+        """
+        assignments = {}
+        queryset = TaskAssignment.objects.filter(
+            user=user, task_id__in=[task.id for task in tasks]
+        ).select_related('user')
+        async for assignment in queryset:
+            assignments.setdefault(assignment.task_id, []).append(assignment)
+        for task in tasks:
+            task.user_assignments = assignments.get(task.id, [])
+
+    @classmethod
+    async def aget_user_task_page(cls, user, cursor=None, page_size=None, **filters):
+        """
+        Async version of get_user_task_page
+        """
+        paginator = KeysetPagination(page_size=page_size)
+        tasks, cursors = await paginator.apaginate(
+            cls.get_user_tasks(user, **filters).prefetch_related(None), cursor=cursor
+        )
+        if tasks:
+            await cls._attach_user_assignments(tasks, user)
+        return tasks, cursors
+
+    @classmethod
+    async def aget_task(cls, pk, user=None):
+        """
+        Retrieve a task, with the given user's assignment attached when a user is given
+        """
+        task = await Task.objects.aget(pk=pk)
+        if user is not None:
+            await cls._attach_user_assignments([task], user)
+        return task
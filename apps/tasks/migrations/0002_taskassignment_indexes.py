@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskassignment',
+            index=models.Index(fields=['user', 'status'], name='taskassign_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskassignment',
+            index=models.Index(fields=['user', '-created_at'], name='taskassign_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskassignment',
+            index=models.Index(condition=models.Q(('status', 'completed'), _negated=True), fields=['user', '-created_at'], name='taskassign_user_open_idx'),
+        ),
+    ]
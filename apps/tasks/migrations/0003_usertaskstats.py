@@ -0,0 +1,69 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:40
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    Summary rows of the users who already have assignments, same values as UserTaskStatsService.reconcile()
+    computes (that service works on the current models, a migration has to use the historical ones)
+    """
+    TaskAssignment = apps.get_model('tasks', 'TaskAssignment')
+    UserTaskStats = apps.get_model('tasks', 'UserTaskStats')
+    db = schema_editor.connection.alias
+    completion_time = models.ExpressionWrapper(
+        models.F('completed_at') - models.F('created_at'), output_field=models.DurationField()
+    )
+    rows = TaskAssignment.objects.using(db).order_by('user_id').values('user_id', 'status').annotate(
+        count=models.Count('id'),
+        total_completion_time=models.Sum(
+            completion_time, filter=models.Q(status='completed', completed_at__isnull=False)
+        ),
+    )
+    batch = {}
+    for row in rows.iterator():
+        stats = batch.get(row['user_id'])
+        if stats is None:
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                UserTaskStats.objects.using(db).bulk_create(batch.values())
+                batch = {}
+            stats = batch[row['user_id']] = UserTaskStats(user_id=row['user_id'])
+        # one counter field per status, named after the status value
+        setattr(stats, row['status'], row['count'])
+        if row['total_completion_time']:
+            stats.total_completion_time = row['total_completion_time']
+    UserTaskStats.objects.using(db).bulk_create(batch.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_email_lower_uniq'),
+        ('tasks', '0002_taskassignment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskStats',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('in_progress', models.PositiveIntegerField(default=0)),
+                ('review', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('blocked', models.PositiveIntegerField(default=0)),
+                ('total_completion_time', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
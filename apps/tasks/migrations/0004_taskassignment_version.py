@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_usertaskstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskassignment',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
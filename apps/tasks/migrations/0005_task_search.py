@@ -0,0 +1,96 @@
+# Generated by Django 4.2.11 on 2026-10-18 19:30
+
+from django.db import migrations
+
+# The search structures live outside the model state, so regular Task reads never load them.
+# PostgreSQL: a stored tsvector column filled by a trigger, with a GIN index.
+# SQLite: an external content FTS5 table kept in step with tasks_task by triggers, without stemming
+# (the prefix match already covers most inflections), it only backs local runs and the test suite.
+# SQLite rebuilds a table on most ALTERs, which drops its triggers: TaskSearchService.repair_triggers
+# recreates them after every migrate.
+
+POSTGRESQL_FORWARD = [
+    'ALTER TABLE tasks_task ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION tasks_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER tasks_task_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON tasks_task
+    FOR EACH ROW EXECUTE FUNCTION tasks_task_search_vector_update()
+    """,
+    # backfill through the trigger
+    'UPDATE tasks_task SET name = name',
+    'CREATE INDEX tasks_task_search_vector_idx ON tasks_task USING gin (search_vector)',
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP TRIGGER tasks_task_search_vector_trigger ON tasks_task',
+    'DROP FUNCTION tasks_task_search_vector_update()',
+    'ALTER TABLE tasks_task DROP COLUMN search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE tasks_task_fts USING fts5(
+        name, description, content='tasks_task', content_rowid='id', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts (tasks_task_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_task_fts_update AFTER UPDATE OF name, description ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts (tasks_task_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO tasks_task_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO tasks_task_fts (tasks_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER tasks_task_fts_update',
+    'DROP TRIGGER tasks_task_fts_delete',
+    'DROP TRIGGER tasks_task_fts_insert',
+    'DROP TABLE tasks_task_fts',
+]
+
+
+def run_for_vendor(statements):
+    """
+    Build a RunPython function executing the statements of the current database vendor
+    """
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_taskassignment_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_for_vendor({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
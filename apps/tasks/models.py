@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from apps.users.models import User
@@ -55,6 +57,49 @@ class TaskAssignment(TimestampedModel):
 
     is_primary_assignee = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
+    # bumped by every status transition, clients send it back as an optimistic concurrency precondition
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ['user', 'task']
+        indexes = [
+            # user task list filtered by status
+            models.Index(fields=['user', 'status'], name='taskassign_user_status_idx'),
+            # user task list, newest assignment first
+            models.Index(fields=['user', '-created_at'], name='taskassign_user_created_idx'),
+            # open work of a user, newest first; completed rows are the bulk of the table and stay out of it
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=~models.Q(status='completed'),
+                name='taskassign_user_open_idx'
+            ),
+        ]
+
+
+class UserTaskStats(TimestampedModel):
+    """
+    Denormalized per-user summary of task assignments, read by the dashboard in O(1)
+    Maintained incrementally by TaskService, repaired by the reconcile_task_stats command
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+
+    pending = models.PositiveIntegerField(default=0)
+    in_progress = models.PositiveIntegerField(default=0)
+    review = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    blocked = models.PositiveIntegerField(default=0)
+
+    # sum of (completed_at - created_at) over the completed assignments
+    total_completion_time = models.DurationField(default=timedelta)
+
+    @property
+    def average_completion_time(self):
+        """
+        Average time from assignment to completion, None when nothing is completed
+        """
+        if not self.completed:
+            return None
+        return self.total_completion_time / self.completed
+
+    def __str__(self):
+        return f'{self.user_id} task stats'
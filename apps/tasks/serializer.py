@@ -1,8 +1,11 @@
 from rest_framework import serializers
-from apps.tasks.models import Task, TaskAssignment
+from apps.tasks.models import Task, TaskAssignment, UserTaskStats
 from apps.users.models import User
+from apps.tasks.manager.export_manager import TaskExportService
 from apps.tasks.manager.task_manager import TaskService
-from apps.users.serializer import GetUserSerializer
+from apps.users.serializer import FastGetUserSerializer, GetUserSerializer
+from apps.utils.messages import CustomError
+from apps.utils.serializer import FastSerializer
 
 
 class TaskAssignmentSerializer(serializers.ModelSerializer):
@@ -16,6 +19,13 @@ class TaskAssignmentSerializer(serializers.ModelSerializer):
         fields = ['user', 'user_name', 'is_primary_assignee', 'status']
 
 
+class FastTaskAssignmentSerializer(FastSerializer):
+    """
+    Fast path of TaskAssignmentSerializer, same output
+    """
+    serializer_class = TaskAssignmentSerializer
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """
     Comprehensive Task Serializer with Advanced Validations
@@ -48,7 +58,8 @@ class TaskSerializer(serializers.ModelSerializer):
         task = TaskService.create_task(
             name=validated_data['name'],
             description=validated_data.get('description', ''),
-            assigned_users=assigned_users
+            assigned_users=assigned_users,
+            priority=validated_data.get('priority'),
         )
         return task
 
@@ -78,7 +89,7 @@ class AssignTaskSerializer(serializers.ModelSerializer):
         Custom create method to handle user assignments
         """
         assigned_users = validated_data.pop('assigned_users', [])
-        task = TaskService.assign_task_to_users(
+        self.assignment_results = TaskService.assign_task_to_users(
             task=validated_data['task'],
             users=assigned_users,
         )
@@ -86,24 +97,90 @@ class AssignTaskSerializer(serializers.ModelSerializer):
         return task
 
 
+class BulkTaskItemSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate one task of a bulk creation
+    Users are only checked to be ids here, TaskService.create_tasks looks them all up with one query
+    """
+    name = serializers.CharField(max_length=Task._meta.get_field('name').max_length)
+    description = serializers.CharField(required=False, allow_blank=True)
+    priority = serializers.ChoiceField(choices=Task._meta.get_field('priority').choices, required=False)
+    assigned_users = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+
+class BulkTaskSerializer(serializers.Serializer):
+    """
+    this serializer class is used to create many tasks at once
+    All or nothing (atomic, the default): any invalid task rejects the request, errors are aligned with the tasks.
+    Best effort: invalid tasks are reported in place of their id and the others are created.
+    """
+    tasks = serializers.ListField(allow_empty=False, max_length=TaskService.MAX_BULK_TASKS)
+    atomic = serializers.BooleanField(default=True)
+
+    def validate(self, attrs):
+        """
+        Validate every task with a single item serializer, its fields are only bound once
+        """
+        item_serializer = BulkTaskItemSerializer()
+        tasks = []
+        self.item_errors = []
+        for item in attrs['tasks']:
+            try:
+                tasks.append(item_serializer.run_validation(item))
+                self.item_errors.append({})
+            except serializers.ValidationError as error:
+                tasks.append(None)
+                self.item_errors.append(error.detail)
+        if attrs['atomic'] and any(self.item_errors):
+            raise serializers.ValidationError({'tasks': self.item_errors})
+        attrs['tasks'] = tasks
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Create the valid tasks, raise BulkTaskError when an atomic batch references unknown users
+        return the outcome of every task, in input order
+        """
+        tasks = validated_data['tasks']
+        valid_indexes = [index for index, item in enumerate(tasks) if item is not None]
+        created = TaskService.create_tasks([tasks[index] for index in valid_indexes], atomic=validated_data['atomic'])
+        results = [{'status': TaskService.ERROR, 'errors': errors} for errors in self.item_errors]
+        for index, result in zip(valid_indexes, created):
+            results[index] = result
+        return results
+
+
 class GetTaskAssignmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskAssignment
-        fields = ('id', 'status', 'completed_at', 'is_primary_assignee',)
+        fields = ('id', 'status', 'completed_at', 'is_primary_assignee', 'version',)
 
 
 class GetTaskSerializer(serializers.ModelSerializer):
     task_details = serializers.SerializerMethodField()
     user_details = serializers.SerializerMethodField()
 
+    @staticmethod
+    def _get_user_assignments(obj, user_id):
+        """
+        Return the task assignments of the given user_id
+        Reads the `user_assignments` cache filled by TaskService.get_user_tasks, and only
+        falls back to a query when the task was not fetched through it
+        """
+        if hasattr(obj, 'user_assignments'):
+            return obj.user_assignments
+        return list(obj.task_assignment_set.filter(user_id=user_id).select_related('user'))
+
     def get_user_details(self, obj):
         """
         Fetch task assignments only for the given user_id
         """
         user_id = self.context.get('user_id')
         if user_id:
-            user_obj = obj.task_assignment_set.filter(user_id=user_id).first().user
-            return GetUserSerializer(user_obj, many=False).data
+            task_assignments = self._get_user_assignments(obj, user_id)
+            if not task_assignments:
+                return None
+            return GetUserSerializer(task_assignments[0].user, many=False).data
         return None
 
     def get_task_details(self, obj):
@@ -112,7 +189,7 @@ class GetTaskSerializer(serializers.ModelSerializer):
         """
         user_id = self.context.get('user_id')
         if user_id:
-            task_assignments = obj.task_assignment_set.filter(user_id=user_id)
+            task_assignments = self._get_user_assignments(obj, user_id)
             return GetTaskAssignmentSerializer(task_assignments, many=True).data
         return None
 
@@ -122,3 +199,113 @@ class GetTaskSerializer(serializers.ModelSerializer):
             'id', 'name', 'description',
             'priority', 'user_details', 'task_details',
         ]
+
+
+class FastGetTaskAssignmentSerializer(FastSerializer):
+    """
+    Fast path of GetTaskAssignmentSerializer, same output
+    """
+    serializer_class = GetTaskAssignmentSerializer
+
+
+class FastGetTaskSerializer(FastSerializer):
+    """
+    Fast path of GetTaskSerializer for the task listings, same output
+    Rows are tasks with the user's assignments prefetched, as TaskService.get_user_tasks returns them
+    """
+    serializer_class = GetTaskSerializer
+
+    @classmethod
+    def get_user_details(cls, obj, context):
+        user_id = context.get('user_id')
+        if user_id:
+            task_assignments = GetTaskSerializer._get_user_assignments(obj, user_id)
+            if not task_assignments:
+                return None
+            return FastGetUserSerializer.to_representation(task_assignments[0].user)
+        return None
+
+    @classmethod
+    def get_task_details(cls, obj, context):
+        user_id = context.get('user_id')
+        if user_id:
+            return FastGetTaskAssignmentSerializer.many(GetTaskSerializer._get_user_assignments(obj, user_id))
+        return None
+
+
+class UserTaskFilterSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate the filters of the user task listing
+    """
+    status = serializers.ChoiceField(choices=TaskAssignment.TaskStatus.choices, required=False)
+    priority = serializers.ChoiceField(choices=Task._meta.get_field('priority').choices, required=False)
+    created_from = serializers.DateTimeField(required=False)
+    created_to = serializers.DateTimeField(required=False)
+    counts_by_status = serializers.BooleanField(required=False, default=False)
+
+
+class TaskSearchSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate the parameters of a task search
+    """
+    q = serializers.CharField(max_length=255)
+    user = serializers.IntegerField(required=False, min_value=1)
+    page_size = serializers.IntegerField(required=False, min_value=1)
+
+
+class TaskExportSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate the parameters of a task export
+    """
+    kind = serializers.ChoiceField(choices=tuple(TaskExportService.EXPORTS), default='tasks')
+    file_format = serializers.ChoiceField(choices=TaskExportService.FORMATS, default=TaskExportService.NDJSON)
+    after_id = serializers.IntegerField(required=False, min_value=0)
+
+
+class UserTaskStatsSerializer(serializers.ModelSerializer):
+    """
+    this serializer class is used to show the task dashboard summary of a user
+    """
+    average_completion_time = serializers.DurationField(read_only=True)
+
+    class Meta:
+        model = UserTaskStats
+        fields = ('user', 'pending', 'in_progress', 'review', 'completed', 'blocked', 'average_completion_time',)
+
+
+class TaskTransitionSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate one status transition and its preconditions
+    """
+    assignment = serializers.IntegerField(min_value=1)
+    from_status = serializers.ChoiceField(choices=TaskAssignment.TaskStatus.choices)
+    to_status = serializers.ChoiceField(choices=TaskAssignment.TaskStatus.choices)
+    version = serializers.IntegerField(required=False, min_value=0)
+    updated_at = serializers.DateTimeField(required=False)
+
+
+class TaskTransitionBatchSerializer(serializers.Serializer):
+    """
+    this serializer class is used to validate a batch of status transitions
+    """
+    transitions = TaskTransitionSerializer(many=True, allow_empty=False, max_length=TaskService.MAX_TRANSITIONS)
+
+    def validate_transitions(self, value):
+        """
+        Every assignment moves once, its preconditions would be ambiguous otherwise
+        """
+        if len({item['assignment'] for item in value}) != len(value):
+            raise serializers.ValidationError(CustomError.get_error_message('DUPLICATE_TRANSITION'))
+        return value
+
+
+class AssignmentStateSerializer(serializers.Serializer):
+    """
+    this serializer class is used to show the state of an assignment after a transition, or on conflict
+    updated_at keeps its microseconds so it can be sent back as a precondition
+    """
+    assignment = serializers.IntegerField()
+    status = serializers.CharField(allow_null=True)
+    version = serializers.IntegerField(allow_null=True)
+    completed_at = serializers.DateTimeField(allow_null=True)
+    updated_at = serializers.DateTimeField(allow_null=True)
@@ -1,3 +1,843 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import QuerySet
 from django.test import TestCase
 
-# Create your tests here.
+from apps.tasks.manager.cache_manager import UserTaskCache
+from apps.tasks.manager.export_manager import TaskExportService
+from apps.tasks.manager.search_manager import TaskSearchService
+from apps.tasks.manager.stats_manager import UserTaskStatsService
+from apps.tasks.manager.task_manager import BulkTaskError, TaskService, TransitionConflict
+from apps.tasks.models import Task, TaskAssignment, UserTaskStats
+from apps.users.managers.token_manager import TokenService
+from apps.users.models import User
+from apps.utils.testing import APITestCase, authenticated_client, create_test_user
+
+
+class UserTaskQueryCountTest(APITestCase):
+    """
+    The user-task endpoint must run in a constant number of queries
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+    token_authentication = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = create_test_user('other')
+
+    def setUp(self):
+        super().setUp()
+        # the user state is read once per JWT_USER_CACHE_TTL, not per request
+        TokenService.get_user_state(self.user.id)
+
+    def _seed_tasks(self, count):
+        tasks = Task.objects.bulk_create(Task(name=f'task {index}') for index in range(count))
+        assignments = []
+        for task in tasks:
+            assignments.append(TaskAssignment(task=task, user=self.user))
+            assignments.append(TaskAssignment(task=task, user=self.other_user))
+        TaskAssignment.objects.bulk_create(assignments)
+
+    def test_user_task_query_count_is_constant(self):
+        seeded = 0
+        for count in (10, 100, 1000):
+            with self.subTest(tasks=count):
+                self._seed_tasks(count - seeded)
+                seeded = count
+                cache.clear()
+                # etag aggregate, tasks, prefetched assignments with their user; the user comes from the token
+                with self.assertNumQueries(3):
+                    response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'page_size': count})
+                self.assertEqual(len(response.data['data']), min(count, settings.MAX_PAGE_SIZE))
+
+    def test_user_task_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.USER_TASK_URL).status_code, 401)
+
+    def test_tasks_of_other_users_are_forbidden(self):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.other_user.id})
+        self.assertEqual(response.status_code, 403)
+
+    def test_user_task_only_returns_requesting_user_assignment(self):
+        self._seed_tasks(2)
+        response = self.client.get(self.USER_TASK_URL)
+        for task in response.data['data']:
+            self.assertEqual(task['user_details']['id'], self.user.id)
+            self.assertEqual(len(task['task_details']), 1)
+
+
+class UserTaskPaginationTest(APITestCase):
+    """
+    Keyset pagination of the user-task endpoint
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # bulk created tasks share created_at values, so ordering relies on the id tie-breaker
+        cls.tasks = Task.objects.bulk_create(Task(name=f'task {index}') for index in range(25))
+        TaskAssignment.objects.bulk_create(TaskAssignment(task=task, user=cls.user) for task in cls.tasks)
+
+    def _get_page(self, **params):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'page_size': 10, **params})
+        body = response.data
+        return [task['id'] for task in body['data']], body['next'], body['prev']
+
+    def test_walk_forward_and_back(self):
+        expected = sorted((task.id for task in self.tasks), reverse=True)
+
+        first, next_cursor, prev_cursor = self._get_page()
+        self.assertIsNone(prev_cursor)
+        second, next_cursor, prev_cursor = self._get_page(cursor=next_cursor)
+        third, next_cursor, _ = self._get_page(cursor=next_cursor)
+        self.assertIsNone(next_cursor)
+        self.assertEqual(first + second + third, expected)
+
+        back, _, back_prev = self._get_page(cursor=prev_cursor)
+        self.assertEqual(back, first)
+        self.assertIsNone(back_prev)
+
+    def test_page_size_is_capped(self):
+        with self.settings(MAX_PAGE_SIZE=5):
+            tasks, next_cursor, _ = self._get_page(page_size=1000)
+        self.assertEqual(len(tasks), 5)
+        self.assertIsNotNone(next_cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class UserTaskCacheTest(APITestCase):
+    """
+    Read-through caching of the user-task endpoint
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = create_test_user('other')
+
+    def _get_tasks(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.USER_TASK_URL)
+        return [task['id'] for task in response.data['data']]
+
+    def test_second_read_is_served_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskService.create_task('task', 'description', assigned_users=[self.user])
+        self._get_tasks(self.user)
+        stats = UserTaskCache.stats()
+        # only the etag aggregate
+        with self.assertNumQueries(1):
+            self._get_tasks(self.user)
+        self.assertEqual(UserTaskCache.stats()['hits'], stats['hits'] + 1)
+
+    def test_assignment_invalidates_only_affected_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = TaskService.create_task('task', 'description', assigned_users=[self.other_user])
+        self.assertEqual(self._get_tasks(self.user), [])
+        self.assertEqual(self._get_tasks(self.other_user), [task.id])
+        other_user_version = UserTaskCache.get_version(self.other_user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskService.assign_task_to_users(task, [self.user, self.other_user])
+
+        self.assertEqual(self._get_tasks(self.user), [task.id])
+        self.assertEqual(UserTaskCache.get_version(self.other_user.id), other_user_version)
+
+    def test_only_one_builder_runs_while_locked(self):
+        calls = []
+        key = hashlib.md5(b'key').hexdigest()
+        cache_key = f'{UserTaskCache.KEY_PREFIX}:{self.user.id}:{UserTaskCache.get_version(self.user.id)}:{key}'
+        # simulate another worker holding the rebuild lock and filling the cache shortly after
+        cache.add(f'{cache_key}:lock', 1)
+        rebuild = threading.Timer(0.1, cache.set, args=(cache_key, 'built elsewhere'))
+        rebuild.start()
+        value = UserTaskCache.get_or_build(self.user.id, 'key', lambda: calls.append(1))
+        rebuild.join()
+        self.assertEqual(value, 'built elsewhere')
+        self.assertEqual(calls, [])
+
+
+class UserTaskConditionalGetTest(APITestCase):
+    """
+    ETag / If-None-Match handling of the user-task endpoint
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.task = TaskService.create_task('task', 'description', assigned_users=[cls.user])
+
+    def test_matching_etag_returns_304_without_serializing(self):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id})
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.USER_TASK_URL, {'user': self.user.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_with_assignments(self):
+        etag = self.client.get(self.USER_TASK_URL, {'user': self.user.id})['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskService.create_task('another task', 'description', assigned_users=[self.user])
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_differs_per_page(self):
+        first = self.client.get(self.USER_TASK_URL, {'user': self.user.id})['ETag']
+        second = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'page_size': 1})['ETag']
+        self.assertNotEqual(first, second)
+
+
+class UserTaskFilterTest(APITestCase):
+    """
+    Status, priority and date filters of the user-task endpoint
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = create_test_user('other')
+        cls.pending_task = Task.objects.create(name='pending', priority=1)
+        cls.completed_task = Task.objects.create(name='completed', priority=3)
+        TaskAssignment.objects.create(task=cls.pending_task, user=cls.user)
+        TaskAssignment.objects.create(
+            task=cls.completed_task, user=cls.user, status=TaskAssignment.TaskStatus.COMPLETED
+        )
+        # the other user's status must not leak into the requesting user's filter
+        TaskAssignment.objects.create(
+            task=cls.pending_task, user=cls.other_user, status=TaskAssignment.TaskStatus.COMPLETED
+        )
+
+    def _get_tasks(self, **params):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, **params})
+        return [task['id'] for task in response.data['data']]
+
+    def test_status_filter_uses_requesting_user_assignment(self):
+        self.assertEqual(self._get_tasks(status='pending'), [self.pending_task.id])
+        self.assertEqual(self._get_tasks(status='completed'), [self.completed_task.id])
+
+    def test_priority_filter(self):
+        self.assertEqual(self._get_tasks(priority=3), [self.completed_task.id])
+
+    def test_date_range_filter(self):
+        created_at = self.completed_task.created_at.isoformat()
+        self.assertEqual(self._get_tasks(created_from=created_at), [self.completed_task.id])
+        self.assertEqual(self._get_tasks(created_to=self.pending_task.created_at.isoformat()), [self.pending_task.id])
+
+    def test_invalid_filter(self):
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'status': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_counts_by_status(self):
+        with self.assertNumQueries(1):
+            counts = TaskService.count_user_tasks_by_status(self.user)
+        self.assertEqual(counts, {'pending': 1, 'in_progress': 0, 'review': 0, 'completed': 1, 'blocked': 0})
+
+        response = self.client.get(self.USER_TASK_URL, {'user': self.user.id, 'counts_by_status': 'true'})
+        self.assertEqual(response.data['data'], counts)
+
+
+class AsyncUserTaskTest(APITestCase):
+    """
+    The async read path returns the same body as the DRF views
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        tasks = Task.objects.bulk_create(Task(name=f'task {index}') for index in range(5))
+        TaskAssignment.objects.bulk_create(TaskAssignment(task=task, user=cls.user) for task in tasks)
+        cls.task = tasks[0]
+
+    def setUp(self):
+        super().setUp()
+        self.headers = {'Authorization': f'Bearer {TokenService.issue_tokens(self.user).access_token}'}
+
+    async def test_user_task_matches_sync_view(self):
+        for params in ({}, {'page_size': 2}, {'user': self.user.id, 'counts_by_status': 'true'}):
+            with self.subTest(params=params):
+                sync_response = await self.async_client.get('/api/v1/task/user-task/', params, headers=self.headers)
+                async_response = await self.async_client.get(
+                    '/api/v1/task/async/user-task/', params, headers=self.headers
+                )
+                self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_get_task(self):
+        response = await self.async_client.get(
+            f'/api/v1/task/async/{self.task.id}/', {'user': self.user.id}, headers=self.headers
+        )
+        body = response.json()['data']
+        self.assertEqual(body['id'], self.task.id)
+        self.assertEqual(body['user_details']['id'], self.user.id)
+
+    async def test_unknown_task(self):
+        response = await self.async_client.get('/api/v1/task/async/0/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_authentication(self):
+        response = await self.async_client.get('/api/v1/task/async/user-task/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+        response = await self.async_client.get(
+            f'/api/v1/task/async/{self.task.id}/', {'user': self.user.id + 1}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TaskExportTest(APITestCase):
+    """
+    Streaming export of tasks and assignments, by staff
+    """
+    EXPORT_URL = '/api/v1/task/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = create_test_user('staff', is_staff=True)
+        cls.tasks = Task.objects.bulk_create(Task(name=f'task {index}') for index in range(5))
+        TaskAssignment.objects.bulk_create(TaskAssignment(task=task, user=cls.user) for task in cls.tasks)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.staff)
+
+    def _export(self, **params):
+        response = self.client.get(self.EXPORT_URL, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_resumes_after_id(self):
+        rows = [json.loads(line) for line in self._export(after_id=self.tasks[1].id).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [task.id for task in self.tasks[2:]])
+
+    def test_csv_export(self):
+        lines = self._export(kind='assignments', file_format='csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'task_id', 'user_id'])
+        self.assertEqual(len(lines), 6)
+
+    def test_resumed_csv_export_appends_without_header(self):
+        first = self._export(kind='assignments', file_format='csv').splitlines()[:3]
+        last_id = first[-1].split(',')[0]
+        resumed = self._export(kind='assignments', file_format='csv', after_id=last_id).splitlines()
+        full = self._export(kind='assignments', file_format='csv').splitlines()
+        self.assertEqual(first + resumed, full)
+
+    def test_command_resume_appends_to_the_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tasks.csv')
+            call_command('export_tasks', format='csv', output=path)
+            with open(path) as output:
+                full = output.read()
+            # interrupted after the second task
+            with open(path, 'w', newline='') as output:
+                output.writelines(full.splitlines(keepends=True)[:3])
+            call_command('export_tasks', format='csv', output=path, after_id=self.tasks[1].id)
+            with open(path) as output:
+                self.assertEqual(output.read(), full)
+
+    def test_keyset_batches_without_server_side_cursors(self):
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            rows = list(TaskExportService.iter_rows('tasks', chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [task.id for task in self.tasks])
+
+    def test_only_staff_can_export(self):
+        response = self.client_for(self.user).get(self.EXPORT_URL)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.streaming)
+
+
+class TaskAssignTest(TestCase):
+    """
+    TaskService.assign_task_to_users outcomes and primary assignee
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{index}@example.com', name=f'user {index}') for index in range(3)
+        )
+        cls.task = Task.objects.create(name='task')
+
+    def _primary_user_ids(self):
+        return list(
+            TaskAssignment.objects.filter(task=self.task, is_primary_assignee=True).values_list('user_id', flat=True)
+        )
+
+    def test_primary_is_first_new_user_in_input_order(self):
+        TaskAssignment.objects.create(task=self.task, user=self.users[0])
+        results = TaskService.assign_task_to_users(self.task, self.users)
+        self.assertEqual(list(results.values()), [
+            TaskService.ALREADY_ASSIGNED, TaskService.ASSIGNED, TaskService.ASSIGNED
+        ])
+        self.assertEqual(self._primary_user_ids(), [self.users[1].id])
+
+    def test_primary_assignee_is_kept(self):
+        TaskService.assign_task_to_users(self.task, [self.users[0]])
+        TaskService.assign_task_to_users(self.task, self.users[1:])
+        self.assertEqual(self._primary_user_ids(), [self.users[0].id])
+
+    def test_pair_inserted_meanwhile_is_not_reported_as_assigned(self):
+        # another writer assigned the second user after the assignments were read
+        TaskAssignment.objects.create(task=self.task, user=self.users[1])
+        assignments = [TaskAssignment(task=self.task, user=user) for user in self.users]
+        assigned_user_ids = TaskService._insert_assignments(self.task, assignments, TaskService.ASSIGNMENT_BATCH_SIZE)
+        self.assertEqual(assigned_user_ids, [self.users[0].id, self.users[2].id])
+        self.assertEqual(TaskAssignment.objects.filter(task=self.task).count(), 3)
+
+
+class UserTaskStatsTest(APITestCase):
+    """
+    Per-user task stats kept in step by TaskService and repaired by reconcile
+    """
+    STATS_URL = '/api/v1/task/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = create_test_user('other')
+
+    def _move(self, assignment, status):
+        TaskService.transition(
+            assignment.user_id, [{'assignment': assignment.pk, 'from_status': assignment.status, 'to_status': status}]
+        )
+        return TaskAssignment.objects.get(pk=assignment.pk)
+
+    def _counts(self, user):
+        stats = UserTaskStatsService.get_stats(user.id)
+        return {field: getattr(stats, field) for field in UserTaskStatsService.STATUS_FIELDS}
+
+    def test_assign_and_transitions_update_stats(self):
+        tasks = [TaskService.create_task(f'task {index}', '', [self.user, self.other]) for index in range(3)]
+        self.assertEqual(self._counts(self.user)['pending'], 3)
+
+        assignment = TaskAssignment.objects.get(task=tasks[0], user=self.user)
+        assignment = self._move(assignment, TaskAssignment.TaskStatus.IN_PROGRESS)
+        assignment = self._move(assignment, TaskAssignment.TaskStatus.COMPLETED)
+        self.assertEqual(
+            self._counts(self.user), {'pending': 2, 'in_progress': 0, 'review': 0, 'completed': 1, 'blocked': 0}
+        )
+        stats = UserTaskStatsService.get_stats(self.user.id)
+        self.assertEqual(stats.average_completion_time, assignment.completed_at - assignment.created_at)
+
+        self._move(assignment, TaskAssignment.TaskStatus.REVIEW)
+        stats = UserTaskStatsService.get_stats(self.user.id)
+        self.assertEqual((stats.completed, stats.review, stats.average_completion_time), (0, 1, None))
+        self.assertEqual(self._counts(self.other)['pending'], 3)
+
+    def test_reconcile_repairs_drift(self):
+        task = TaskService.create_task('task', '', [self.user])
+        done = TaskService.create_task('done', '', [self.user])
+        assignment = self._move(TaskAssignment.objects.get(task=done), TaskAssignment.TaskStatus.COMPLETED)
+        # writes that bypass TaskService
+        TaskAssignment.objects.filter(task=task).update(status=TaskAssignment.TaskStatus.BLOCKED)
+        UserTaskStats.objects.filter(user=self.user).update(total_completion_time=timedelta())
+        UserTaskStats.objects.create(user=self.other, pending=4)
+
+        self.assertEqual(UserTaskStatsService.reconcile(batch_size=1), 2)
+        stats = UserTaskStatsService.get_stats(self.user.id)
+        self.assertEqual(stats.average_completion_time, assignment.completed_at - assignment.created_at)
+        self.assertEqual(self._counts(self.user)['blocked'], 1)
+        self.assertEqual(self._counts(self.user)['pending'], 0)
+        self.assertEqual(self._counts(self.other)['pending'], 0)
+        self.assertEqual(UserTaskStatsService.reconcile(), 0)
+
+    def test_stats_endpoint_is_a_single_query(self):
+        TaskService.create_task('task', '', [self.user])
+        with self.assertNumQueries(1):
+            response = self.client.get(self.STATS_URL)
+        data = response.data['data']
+        self.assertEqual((data['pending'], data['completed'], data['average_completion_time']), (1, 0, None))
+
+        response = self.client_for(self.other).get(self.STATS_URL)
+        self.assertEqual(response.data['data']['pending'], 0)
+
+
+class TaskTransitionTest(APITestCase):
+    """
+    Status transitions with optimistic concurrency
+    """
+    TRANSITION_URL = '/api/v1/task/transition/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.tasks = [TaskService.create_task(f'task {index}', '', [cls.user]) for index in range(4)]
+
+    def setUp(self):
+        super().setUp()
+        self.assignments = list(TaskAssignment.objects.filter(user=self.user).order_by('id'))
+
+    def _post(self, transitions):
+        return self.client.post(self.TRANSITION_URL, {'transitions': transitions}, format='json')
+
+    def test_batch_is_one_update_per_target_status(self):
+        transitions = [
+            {'assignment': assignment.id, 'from_status': 'pending', 'to_status': to_status, 'version': 0}
+            for assignment, to_status in zip(self.assignments, ['completed', 'in_progress', 'completed', 'blocked'])
+        ]
+        # savepoint, read, one UPDATE per target status, stats row upsert and update, release
+        with self.assertNumQueries(1 + 1 + 3 + 2 + 1):
+            response = self._post(transitions)
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual([row['version'] for row in data], [1, 1, 1, 1])
+
+        completed = TaskAssignment.objects.get(pk=self.assignments[0].pk)
+        self.assertEqual(completed.status, 'completed')
+        self.assertIsNotNone(completed.completed_at)
+        self.assertEqual(data[0]['updated_at'], completed.updated_at.isoformat().replace('+00:00', 'Z'))
+        stats = UserTaskStatsService.get_stats(self.user.id)
+        self.assertEqual((stats.pending, stats.completed, stats.in_progress, stats.blocked), (0, 2, 1, 1))
+
+    def test_stale_precondition_conflicts_and_writes_nothing(self):
+        first, second = self.assignments[:2]
+        TaskService.transition(
+            self.user.id, [{'assignment': second.id, 'from_status': 'pending', 'to_status': 'review'}]
+        )
+        response = self._post([
+            {'assignment': first.id, 'from_status': 'pending', 'to_status': 'in_progress'},
+            {'assignment': second.id, 'from_status': 'pending', 'to_status': 'in_progress', 'version': 0},
+        ])
+        self.assertEqual(response.status_code, 409)
+        conflicts = response.data['data']
+        self.assertEqual([(row['assignment'], row['status'], row['version']) for row in conflicts],
+                         [(second.id, 'review', 1)])
+        self.assertEqual(TaskAssignment.objects.get(pk=first.id).status, 'pending')
+
+    def test_updated_at_precondition(self):
+        assignment = self.assignments[0]
+        response = self._post([{
+            'assignment': assignment.id, 'from_status': 'pending', 'to_status': 'review',
+            'updated_at': assignment.updated_at.isoformat(),
+        }])
+        self.assertEqual(response.status_code, 200)
+        # reusing the old updated_at is stale now
+        response = self._post([{
+            'assignment': assignment.id, 'from_status': 'review', 'to_status': 'completed',
+            'updated_at': assignment.updated_at.isoformat(),
+        }])
+        self.assertEqual(response.status_code, 409)
+
+    def test_concurrent_writer_between_read_and_update(self):
+        assignment = self.assignments[0]
+        in_bulk = QuerySet.in_bulk
+
+        def read_then_race(queryset, *args, **kwargs):
+            rows = in_bulk(queryset, *args, **kwargs)
+            TaskAssignment.objects.filter(pk=assignment.pk).update(version=5)
+            return rows
+
+        with mock.patch.object(QuerySet, 'in_bulk', autospec=True, side_effect=read_then_race):
+            with self.assertRaises(TransitionConflict) as raised:
+                TaskService.transition(self.user.id, [
+                    {'assignment': assignment.pk, 'from_status': 'pending', 'to_status': 'in_progress'}
+                ])
+        self.assertEqual(raised.exception.conflicts[0]['version'], 5)
+
+    def test_invalid_batches(self):
+        assignment = self.assignments[0]
+        item = {'assignment': assignment.id, 'from_status': 'pending', 'to_status': 'review'}
+        self.assertEqual(self._post([item, item]).status_code, 400)
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post([dict(item, assignment=0)]).status_code, 400)
+        self.assertEqual(self._post([dict(item, assignment=10 ** 9)]).status_code, 409)
+
+    def test_assignments_of_other_users_look_missing(self):
+        other = create_test_user('other')
+        task = TaskService.create_task('not mine', '', [other])
+        foreign = TaskAssignment.objects.get(task=task, user=other)
+        response = self._post([
+            {'assignment': self.assignments[0].id, 'from_status': 'pending', 'to_status': 'review'},
+            {'assignment': foreign.id, 'from_status': 'pending', 'to_status': 'review'},
+            {'assignment': 10 ** 9, 'from_status': 'pending', 'to_status': 'review'},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            [(row['assignment'], row['status'], row['version']) for row in response.data['data']],
+            [(foreign.id, None, None), (10 ** 9, None, None)]
+        )
+        self.assertEqual(TaskAssignment.objects.get(pk=foreign.pk).status, 'pending')
+        self.assertEqual(TaskAssignment.objects.get(pk=self.assignments[0].pk).status, 'pending')
+
+
+class BulkTaskCreateTest(TestCase):
+    """
+    Bulk task creation, all or nothing and best effort
+    """
+    BULK_URL = '/api/v1/task/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_test_user(f'user{index}') for index in range(3)]
+
+    def setUp(self):
+        self.client = authenticated_client(self.users[0])
+
+    def _tasks(self, count, users=None):
+        user_ids = [user.id for user in (users or self.users)]
+        return [{'name': f'task {index}', 'priority': 3, 'assigned_users': user_ids} for index in range(count)]
+
+    def test_queries_do_not_grow_with_the_tasks(self):
+        # user lookup, savepoint, tasks insert, assignments insert, stats row upsert and update, release
+        # (SQLite splits an INSERT past its variable limit, ~110 assignments, PostgreSQL does not)
+        with self.assertNumQueries(7):
+            TaskService.create_tasks(self._tasks(5))
+        with self.assertNumQueries(7):
+            results = TaskService.create_tasks(self._tasks(30))
+        self.assertEqual(TaskAssignment.objects.filter(task_id=results[0]['id']).count(), 3)
+        self.assertEqual(UserTaskStatsService.get_stats(self.users[1].id).pending, 35)
+
+    def test_ids_come_back_in_input_order_across_chunks(self):
+        results = TaskService.create_tasks(self._tasks(7), batch_size=3)
+        tasks = Task.objects.in_bulk([result['id'] for result in results])
+        self.assertEqual([tasks[result['id']].name for result in results], [f'task {index}' for index in range(7)])
+        self.assertTrue(all(tasks[result['id']].priority == 3 for result in results))
+        primary = TaskAssignment.objects.get(task_id=results[0]['id'], is_primary_assignee=True)
+        self.assertEqual(primary.user_id, self.users[0].id)
+
+    def test_atomic_batch_with_an_unknown_user_writes_nothing(self):
+        tasks = self._tasks(2)
+        tasks[1]['assigned_users'] = [self.users[0].id, 10 ** 9]
+        response = self.client.post(self.BULK_URL, {'tasks': tasks}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['data']['tasks']
+        self.assertEqual(errors[0], {})
+        self.assertIn(str(10 ** 9), errors[1]['assigned_users'][0])
+        self.assertFalse(Task.objects.exists())
+
+    def test_atomic_batch_with_an_invalid_task(self):
+        response = self.client.post(self.BULK_URL, {'tasks': [{'name': 'a'}, {'priority': 9}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['data']['tasks'][1]), {'name', 'priority'})
+        self.assertFalse(Task.objects.exists())
+
+    def test_best_effort_creates_the_valid_tasks(self):
+        tasks = [{'name': 'a'}, {'priority': 9}, {'name': 'c', 'assigned_users': [10 ** 9]}, 'd', {'name': 'e'}]
+        response = self.client.post(self.BULK_URL, {'tasks': tasks, 'atomic': False}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        results = response.data['data']
+        self.assertEqual(
+            [result['status'] for result in results],
+            [TaskService.CREATED, TaskService.ERROR, TaskService.ERROR, TaskService.ERROR, TaskService.CREATED]
+        )
+        self.assertEqual(Task.objects.get(pk=results[4]['id']).name, 'e')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_best_effort_retries_a_failed_chunk_task_by_task(self):
+        create_chunk = TaskService._create_task_chunk.__func__
+
+        def fail_on_task_b(cls, chunk):
+            if any(item['name'] == 'b' for _, item, _ in chunk):
+                raise IntegrityError('user deleted meanwhile')
+            return create_chunk(cls, chunk)
+
+        with mock.patch.object(TaskService, '_create_task_chunk', classmethod(fail_on_task_b)):
+            results = TaskService.create_tasks([{'name': 'a'}, {'name': 'b'}, {'name': 'c'}], atomic=False)
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'created'])
+        self.assertEqual(sorted(Task.objects.values_list('name', flat=True)), ['a', 'c'])
+
+    def test_atomic_batch_with_a_user_deleted_meanwhile(self):
+        deleted = create_test_user('deleted')
+        deleted_id = deleted.id
+        tasks = [{'name': 'a', 'assigned_users': [self.users[0].id]}, {'name': 'b', 'assigned_users': [deleted_id]}]
+        missing_users = TaskService._missing_users
+        lookups = iter([[[], []]])
+        deleted.delete()
+
+        def stale_then_current(tasks):
+            # the lookup still found the user, it was deleted before the insert
+            return next(lookups, None) or missing_users(tasks)
+
+        with mock.patch.object(TaskService, '_missing_users', side_effect=stale_then_current):
+            # foreign keys are checked on commit, which a test case never reaches
+            with mock.patch.object(TaskService, '_create_task_chunk', side_effect=IntegrityError('FOREIGN KEY')):
+                response = self.client.post(self.BULK_URL, {'tasks': tasks}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['data']['tasks']
+        self.assertEqual(errors[0], {})
+        self.assertIn(str(deleted_id), errors[1]['assigned_users'][0])
+
+        with mock.patch.object(TaskService, '_create_task_chunk', side_effect=IntegrityError('another constraint')):
+            with self.assertRaises(IntegrityError):
+                TaskService.create_tasks(tasks[:1])
+
+    def test_assignments_counted_once_committed(self):
+        create_chunk = TaskService._create_task_chunk.__func__
+
+        def fail_after_insert(cls, chunk):
+            task_ids = create_chunk(cls, chunk)
+            if any(item['name'] == 'b' for _, item, _ in chunk):
+                raise IntegrityError('user deleted meanwhile')
+            return task_ids
+
+        tasks = [{'name': name, 'assigned_users': [self.users[0].id]} for name in ('a', 'b')]
+        with mock.patch('apps.tasks.manager.task_manager.record_task_operation') as record:
+            with mock.patch.object(TaskService, '_create_task_chunk', classmethod(fail_after_insert)):
+                with self.captureOnCommitCallbacks(execute=True):
+                    TaskService.create_tasks(tasks, atomic=False)
+        assigned = [call.args for call in record.call_args_list if call.args[0] == 'assign']
+        # the chunk of both tasks, then b on its own, were rolled back: only a is counted
+        self.assertEqual(assigned, [('assign', TaskService.ASSIGNED, 1)])
+
+    def test_service_raises_for_unknown_users_when_atomic(self):
+        with self.assertRaises(BulkTaskError) as raised:
+            TaskService.create_tasks([{'name': 'a', 'assigned_users': [10 ** 9]}])
+        self.assertEqual(len(raised.exception.errors), 1)
+
+
+class TaskSearchTest(APITestCase):
+    """
+    Full-text task search, on the FTS5 table under SQLite and the tsvector column under PostgreSQL
+    """
+    SEARCH_URL = '/api/v1/task/search/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.deploy = TaskService.create_task('Deploy release', 'ship the build to production', [cls.user])
+        cls.docs = TaskService.create_task('Write docs', 'explain how to deploy', [cls.user])
+        cls.other = TaskService.create_task('Deployment checklist', 'review before shipping')
+
+    def _ids(self, text, **kwargs):
+        return [task.id for task in TaskSearchService.search(text, **kwargs)]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self._ids('deploy'), [self.other.id, self.deploy.id, self.docs.id])
+
+    def test_prefix_and_every_word(self):
+        self.assertEqual(self._ids('prod shi'), [self.deploy.id])
+        self.assertEqual(self._ids('deploy nothing'), [])
+        self.assertEqual(self._ids('"*()'), [])
+
+    def test_index_follows_writes(self):
+        Task.objects.filter(pk=self.docs.pk).update(name='Write guide')
+        self.assertEqual(self._ids('docs'), [])
+        self.assertEqual(self._ids('guide'), [self.docs.id])
+        self.docs.delete()
+        self.assertEqual(self._ids('guide'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'only SQLite drops the triggers of an altered table')
+    def test_dropped_triggers_are_recreated(self):
+        self.assertEqual(TaskSearchService.ensure_sqlite_triggers(), [])
+        with connection.cursor() as cursor:
+            # what a table rebuild by a later migration does
+            cursor.execute('DROP TRIGGER tasks_task_fts_insert')
+        task = TaskService.create_task('Unindexed release', '')
+        self.assertEqual(self._ids('unindexed'), [])
+
+        self.assertEqual(TaskSearchService.ensure_sqlite_triggers(), ['tasks_task_fts_insert'])
+        self.assertEqual(self._ids('unindexed'), [task.id])
+        task = TaskService.create_task('Indexed release', '')
+        self.assertEqual(self._ids('indexed'), [task.id])
+
+    def test_user_scoped_search_endpoint(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.SEARCH_URL, {'q': 'deploy', 'user': self.user.id, 'page_size': 1})
+        data = response.data['data']
+        self.assertEqual([task['id'] for task in data], [self.deploy.id])
+        self.assertEqual(data[0]['user_details']['email'], 'owner@example.com')
+
+        response = self.client.get(self.SEARCH_URL, {'q': 'deploy', 'user': 10 ** 9})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(self.SEARCH_URL).status_code, 400)
+
+
+class QueryPlanAssertionsMixin:
+    """
+    Assertions over the EXPLAIN output of a queryset
+    Understands the PostgreSQL ("Seq Scan on <table>") and SQLite ("SCAN <table>") plan formats
+    """
+
+    @staticmethod
+    def get_query_plan(queryset):
+        """
+        Capture the EXPLAIN output of a queryset
+        """
+        return queryset.explain()
+
+    def assertNoSequentialScan(self, queryset, table):
+        """
+        Fail if the plan of the queryset reads the whole given table
+        """
+        plan = self.get_query_plan(queryset)
+        if connection.vendor == 'postgresql':
+            sequential_scan = f'Seq Scan on {table}'
+        else:
+            sequential_scan = f'SCAN {table}'
+        for line in plan.splitlines():
+            # "SCAN t" must not match "SCAN t USING INDEX ..." which sqlite prints for covering index scans
+            if sequential_scan in line and 'USING' not in line.split(sequential_scan, 1)[1]:
+                self.fail(f'Sequential scan on {table}:\n{plan}')
+
+
+class TaskServiceQueryPlanTest(QueryPlanAssertionsMixin, TestCase):
+    """
+    The TaskService read paths must stay on the task assignment indexes
+    """
+    USERS = 50
+    TASKS = 5000
+    ASSIGNMENTS_PER_TASK = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(email=f'user{index}@example.com', name=f'user {index}') for index in range(cls.USERS)
+        )
+        tasks = Task.objects.bulk_create(Task(name=f'task {index}') for index in range(cls.TASKS))
+        statuses = TaskAssignment.TaskStatus.values
+        TaskAssignment.objects.bulk_create(
+            TaskAssignment(
+                task=task,
+                user=users[(task_index + offset) % cls.USERS],
+                status=statuses[task_index % len(statuses)],
+            )
+            for task_index, task in enumerate(tasks)
+            for offset in range(cls.ASSIGNMENTS_PER_TASK)
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        cls.user = users[0]
+
+    def test_get_user_tasks_uses_index(self):
+        self.assertNoSequentialScan(TaskService.get_user_tasks(self.user), TaskAssignment._meta.db_table)
+
+    def test_get_user_tasks_by_status_uses_index(self):
+        queryset = TaskService.get_user_tasks(self.user, status=TaskAssignment.TaskStatus.PENDING)
+        self.assertNoSequentialScan(queryset, TaskAssignment._meta.db_table)
+
+    def test_user_assignments_by_status_uses_index(self):
+        queryset = TaskAssignment.objects.filter(user=self.user, status=TaskAssignment.TaskStatus.PENDING)
+        self.assertNoSequentialScan(queryset, TaskAssignment._meta.db_table)
+
+    def test_user_open_assignments_uses_index(self):
+        queryset = TaskAssignment.objects.filter(user=self.user).exclude(
+            status=TaskAssignment.TaskStatus.COMPLETED
+        ).order_by('-created_at')
+        self.assertNoSequentialScan(queryset, TaskAssignment._meta.db_table)
+
+    def test_existing_assignment_lookup_uses_index(self):
+        task = Task.objects.first()
+        queryset = TaskAssignment.objects.filter(task=task, user_id__in=[self.user.id])
+        self.assertNoSequentialScan(queryset, TaskAssignment._meta.db_table)
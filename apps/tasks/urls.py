@@ -5,6 +5,7 @@ This file is used for urls or creating endpoint for API'S
 from django.urls import path, include
 from rest_framework import routers
 
+from apps.tasks import async_views
 from apps.tasks.views import TaskViewSet
 
 # Local imports
@@ -14,5 +15,8 @@ router = routers.DefaultRouter()
 router.register('task', TaskViewSet, basename='task')
 
 urlpatterns = [
+    # async read path, served without a thread per request under an ASGI server
+    path('task/async/user-task/', async_views.get_user_task, name='task-async-user-task'),
+    path('task/async/<int:pk>/', async_views.get_task, name='task-async-detail'),
     path(r'', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,54 +1,217 @@
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from apps.tasks.manager.task_manager import TaskService
-from apps.tasks.models import Task
-from apps.tasks.serializer import TaskSerializer, GetTaskSerializer, AssignTaskSerializer
-from apps.users.models import User
+from apps.jobs.views import AsyncJobMixin
+from apps.tasks import jobs
+from apps.tasks.manager.cache_manager import UserTaskCache
+from apps.tasks.manager.export_manager import TaskExportService
+from apps.tasks.manager.search_manager import TaskSearchService
+from apps.tasks.manager.stats_manager import UserTaskStatsService
+from apps.tasks.manager.task_manager import BulkTaskError, TaskService, TransitionConflict
+from apps.tasks.models import Task, TaskAssignment
+from apps.tasks.serializer import (
+    TaskSerializer, GetTaskSerializer, FastGetTaskSerializer, AssignTaskSerializer, UserTaskFilterSerializer,
+    TaskExportSerializer, TaskSearchSerializer, UserTaskStatsSerializer, TaskTransitionBatchSerializer,
+    AssignmentStateSerializer, BulkTaskSerializer
+)
+from apps.users.authentication import get_user_id
 from apps.utils.messages import CustomError
-from apps.utils.utils import CustomModelView
+from apps.utils.pagination import InvalidCursor
+from apps.utils.utils import ConditionalGetMixin, CustomModelView
 
 
-class TaskViewSet(CustomModelView):
+class TaskViewSet(AsyncJobMixin, ConditionalGetMixin, CustomModelView):
     """
     this class is used for signup viewlet where user can sign up
     """
     http_method_names = ('post', 'get',)
+    permission_classes = (IsAuthenticated,)
     serializer_class = TaskSerializer
     queryset = TaskService
+    etag_timestamp_fields = ('updated_at', 'task__updated_at')
+
+    def get_etag_queryset(self):
+        """
+        The user task listing only changes with the user's assignments or their tasks
+        """
+        if self.action == 'get_user_task':
+            return TaskAssignment.objects.filter(user_id=self.request.user.id)
+        return None
 
     def create(self, request, *args, **kwargs):
         """
         this method is used to create a signup data
+        With `Prefer: respond-async` the task is created by a background job, see AsyncJobMixin
         """
         serializer = self.serializer_class(data=request.data)
-        if serializer.is_valid():
-            serializer = serializer.save()
-            serializer = GetTaskSerializer(serializer)
-            return self.success_response(status_code=status.HTTP_201_CREATED, data=serializer.data)
-        return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        if self.wants_async(request):
+            payload = {
+                **serializer.validated_data,
+                'assigned_users': [user.pk for user in serializer.validated_data.get('assigned_users', [])],
+            }
+            return self.enqueue_response(request, jobs.CREATE_TASK, payload)
+        task = serializer.save()
+        return self.success_response(status_code=status.HTTP_201_CREATED, data=GetTaskSerializer(task).data)
+
+    @action(methods=['POST'], detail=False, url_name='bulk', url_path='bulk',
+            serializer_class=BulkTaskSerializer)
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create many tasks at once, e.g.
+        {"tasks": [{"name": "a", "assigned_users": [4, 7]}, {"name": "b", "priority": 3}], "atomic": false}
+        The outcome of every task comes back in input order, {"status": "created", "id": 12} or
+        {"status": "error", "errors": {...}}; an atomic batch is rejected as a whole with a 400 instead
+        """
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        try:
+            results = serializer.save()
+        except BulkTaskError as error:
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data={'tasks': error.errors})
+        return self.success_response(status_code=status.HTTP_201_CREATED, data=results)
 
     @action(methods=['POST'], detail=False, url_name='assign-task', url_path='assign-task',
             serializer_class=AssignTaskSerializer)
     def assign_task(self, request, *args, **kwargs):
+        """
+        Assign a task to users, in a background job with `Prefer: respond-async` (see AsyncJobMixin)
+        """
         serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid() and self.wants_async(request):
+            payload = {
+                'task': serializer.validated_data['task'].pk,
+                'assigned_users': [user.pk for user in serializer.validated_data.get('assigned_users', [])],
+            }
+            return self.enqueue_response(request, jobs.ASSIGN_TASK, payload)
         if serializer.is_valid():
-            serializer = serializer.save()
-            serializer = TaskSerializer(serializer)
-            return self.success_response(status_code=status.HTTP_201_CREATED, data=serializer.data)
+            task = serializer.save()
+            data = TaskSerializer(task).data
+            # per-user outcome of the bulk assignment, e.g. {"4": "assigned", "7": "already_assigned"}
+            data['assignment_results'] = serializer.assignment_results
+            return self.success_response(status_code=status.HTTP_201_CREATED, data=data)
         return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
 
+    @action(methods=['POST'], detail=False, url_name='transition', url_path='transition',
+            serializer_class=TaskTransitionBatchSerializer)
+    def transition(self, request, *args, **kwargs):
+        """
+        Move a batch of assignments of the authenticated user to new statuses, e.g.
+        {"transitions": [{"assignment": 12, "from_status": "pending", "to_status": "in_progress", "version": 0}]}
+        Nothing is written when any assignment is no longer in its expected status (or version / updated_at),
+        the current state of those assignments is returned with a 409
+        """
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        try:
+            results = TaskService.transition(request.user.id, serializer.validated_data['transitions'])
+        except TransitionConflict as conflict:
+            conflicts = AssignmentStateSerializer(conflict.conflicts, many=True).data
+            return self.failure_response(
+                status_code=status.HTTP_409_CONFLICT, data=conflicts,
+                message=CustomError.get_error_message('TRANSITION_CONFLICT')
+            )
+        return self.success_response(
+            status_code=status.HTTP_200_OK, data=AssignmentStateSerializer(results, many=True).data
+        )
+
     @action(methods=['GET'], detail=False, url_name='user-task', url_path='user-task',
             serializer_class=GetTaskSerializer)
     def get_user_task(self, request, *args, **kwargs):
-        user_id = self.request.query_params.get('user', None)
-        user_id = '6'
-        if user_id is None:
+        """
+        Tasks of the authenticated user, newest first
+        The user comes from the token, no User row is read
+        """
+        user_id = get_user_id(request.user, self.request.query_params.get('user'))
+        filter_serializer = UserTaskFilterSerializer(data=self.request.query_params)
+        if not filter_serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=filter_serializer.errors)
+        filters = filter_serializer.validated_data
+        counts_by_status = filters.pop('counts_by_status')
+        filters_key = ':'.join(f'{key}={value}' for key, value in sorted(filters.items()))
+
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
+
+        if counts_by_status:
+            def build_counts():
+                return TaskService.count_user_tasks_by_status(user_id, **filters)
+
+            counts = UserTaskCache.get_or_build(user_id, f'counts:{filters_key}', build_counts)
+            return self.success_response(status_code=status.HTTP_200_OK, data=counts)
+
+        cursor = self.request.query_params.get('cursor')
+        page_size = self.request.query_params.get('page_size')
+
+        def build_page():
+            tasks, cursors = TaskService.get_user_task_page(user_id, cursor=cursor, page_size=page_size, **filters)
+            data = FastGetTaskSerializer.many(tasks, context={'user_id': user_id})
+            return {'data': data, 'cursors': cursors}
+
+        try:
+            page = UserTaskCache.get_or_build(user_id, f'page:{cursor}:{page_size}:{filters_key}', build_page)
+        except InvalidCursor:
+            return self.failure_response(
+                status_code=status.HTTP_400_BAD_REQUEST, data=CustomError.get_error_message('INVALID_CURSOR')
+            )
+        except ValueError:
             return self.failure_response(
-                status_code=status.HTTP_400_BAD_REQUEST, data=CustomError.get_error_message('USER_ID_REQUIRED')
+                status_code=status.HTTP_400_BAD_REQUEST, data=CustomError.get_error_message('INVALID_PAGE_SIZE')
             )
-        user = User.objects.get(id=user_id)
-        serializer = self.serializer_class(
-            TaskService.get_user_tasks(user), context={'user_id': user_id}, many=True
+        return self.success_response(status_code=status.HTTP_200_OK, data=page['data'], cursors=page['cursors'])
+
+    @action(methods=['GET'], detail=False, url_name='search', url_path='search',
+            serializer_class=TaskSearchSerializer)
+    def search(self, request, *args, **kwargs):
+        """
+        Full-text search over task names and descriptions, best matches first
+        ?q=<words> matches tasks containing every word (as a prefix), ?user=<own id> only searches the user's tasks
+        """
+        serializer = self.serializer_class(data=request.query_params)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+        user_id = serializer.validated_data.get('user')
+        if user_id is not None:
+            user_id = get_user_id(request.user, user_id)
+        tasks = TaskSearchService.search(
+            serializer.validated_data['q'], user=user_id, limit=serializer.validated_data.get('page_size')
         )
+        data = FastGetTaskSerializer.many(tasks, context={'user_id': user_id})
+        return self.success_response(status_code=status.HTTP_200_OK, data=data)
+
+    @action(methods=['GET'], detail=False, url_name='stats', url_path='stats',
+            serializer_class=UserTaskStatsSerializer)
+    def stats(self, request, *args, **kwargs):
+        """
+        Task dashboard of the authenticated user: assignment counts per status and average time to completion
+        Served from the UserTaskStats summary row, a single primary key lookup whatever the number of tasks
+        """
+        user_id = get_user_id(request.user, self.request.query_params.get('user'))
+        serializer = self.serializer_class(UserTaskStatsService.get_stats(user_id))
         return self.success_response(status_code=status.HTTP_200_OK, data=serializer.data)
+
+    @action(methods=['GET'], detail=False, url_name='export', url_path='export',
+            serializer_class=TaskExportSerializer, permission_classes=[IsAdminUser])
+    def export(self, request, *args, **kwargs):
+        """
+        Staff only, stream every task (kind=tasks) or task assignment (kind=assignments) as NDJSON or CSV
+        Rows come in id order, pass the last id received as after_id to resume an interrupted export
+        """
+        serializer = self.serializer_class(data=request.query_params)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+
+        kind = serializer.validated_data['kind']
+        file_format = serializer.validated_data['file_format']
+        response = StreamingHttpResponse(
+            TaskExportService.export(kind, file_format, after_id=serializer.validated_data.get('after_id')),
+            content_type=TaskExportService.CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{file_format}"'
+        return response
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
+
+    def ready(self):
+        from apps.users.managers.token_manager import TokenService
+        from apps.users.models import User
+        # a deactivated or deleted user is read again on its next request
+        post_save.connect(TokenService.forget_user, sender=User, dispatch_uid='token_forget_saved_user')
+        post_delete.connect(TokenService.forget_user, sender=User, dispatch_uid='token_forget_deleted_user')
@@ -0,0 +1,78 @@
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser as BaseTokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.users.managers.token_manager import TokenService
+from apps.utils.db_router import set_request_user
+from apps.utils.messages import CustomError
+
+
+class TokenUser(BaseTokenUser):
+    """
+    The requesting user, built from the access token claims instead of a User row
+    """
+
+    @cached_property
+    def name(self):
+        return self.token.get('name', '')
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication resolving the user from the token claims
+
+    The only database read is the user's active / revocation state, cached per process
+    by TokenService, so most requests are authenticated without any query.
+    The user is bound to the database routing of the request, for its read-your-writes window.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(CustomError.get_error_message('TOKEN_WITHOUT_USER'))
+        self.check_user_state(TokenService.get_user_state(user_id), validated_token)
+        set_request_user(user_id)
+        return TokenUser(validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of `authenticate` for the plain Django async views
+        raise NotAuthenticated without token, AuthenticationFailed for an invalid one
+        return the TokenUser
+        """
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            raise NotAuthenticated()
+        validated_token = self.get_validated_token(raw_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(CustomError.get_error_message('TOKEN_WITHOUT_USER'))
+        self.check_user_state(await TokenService.aget_user_state(user_id), validated_token)
+        set_request_user(user_id)
+        return TokenUser(validated_token)
+
+    @staticmethod
+    def check_user_state(state, token):
+        if not TokenService.is_token_usable(state, token):
+            raise AuthenticationFailed(CustomError.get_error_message('TOKEN_REVOKED'), code='token_revoked')
+
+
+def get_user_id(user, requested_user_id=None):
+    """
+    Id of the user a request reads the tasks of: the authenticated user
+    `?user=<id>` of the clients predating the tokens is still accepted, for their own id only
+    raise PermissionDenied for the id of another user
+    """
+    if requested_user_id is not None and str(requested_user_id) != str(user.id):
+        raise PermissionDenied(CustomError.get_error_message('USER_MISMATCH'))
+    return user.id
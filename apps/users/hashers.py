@@ -0,0 +1,39 @@
+"""
+Password hashers whose cost is read from settings, so the CPU spent per signup/login can be sized
+per deployment (see PASSWORD_HASHER_PROFILE in settings.py).
+
+Changing a cost setting is transparent for existing users: Django's `check_password` notices that a
+stored hash was made with other parameters (`must_update`) and re-hashes the password on the next
+successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count of settings.PASSWORD_PBKDF2_ITERATIONS
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with the costs of settings.PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_COST (KiB)
+    and PASSWORD_ARGON2_PARALLELISM
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
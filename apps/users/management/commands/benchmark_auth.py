@@ -0,0 +1,106 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.users.authentication import CachedJWTAuthentication
+from apps.users.managers.token_manager import TokenService
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Measure the authentication overhead per request: JWT resolved from its claims (user state
+    cached or not), simplejwt's default JWT authentication (one User row per request) and
+    session authentication (session row, then User row)
+
+        python manage.py benchmark_auth
+        python manage.py benchmark_auth --requests 20000
+
+    Only authentication runs, not the views. The benchmark user (BENCH_EMAIL) and its session are
+    deleted afterwards. Point it at a scratch database, not production.
+    """
+    help = 'Benchmark JWT and session authentication overhead per request'
+
+    BENCH_EMAIL = 'user@auth-bench.invalid'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='requests authenticated per strategy')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(email=self.BENCH_EMAIL, password=None, name='auth bench')
+        session = self._create_session(user)
+        try:
+            self._run(user, session, options['requests'])
+        finally:
+            session.delete()
+            user.delete()
+
+    def _run(self, user, session, count):
+        factory = RequestFactory()
+        bearer = f'Bearer {TokenService.issue_tokens(user).access_token}'
+
+        def jwt_request():
+            return Request(factory.get('/', HTTP_AUTHORIZATION=bearer))
+
+        def session_request():
+            request = factory.get('/')
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = session.session_key
+            SessionMiddleware(lambda request: None).process_request(request)
+            AuthenticationMiddleware(lambda request: None).process_request(request)
+            return Request(request)
+
+        def cold_jwt(request):
+            TokenService.cache.invalidate(user.pk)
+            return CachedJWTAuthentication().authenticate(request)
+
+        strategies = {
+            'jwt, cached user state': (jwt_request, CachedJWTAuthentication().authenticate),
+            'jwt, user state miss': (jwt_request, cold_jwt),
+            'jwt, simplejwt default': (jwt_request, JWTAuthentication().authenticate),
+            'session': (session_request, SessionAuthentication().authenticate),
+        }
+        self.stdout.write(f'{count} requests per strategy, {connection.vendor} database')
+        for name, (build_request, authenticate) in strategies.items():
+            authenticate(build_request())
+            latencies = []
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                for _ in range(count):
+                    # building the request is not part of the measure, the middlewares are lazy
+                    request = build_request()
+                    started = time.perf_counter()
+                    authenticate(request)
+                    latencies.append((time.perf_counter() - started) * 10 ** 6)
+            latencies.sort()
+            self.stdout.write(
+                f'{name:<24} p50 {self._percentile(latencies, 50):8.1f} µs'
+                f'  p95 {self._percentile(latencies, 95):8.1f} µs'
+                f'  p99 {self._percentile(latencies, 99):8.1f} µs'
+                f'  {len(queries) / count:.2f} queries/request'
+            )
+
+    @staticmethod
+    def _percentile(latencies, percentile):
+        return latencies[min(len(latencies) - 1, len(latencies) * percentile // 100)]
+
+    @staticmethod
+    def _create_session(user):
+        """
+        Session of a logged in user, as django.contrib.auth.login stores it
+        """
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
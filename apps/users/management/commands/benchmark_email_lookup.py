@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Compare the old `email__iexact` lookup with the `Lower('email')` lookup served by the
+    users_user_email_lower_uniq index, on a table seeded with many users
+
+        python manage.py benchmark_email_lookup --seed 1000000
+        python manage.py benchmark_email_lookup --lookups 2000
+        python manage.py benchmark_email_lookup --cleanup
+
+    Seeded users live under the BENCH_DOMAIN domain and are never able to log in.
+    Point it at a scratch database, not production.
+    """
+    help = 'Benchmark case-insensitive email lookups on a seeded users table'
+
+    BENCH_DOMAIN = 'email-bench.invalid'
+    SEED_BATCH_SIZE = 10000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='number of users to seed first')
+        parser.add_argument('--lookups', type=int, default=1000, help='lookups per strategy')
+        parser.add_argument('--cleanup', action='store_true', help='delete the seeded users and exit')
+
+    def handle(self, *args, **options):
+        seeded = User.objects.filter(email__endswith=f'@{self.BENCH_DOMAIN}')
+        if options['cleanup']:
+            deleted, _ = seeded.delete()
+            self.stdout.write(f'{deleted} rows deleted')
+            return
+
+        if options['seed']:
+            self._seed(seeded.count(), options['seed'])
+        total = seeded.count()
+        if not total:
+            self.stdout.write(self.style.ERROR('No seeded users, run with --seed first'))
+            return
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {User._meta.db_table}')
+
+        # look up existing users with a different case than stored
+        emails = [f'User{random.randrange(total)}@{self.BENCH_DOMAIN.upper()}' for _ in range(options['lookups'])]
+        strategies = {
+            'email__iexact': lambda email: User.objects.filter(email__iexact=email),
+            "Lower('email')": lambda email: User.objects.filter_emails([email]),
+        }
+        self.stdout.write(f'{total} seeded users, {options["lookups"]} lookups per strategy')
+        for name, build_queryset in strategies.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(build_queryset(emails[0]).explain())
+            started = time.perf_counter()
+            for email in emails:
+                build_queryset(email).exists()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {elapsed / len(emails) * 1000:.3f} ms per lookup')
+
+    def _seed(self, start, count):
+        """
+        Insert `count` users after the `start` already seeded ones, with an unusable password
+        """
+        for offset in range(0, count, self.SEED_BATCH_SIZE):
+            size = min(self.SEED_BATCH_SIZE, count - offset)
+            User.objects.bulk_create(
+                User(email=f'user{start + offset + index}@{self.BENCH_DOMAIN}', name='bench', password='!')
+                for index in range(size)
+            )
+            self.stdout.write(f'seeded {offset + size}/{count}', ending='\r')
+        self.stdout.write('')
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.hashers import TunedArgon2PasswordHasher, TunedPBKDF2PasswordHasher
+
+
+class Command(BaseCommand):
+    """
+    Report hashes/sec of every password hasher profile with the current cost settings
+
+        python manage.py benchmark_password_hashers
+        PASSWORD_PBKDF2_ITERATIONS=200000 python manage.py benchmark_password_hashers --rounds 50
+
+    One hash is what a signup or a login costs, so hashes/sec per core bounds the signup
+    throughput of a worker.
+    """
+    help = 'Benchmark hashes/sec of the pbkdf2 and argon2 password hasher profiles'
+
+    PROFILES = {
+        'pbkdf2': TunedPBKDF2PasswordHasher,
+        'argon2': TunedArgon2PasswordHasher,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help='number of hashes per profile')
+
+    def handle(self, *args, **options):
+        for name, hasher_class in self.PROFILES.items():
+            hasher = hasher_class()
+            try:
+                hasher.encode('warm-up-password', hasher.salt())
+            except ValueError as e:
+                # argon2 without argon2-cffi installed
+                self.stdout.write(self.style.WARNING(f'{name}: skipped, {e}'))
+                continue
+
+            started = time.perf_counter()
+            for _ in range(options['rounds']):
+                hasher.encode('benchmark-password', hasher.salt())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name}: {options["rounds"] / elapsed:.1f} hashes/sec '
+                f'({elapsed / options["rounds"] * 1000:.1f} ms per hash)'
+            )
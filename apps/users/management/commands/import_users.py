@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.managers.import_manager import UserImportService
+
+
+class Command(BaseCommand):
+    """
+    Create users in bulk from a CSV (email,name,mobile,password header) or JSONL file
+
+        python manage.py import_users users.csv --processes 8 > report.jsonl
+        cat users.jsonl | python manage.py import_users - --format jsonl
+
+    One JSON report line is written per input row as soon as its batch is imported.
+    """
+    help = 'Bulk create users from a CSV or JSONL file, writing a per-row JSONL report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import, - reads stdin')
+        parser.add_argument('--format', dest='file_format', choices=UserImportService.FORMATS,
+                            help='input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=UserImportService.DEFAULT_BATCH_SIZE,
+                            help='rows validated, hashed and inserted together')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                            help='processes hashing passwords (default: CPU count)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format']
+        if file_format is None:
+            file_format = path.rsplit('.', 1)[-1].lower()
+            if file_format not in UserImportService.FORMATS:
+                raise CommandError('Cannot guess the input format, use --format')
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        created = errors = 0
+        try:
+            rows = UserImportService.read_rows(stream, file_format)
+            for report in UserImportService.import_users(
+                rows, batch_size=options['batch_size'], processes=options['processes']
+            ):
+                if report['status'] == UserImportService.CREATED:
+                    created += 1
+                else:
+                    errors += 1
+                self.stdout.write(json.dumps(report))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stderr.write(f'{created} users created, {errors} rows failed')
@@ -0,0 +1,159 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from apps.users.models import User
+from apps.users.serializer import ImportUserSerializer
+from apps.utils.messages import CustomError
+
+
+def _hash_password(password):
+    """
+    Hash one password, module level so it can run in a worker process
+    """
+    return make_password(password)
+
+
+class UserImportService:
+    """
+    This class is responsible to create users in bulk from a CSV or JSONL stream
+
+    Rows are read lazily and processed in batches: one query per batch finds the emails already
+    taken, passwords are hashed across a process pool and users are written with bulk_create.
+    The per-row report is yielded as it is produced, so neither the input nor the report is
+    ever held in memory.
+    """
+    CSV = 'csv'
+    JSONL = 'jsonl'
+    FORMATS = (CSV, JSONL)
+
+    # Outcome of a single row
+    CREATED = 'created'
+    ERROR = 'error'
+
+    DEFAULT_BATCH_SIZE = 500
+
+    @classmethod
+    def read_rows(cls, stream, file_format):
+        """
+        Yield (row number, row dict) from a text stream, rows that cannot be parsed yield None
+        :param stream: text stream of the CSV (with a header line) or JSONL input
+        :param file_format: CSV or JSONL
+        """
+        if file_format == cls.CSV:
+            # the header is line 1, so data rows are numbered like the lines of the file
+            yield from enumerate(csv.DictReader(stream), start=2)
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+    @classmethod
+    def count_rows(cls, stream, file_format, stop_after=None):
+        """
+        Number of rows of a text stream, counting stops at `stop_after` rows
+        Only parses the rows, nothing is validated or hashed.
+        """
+        return sum(1 for _ in islice(cls.read_rows(stream, file_format), stop_after))
+
+    @classmethod
+    def import_users(cls, rows, batch_size=None, processes=1):
+        """
+        Create users from rows, yield one report dict per row in input order
+        :param rows: iterable of (row number, row dict) as returned by read_rows
+        :param batch_size: number of rows validated, hashed and inserted together
+        :param processes: number of processes hashing passwords, 1 hashes in this process
+        """
+        rows = iter(rows)
+        batch_size = batch_size or cls.DEFAULT_BATCH_SIZE
+        executor = ProcessPoolExecutor(max_workers=processes, initializer=django.setup) if processes > 1 else None
+        try:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                yield from cls._import_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    @classmethod
+    def _import_batch(cls, batch, executor):
+        reports = {}
+        valid = []
+        for row_number, row in batch:
+            if row is None:
+                reports[row_number] = cls._error(row_number, None, CustomError.INVALID_IMPORT_ROW)
+                continue
+            serializer = ImportUserSerializer(data=row)
+            if not serializer.is_valid():
+                reports[row_number] = cls._error(row_number, row.get('email'), serializer.errors)
+                continue
+            valid.append((row_number, serializer.validated_data))
+
+        # one set based lookup for the whole batch, emails are compared case-insensitively
+        emails = {data['email'] for _, data in valid}
+        taken = set(User.objects.filter_emails(emails).values_list('email_lower', flat=True))
+
+        new_users = []
+        for row_number, data in valid:
+            if data['email'] in taken:
+                reports[row_number] = cls._error(row_number, data['email'], CustomError.EMAIL_ALREADY_EXISTS)
+                continue
+            # duplicates inside the input keep their first occurrence
+            taken.add(data['email'])
+            new_users.append((row_number, data))
+
+        passwords = [data.pop('password') for _, data in new_users]
+        if executor is not None:
+            hashes = list(executor.map(_hash_password, passwords, chunksize=max(1, len(passwords) // 32)))
+        else:
+            hashes = [_hash_password(password) for password in passwords]
+
+        users = [User(password=password_hash, **data) for (_, data), password_hash in zip(new_users, hashes)]
+        cls._create_users(users)
+        for (row_number, data), user in zip(new_users, users):
+            if user.pk is None:
+                reports[row_number] = cls._error(row_number, data['email'], CustomError.EMAIL_ALREADY_EXISTS)
+            else:
+                reports[row_number] = {'row': row_number, 'email': user.email, 'status': cls.CREATED, 'id': user.pk}
+
+        for row_number, _ in batch:
+            yield reports[row_number]
+
+    @classmethod
+    def _create_users(cls, users):
+        """
+        Insert the users with one statement, falling back to one insert per user when a concurrent
+        signup took one of the emails in the meantime; users that could not be created keep pk None
+        """
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            return
+        except IntegrityError:
+            for user in users:
+                user.pk = None
+                user._state.adding = True
+
+        for user in users:
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+            except IntegrityError:
+                user.pk = None
+
+    @classmethod
+    def _error(cls, row_number, email, errors):
+        return {'row': row_number, 'email': email, 'status': cls.ERROR, 'errors': errors}
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db.models import F
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.users.models import User
+from apps.utils.db_router import read_from_primary
+
+# what a request needs to know about the user behind a token
+UserState = namedtuple('UserState', ('is_active', 'token_version', 'is_staff'))
+
+# users deleted since their token was issued
+MISSING_USER = UserState(is_active=False, token_version=None, is_staff=False)
+
+
+class UserStateCache:
+    """
+    Per-process LRU of UserState by user id, entries expire `ttl` seconds after being read from the database
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        return the cached state, or None when missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            state, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return state
+
+    def set(self, user_id, state):
+        with self._lock:
+            self._entries[user_id] = (state, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenService:
+    """
+    This class is responsible to issue the JWTs and to tell whether the user behind a token may still use it
+
+    Tokens carry the user's id, name, email and staff flag, so authenticating a request reads no User row.
+    Only `is_active`, `token_version` (revocation) and `is_staff` come from the database, through a
+    per-process cache: deactivating a user, revoking their tokens or changing their staff flag takes
+    effect at once in the process that did it, and within settings.JWT_USER_CACHE_TTL seconds in the others.
+    """
+    cache = UserStateCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+    STATE_FIELDS = ('is_active', 'token_version', 'is_staff')
+
+    @classmethod
+    def issue_tokens(cls, user):
+        """
+        Refresh token of a user, with the claims copied to its access tokens
+        :param user: user instance
+        """
+        refresh = RefreshToken.for_user(user)
+        refresh['name'] = user.name
+        refresh['email'] = user.email
+        refresh['token_version'] = user.token_version
+        refresh['is_staff'] = user.is_staff
+        return refresh
+
+    @classmethod
+    def get_user_state(cls, user_id):
+        """
+        return the UserState of the user, read from the database on a cache miss
+        """
+        state = cls.cache.get(user_id)
+        if state is None:
+            # order_by(): a primary key lookup, the default ordering of users is useless here
+            # from the primary: a lagging replica would let a revoked token through and cache that
+            with read_from_primary():
+                row = User.objects.filter(pk=user_id).order_by().values_list(*cls.STATE_FIELDS).first()
+            state = UserState(*row) if row else MISSING_USER
+            cls.cache.set(user_id, state)
+        return state
+
+    @classmethod
+    async def aget_user_state(cls, user_id):
+        """
+        Async counterpart of get_user_state
+        """
+        state = cls.cache.get(user_id)
+        if state is None:
+            with read_from_primary():
+                row = await User.objects.filter(pk=user_id).order_by().values_list(*cls.STATE_FIELDS).afirst()
+            state = UserState(*row) if row else MISSING_USER
+            cls.cache.set(user_id, state)
+        return state
+
+    @classmethod
+    def is_token_usable(cls, state, token):
+        """
+        The user is active, the token was issued after their last revocation and claims their current staff flag
+        """
+        return (
+            state.is_active and token.get('token_version') == state.token_version
+            and token.get('is_staff', False) == state.is_staff
+        )
+
+    @classmethod
+    def revoke_tokens(cls, user_id):
+        """
+        Invalidate every token issued to the user so far, e.g. on logout from all devices
+        """
+        User.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+        cls.cache.invalidate(user_id)
+
+    @classmethod
+    def forget_user(cls, sender, instance, **kwargs):
+        """
+        post_save / post_delete receiver of User
+        """
+        cls.cache.invalidate(instance.pk)
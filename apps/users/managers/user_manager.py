@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db.models.functions import Lower
 
 
 class UserManager(BaseUserManager):
@@ -15,6 +16,16 @@ class UserManager(BaseUserManager):
         email = email or ''
         return email.lower()
 
+    def filter_emails(self, emails):
+        """
+        users having one of the given emails, compared case-insensitively
+        Filters on Lower('email') so the users_user_email_lower_uniq index is used,
+        the lowercased email is available as `email_lower`
+        :param emails: iterable of emails
+        """
+        emails = [self.normalize_email(email) for email in emails]
+        return self.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+
     def _create_user(self, email, password, **extra_fields):
         """
         create a new user and save data in database
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:30
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+
+
+def check_case_duplicates(apps, schema_editor):
+    """
+    Abort before adding the constraint when emails differ only by case: which account to keep
+    (and what to do with its tasks and assignments) is a decision for the operator, not the migration
+    """
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .annotate(email_lower=django.db.models.functions.text.Lower('email'))
+        .values('email_lower')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('email_lower')
+        .values_list('email_lower', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            f'{len(duplicates)} email(s) are used by several users with a different case: {", ".join(duplicates[:20])}. '
+            'Merge or rename these users (e.g. User.objects.filter(email__iexact=...)) and run the migration again.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='users_user_email_lower_uniq'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 from apps.users.managers.user_manager import UserManager
@@ -15,6 +16,8 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # copied into the JWTs, bumped to revoke every token issued so far (TokenService.revoke_tokens)
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name']
@@ -28,3 +31,7 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['-created_at']
+        constraints = [
+            # emails are case-insensitive, this index also serves Lower('email') lookups
+            models.UniqueConstraint(Lower('email'), name='users_user_email_lower_uniq'),
+        ]
@@ -1,18 +1,24 @@
 import logging
 
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 from rest_framework import serializers
-from django.db import IntegrityError, DatabaseError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import IntegrityError, DatabaseError, transaction
+from apps.users.managers.token_manager import TokenService
 from apps.users.models import User
+from apps.utils.db_router import read_from_primary
 from apps.utils.messages import CustomError
+from apps.utils.serializer import FastSerializer
 
 logger = logging.getLogger(__name__)
 
 
-class SignupSerializer(serializers.ModelSerializer):
+class UserFieldsSerializer(serializers.Serializer):
     """
-    This serializer class is used to serialize a signup data
+    This serializer class holds the fields and validation of a new user, shared by signup and the bulk import
     """
 
     name = serializers.CharField(
@@ -43,14 +49,16 @@ class SignupSerializer(serializers.ModelSerializer):
     @staticmethod
     def validate_email(value):
         """
-        This function is used to validate that the email is unique.
+        This function is used to normalize the email the same way UserManager does.
+        Uniqueness is enforced by the users_user_email_lower_uniq constraint when the user is created.
         """
-        try:
-            user = User.objects.get(email__iexact=value)
-            raise serializers.ValidationError(CustomError.EMAIL_ALREADY_EXISTS)
-        except ObjectDoesNotExist:
-            pass
-        return value
+        return User.objects.normalize_email(value)
+
+
+class SignupSerializer(UserFieldsSerializer, serializers.ModelSerializer):
+    """
+    This serializer class is used to serialize a signup data
+    """
 
     def to_representation(self, obj):
         """
@@ -66,16 +74,17 @@ class SignupSerializer(serializers.ModelSerializer):
         This method is used to create a new user with the provided data.
         """
         try:
-            password = validated_data.pop('password')
-            user_obj = User.objects.create(**validated_data)
-            print(validated_data)
-            user_obj.set_password(password)
-            user_obj.save()
+            # hashes the password before the row is built, so the user is written with a single INSERT;
+            # the savepoint keeps a unique violation from breaking an enclosing transaction
+            with transaction.atomic():
+                user_obj = User.objects.create_user(**validated_data)
 
             logger.info(f"User {user_obj.email} created successfully.")
             return user_obj
 
         except IntegrityError as e:
+            if User.objects.filter_emails([validated_data['email']]).exists():
+                raise serializers.ValidationError({'email': [CustomError.EMAIL_ALREADY_EXISTS]})
             logger.error(f"IntegrityError occurred: {str(e)}. Failed to create user.")
             raise serializers.ValidationError(CustomError.SERVER_NOT_ABLE_PROCESS_REQUEST)
         except DatabaseError as e:
@@ -93,8 +102,75 @@ class SignupSerializer(serializers.ModelSerializer):
         fields = ('email', 'name', 'mobile', 'password',)
 
 
+class ImportUserSerializer(UserFieldsSerializer):
+    """
+    This serializer class is used to validate one row of a bulk user import
+    The users are created by UserImportService, which checks email uniqueness for a whole batch at once
+    """
+
+
+class ImportUsersSerializer(serializers.Serializer):
+    """
+    This serializer class is used to validate a bulk user import upload
+    """
+    file = serializers.FileField(required=True)
+    file_format = serializers.ChoiceField(choices=('csv', 'jsonl'), required=False)
+
+    def validate(self, attrs):
+        """
+        Guess the format from the file extension when it is not given
+        """
+        if 'file_format' not in attrs:
+            extension = attrs['file'].name.rsplit('.', 1)[-1].lower()
+            if extension not in ('csv', 'jsonl'):
+                raise serializers.ValidationError({'file_format': CustomError.IMPORT_FORMAT_REQUIRED})
+            attrs['file_format'] = extension
+        return attrs
+
+
 class GetUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'name', 'mobile',)
         read_only_fields = fields
+
+
+class FastGetUserSerializer(FastSerializer):
+    """
+    Fast path of GetUserSerializer for lists, same output
+    """
+    serializer_class = GetUserSerializer
+
+
+class TokenObtainSerializer(TokenObtainPairSerializer):
+    """
+    This serializer class is used to log a user in with email and password, it returns a refresh and an access token
+    """
+
+    def validate(self, attrs):
+        attrs[self.username_field] = User.objects.normalize_email(attrs[self.username_field])
+        # from the primary, so a user can log in right after signing up
+        with read_from_primary():
+            return super().validate(attrs)
+
+    @classmethod
+    def get_token(cls, user):
+        return TokenService.issue_tokens(user)
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    This serializer class is used to get a new access token from a refresh token
+    Raises TokenError for an invalid or expired refresh token
+    """
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        """
+        The refresh token must not be revoked, its user must still be active
+        """
+        refresh = RefreshToken(attrs['refresh'])
+        state = TokenService.get_user_state(refresh.get(api_settings.USER_ID_CLAIM))
+        if not TokenService.is_token_usable(state, refresh):
+            raise AuthenticationFailed(CustomError.get_error_message('TOKEN_REVOKED'), code='token_revoked')
+        return {'access': str(refresh.access_token)}
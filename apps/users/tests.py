@@ -1,3 +1,243 @@
-from django.test import TestCase
+import base64
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.users.managers.token_manager import TokenService, UserStateCache
+from apps.users.models import User
+from apps.utils.testing import authenticated_client, create_test_user
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class SignupTest(TestCase):
+    """
+    Signup hashes once and writes the user once
+    """
+    SIGNUP_URL = '/api/v1/auth/signup/'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_signup_single_insert(self):
+        payload = {'email': 'New.User@Example.com', 'name': 'new user', 'password': 'password'}
+        # insert wrapped in a savepoint, uniqueness is left to the database constraint
+        with self.assertNumQueries(3):
+            response = self.client.post(self.SIGNUP_URL, payload, format='json')
+        self.assertEqual(response.data['status'], 'success')
+
+        user = User.objects.get()
+        self.assertEqual(user.email, 'new.user@example.com')
+        self.assertTrue(user.check_password('password'))
+
+    def test_signup_duplicate_email_any_case(self):
+        User.objects.create_user(email='taken@example.com', password='password', name='taken')
+        payload = {'email': 'Taken@Example.COM', 'name': 'again', 'password': 'password'}
+        response = self.client.post(self.SIGNUP_URL, payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['data'], {'email': ['Email already exists!']})
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_email_unique_constraint_is_case_insensitive(self):
+        User.objects.create(email='taken@example.com', name='taken')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(email='TAKEN@example.com', name='again')
+
+
+class PasswordRehashTest(TestCase):
+    """
+    Changing the hasher profile upgrades stored hashes on the next login
+    """
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password', name='user')
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=2000)
+    def test_iteration_change_rehashes_on_login(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(authenticate(email='user@example.com', password='password'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(
+        PASSWORD_ARGON2_TIME_COST=1, PASSWORD_ARGON2_MEMORY_COST=1024, PASSWORD_ARGON2_PARALLELISM=1,
+        PASSWORD_HASHERS=[
+            'apps.users.hashers.TunedArgon2PasswordHasher',
+            'apps.users.hashers.TunedPBKDF2PasswordHasher',
+        ]
+    )
+    def test_argon2_profile_upgrades_pbkdf2_hash(self):
+        self.assertEqual(authenticate(email='user@example.com', password='password'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, USER_IMPORT_BATCH_SIZE=2)
+class BulkSignupTest(TestCase):
+    """
+    Bulk signup from an uploaded file, by staff
+    """
+    BULK_SIGNUP_URL = '/api/v1/auth/signup/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(email='taken@example.com', password='password', name='taken')
+        cls.staff = create_test_user('staff', is_staff=True)
+
+    def setUp(self):
+        TokenService.cache.clear()
+        self.client = authenticated_client(self.staff, token=True)
+
+    def _upload(self, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode())
+        response = self.client.post(self.BULK_SIGNUP_URL, {'file': upload, **data}, format='multipart')
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_csv_import_reports_every_row(self):
+        content = (
+            'email,name,mobile,password\n'
+            'First@Example.com,first,,password\n'
+            'TAKEN@example.com,taken again,,password\n'
+            'first@example.com,duplicate,,password\n'
+            'not-an-email,broken,,password\n'
+            'second@example.com,second,,password\n'
+        )
+        response, reports = self._upload('users.csv', content)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([report['row'] for report in reports], [2, 3, 4, 5, 6])
+        self.assertEqual(
+            [report['status'] for report in reports], ['created', 'error', 'error', 'error', 'created']
+        )
+        created = User.objects.get(email='first@example.com')
+        self.assertEqual(reports[0]['id'], created.id)
+        self.assertTrue(created.check_password('password'))
+
+    def test_jsonl_import(self):
+        content = '{"email": "json@example.com", "name": "json", "password": "password"}\nnot json\n'
+        _, reports = self._upload('users.txt', content, file_format='jsonl')
+        self.assertEqual([report['status'] for report in reports], ['created', 'error'])
+        self.assertTrue(User.objects.filter(email='json@example.com').exists())
+
+    def test_unknown_format(self):
+        response = self.client.post(
+            self.BULK_SIGNUP_URL, {'file': SimpleUploadedFile('users.txt', b'')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_staff_can_import(self):
+        content = 'email,name,mobile,password\nnew@example.com,new,,password\n'
+        self.client = APIClient()
+        response = self.client.post(
+            self.BULK_SIGNUP_URL, {'file': SimpleUploadedFile('users.csv', content.encode())}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 401)
+
+        self.client = authenticated_client(User.objects.get(email='taken@example.com'), token=True)
+        response = self.client.post(
+            self.BULK_SIGNUP_URL, {'file': SimpleUploadedFile('users.csv', content.encode())}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_row_limit(self):
+        row = '{{"email": "{}@example.com", "name": "{}", "password": "password"}}\n'
+        # blank lines are not rows
+        _, reports = self._upload('users.jsonl', row.format('a', 'a') + '\n' + row.format('b', 'b'))
+        self.assertEqual([report['status'] for report in reports], ['created', 'created'])
+
+        content = ''.join(row.format(name, name) for name in ('c', 'd', 'e'))
+        response = self.client.post(
+            self.BULK_SIGNUP_URL, {'file': SimpleUploadedFile('users.jsonl', content.encode())}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.data['data'])
+        self.assertFalse(User.objects.filter(email='c@example.com').exists())
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class TokenAuthenticationTest(TestCase):
+    """
+    JWT login, and users resolved from the token claims with a cached active / revoked state
+    """
+    TOKEN_URL = '/api/v1/auth/token/'
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    def setUp(self):
+        self.user = create_test_user('user')
+        self.client = APIClient()
+        TokenService.cache.clear()
+        cache.clear()
+
+    def _login(self):
+        response = self.client.post(self.TOKEN_URL, {'email': 'User@Example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def _get_tasks(self, access):
+        return self.client.get(self.USER_TASK_URL, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_token_claims_and_cached_user_state(self):
+        tokens = self._login()
+        payload = json.loads(base64.urlsafe_b64decode(tokens['access'].split('.')[1] + '=='))
+        self.assertEqual((payload['id'], payload['name'], payload['email']), (self.user.id, 'user', 'user@example.com'))
+
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 200)
+        # only the etag aggregate: the page and the user state are cached, the user comes from the token
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_tasks(tokens['access']).status_code, 200)
+
+    def test_wrong_password(self):
+        response = self.client.post(self.TOKEN_URL, {'email': 'user@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoke_refuses_earlier_tokens(self):
+        tokens = self._login()
+        response = self.client.post(f'{self.TOKEN_URL}revoke/', HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(response.data['status'], 'success')
+
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 401)
+        response = self.client.post(f'{self.TOKEN_URL}refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self._get_tasks(self._login()['access']).status_code, 200)
+
+    def test_deactivated_user_is_refused(self):
+        tokens = self._login()
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 401)
+
+    def test_staff_flag_change_is_refused(self):
+        self.user.is_staff = True
+        self.user.save()
+        tokens = self._login()
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 200)
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self._get_tasks(tokens['access']).status_code, 401)
+        self.assertEqual(self._get_tasks(self._login()['access']).status_code, 200)
+
+    def test_refresh(self):
+        tokens = self._login()
+        response = self.client.post(f'{self.TOKEN_URL}refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(self._get_tasks(response.data['data']['access']).status_code, 200)
+        response = self.client.post(f'{self.TOKEN_URL}refresh/', {'refresh': tokens['access']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_state_cache_is_lru_with_ttl(self):
+        states = UserStateCache(maxsize=2, ttl=60)
+        states.set(1, 'one')
+        states.set(2, 'two')
+        states.get(1)
+        states.set(3, 'three')
+        self.assertEqual((states.get(1), states.get(2), states.get(3)), ('one', None, 'three'))
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(states.get(1))
@@ -5,13 +5,14 @@ This file is used for urls or creating endpoint for API'S
 from django.urls import path, include
 from rest_framework import routers
 
-from apps.users.views import SignupViewSet
+from apps.users.views import SignupViewSet, TokenViewSet
 
 # Local imports
 
 router = routers.DefaultRouter()
 
 router.register('signup', SignupViewSet, basename='signup')
+router.register('token', TokenViewSet, basename='token')
 
 urlpatterns = [
     path(r'auth/', include(router.urls)),
@@ -1,7 +1,21 @@
+import io
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
 
+from apps.users.managers.import_manager import UserImportService
+from apps.users.managers.token_manager import TokenService
 from apps.users.models import User
-from apps.users.serializer import GetUserSerializer, SignupSerializer
+from apps.users.serializer import (
+    GetUserSerializer, ImportUsersSerializer, SignupSerializer, TokenObtainSerializer, TokenRefreshSerializer
+)
+from apps.utils.messages import CustomError
 from apps.utils.utils import CustomModelView
 
 
@@ -19,7 +33,86 @@ class SignupViewSet(CustomModelView):
         """
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except ValidationError as e:
+                # e.g. the email was taken, reported by the unique constraint on insert
+                return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=e.detail)
             serializer = GetUserSerializer(user)
             return self.success_response(status_code=status.HTTP_201_CREATED, data=serializer.data)
         return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+
+    @action(methods=['POST'], detail=False, url_name='bulk', url_path='bulk',
+            serializer_class=ImportUsersSerializer, permission_classes=[IsAdminUser])
+    def bulk_signup(self, request, *args, **kwargs):
+        """
+        this method is used by staff to sign up many users from an uploaded CSV or JSONL file
+        The per-row report is streamed back as JSON lines while the file is being imported
+        """
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
+
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data['file_format']
+        max_rows = settings.USER_IMPORT_MAX_ROWS
+        # counted before anything is imported, so a file over the limit creates no user
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        if UserImportService.count_rows(stream, file_format, stop_after=max_rows + 1) > max_rows:
+            return self.failure_response(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                data={'file': [CustomError.IMPORT_TOO_MANY_ROWS.format(max_rows=max_rows)]}
+            )
+        stream.seek(0)
+        rows = UserImportService.read_rows(stream, file_format)
+        reports = UserImportService.import_users(
+            rows, batch_size=settings.USER_IMPORT_BATCH_SIZE, processes=settings.USER_IMPORT_PROCESSES
+        )
+        return StreamingHttpResponse(
+            (json.dumps(report) + '\n' for report in reports),
+            content_type='application/x-ndjson'
+        )
+
+
+class TokenViewSet(CustomModelView):
+    """
+    this class is used to log in with JWTs: obtain, refresh and revoke tokens
+    """
+    http_method_names = ('post',)
+    serializer_class = TokenObtainSerializer
+    queryset = User
+
+    def get_permissions(self):
+        if self.action == 'revoke':
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def create(self, request, *args, **kwargs):
+        """
+        this method is used to log in with email and password
+        """
+        return self._validate_tokens(self.serializer_class(data=request.data))
+
+    @action(methods=['POST'], detail=False, url_name='refresh', url_path='refresh',
+            serializer_class=TokenRefreshSerializer)
+    def refresh(self, request, *args, **kwargs):
+        """
+        this method is used to get a new access token from a refresh token
+        """
+        return self._validate_tokens(self.serializer_class(data=request.data))
+
+    @action(methods=['POST'], detail=False, url_name='revoke', url_path='revoke')
+    def revoke(self, request, *args, **kwargs):
+        """
+        this method is used to log out everywhere, every token issued to the user so far is refused
+        """
+        TokenService.revoke_tokens(request.user.id)
+        return self.success_response(status_code=status.HTTP_200_OK)
+
+    def _validate_tokens(self, serializer):
+        try:
+            if serializer.is_valid():
+                return self.success_response(status_code=status.HTTP_200_OK, data=serializer.validated_data)
+        except (AuthenticationFailed, TokenError) as error:
+            return self.failure_response(status_code=status.HTTP_401_UNAUTHORIZED, data=str(error))
+        return self.failure_response(status_code=status.HTTP_400_BAD_REQUEST, data=serializer.errors)
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class UtilsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.utils'
+
+    def ready(self):
+        from apps.utils.metrics import record_connection_created
+        connection_created.connect(record_connection_created, dispatch_uid='metrics_connection_created')
+
+        from apps.utils.db_router import ReplicaRouter
+        connection_created.connect(ReplicaRouter.track_queries, dispatch_uid='replica_router_track_queries')
+
+        if 'apps.utils.middleware.PerformanceMiddleware' in settings.MIDDLEWARE:
+            from apps.utils.middleware import instrument_connection, instrument_serializers
+            instrument_serializers()
+            connection_created.connect(instrument_connection, dispatch_uid='performance_instrument_connection')
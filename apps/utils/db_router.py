@@ -0,0 +1,192 @@
+"""
+Read-replica routing
+
+settings.DATABASE_REPLICAS lists the aliases of DATABASES replicating `default` (the primary).
+ReplicaRouter sends the reads of the task and user tables to them and everything else to the primary.
+Replicas lag behind the primary, so reads stay on the primary where a stale row would be wrong:
+
+- inside a transaction of the primary (select_for_update, the read-modify-write of TaskService.transition)
+- for the relations of a row loaded from the primary (e.g. the assignments of a task just created)
+- within read_from_primary(): credentials, token revocation state, background jobs
+- for settings.DB_READ_YOUR_WRITES_WINDOW seconds after a user wrote or their task listing changed,
+  see pin_to_primary(). The pins are kept in the Django cache, shared by the processes with Redis.
+
+A request reads from one replica, picked on its first read (round robin, or the replica with the fewest
+queries in flight in this process), so the pages and counts of a response come from the same snapshot.
+"""
+import itertools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+ROUND_ROBIN = 'round_robin'
+LEAST_CONNECTIONS = 'least_connections'
+
+_request_routing = ContextVar('request_routing', default=None)
+_primary_only = ContextVar('primary_only', default=False)
+
+
+class RequestRouting:
+    """
+    Routing state of one request, see request_routing()
+    """
+    __slots__ = ('user_id', 'pinned', 'wrote', 'replica')
+
+    def __init__(self):
+        self.user_id = None
+        # whether the user is pinned to the primary, looked up on the first read
+        self.pinned = None
+        self.wrote = False
+        self.replica = None
+
+
+@contextmanager
+def request_routing():
+    """
+    Scope of one request, entered by ReplicaRoutingMiddleware
+    """
+    token = _request_routing.set(RequestRouting())
+    try:
+        yield
+    finally:
+        _request_routing.reset(token)
+
+
+def set_request_user(user_id):
+    """
+    The authenticated user of the current request, whose pin to the primary is honoured
+    """
+    routing = _request_routing.get()
+    if routing is not None and routing.user_id != user_id:
+        routing.user_id = user_id
+        routing.pinned = None
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Reads within the block go to the primary, for what must not lag (credentials, validation before a write)
+    """
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+def pin_to_primary(user_ids):
+    """
+    The given users read from the primary for the next settings.DB_READ_YOUR_WRITES_WINDOW seconds
+    """
+    if not settings.DATABASE_REPLICAS or settings.DB_READ_YOUR_WRITES_WINDOW <= 0:
+        return
+    user_ids = set(user_ids)
+    cache.set_many(
+        {ReplicaRouter.pin_key(user_id): 1 for user_id in user_ids}, timeout=settings.DB_READ_YOUR_WRITES_WINDOW
+    )
+    routing = _request_routing.get()
+    if routing is not None and routing.user_id in user_ids:
+        routing.pinned = True
+
+
+class ReplicaRouter:
+    """
+    Database router: reads of REPLICATED_APPS from settings.DATABASE_REPLICAS, the rest from the primary
+
+    settings.DB_REPLICA_SELECTION is round_robin or least_connections. Least connections counts the
+    queries in flight per replica in this process, ties are broken round robin.
+    """
+    REPLICATED_APPS = frozenset({'tasks', 'users'})
+    PIN_KEY_PREFIX = 'db_primary_pin'
+
+    _round_robin = itertools.count()
+    _in_flight = Counter()
+    _in_flight_lock = threading.Lock()
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label not in self.REPLICATED_APPS or _primary_only.get():
+            return PRIMARY
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db is not None:
+            return instance._state.db
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+
+        routing = _request_routing.get()
+        if routing is None:
+            # management commands and job workers, no request to keep on one replica
+            return self.select_replica(replicas)
+        if routing.pinned is None:
+            routing.pinned = routing.user_id is not None and cache.get(self.pin_key(routing.user_id)) is not None
+        if routing.pinned:
+            return PRIMARY
+        if routing.replica is None:
+            routing.replica = self.select_replica(replicas)
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _request_routing.get()
+        if routing is not None and not routing.wrote and settings.DATABASE_REPLICAS:
+            # the rest of the request and the next ones of the user read what was just written
+            routing.wrote = True
+            routing.pinned = True
+            if routing.user_id is not None:
+                pin_to_primary([routing.user_id])
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas get the schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+    @classmethod
+    def pin_key(cls, user_id):
+        return f'{cls.PIN_KEY_PREFIX}:{user_id}'
+
+    @classmethod
+    def select_replica(cls, replicas):
+        selection = settings.DB_REPLICA_SELECTION
+        if selection == LEAST_CONNECTIONS:
+            with cls._in_flight_lock:
+                fewest = min(cls._in_flight[alias] for alias in replicas)
+                replicas = [alias for alias in replicas if cls._in_flight[alias] == fewest]
+        elif selection != ROUND_ROBIN:
+            raise ImproperlyConfigured(
+                f'DB_REPLICA_SELECTION must be {ROUND_ROBIN} or {LEAST_CONNECTIONS}, not {selection!r}'
+            )
+        return replicas[next(cls._round_robin) % len(replicas)]
+
+    @classmethod
+    def track_queries(cls, sender, connection, **kwargs):
+        """
+        connection_created signal receiver, counts the queries in flight on the replica connections
+        """
+        if connection.alias in settings.DATABASE_REPLICAS and cls._execute not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, cls._execute)
+
+    @classmethod
+    def _execute(cls, execute, sql, params, many, context):
+        alias = context['connection'].alias
+        with cls._in_flight_lock:
+            cls._in_flight[alias] += 1
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with cls._in_flight_lock:
+                cls._in_flight[alias] -= 1
@@ -0,0 +1,327 @@
+import json
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apps.tasks.models import Task, TaskAssignment
+from apps.users.managers.token_manager import TokenService
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Seed the database, replay a weighted mix of API requests and report latency, throughput and
+    query counts per endpoint
+
+        python manage.py benchmark_api --seed-users 1000 --seed-tasks 10000 --output before.json
+        python manage.py benchmark_api --output after.json --compare before.json
+        python manage.py benchmark_api --target live --base-url http://127.0.0.1:8000 --concurrency 16
+        python manage.py benchmark_api --cleanup
+
+    `--target client` runs the requests in-process through the Django test client (one at a time,
+    query counts captured exactly); `--target live` sends them to a running server sharing this
+    database (query counts are read from its Server-Timing header, so run it with PERFORMANCE_SAMPLE_RATE=1).
+    Task requests are sent as a random seeded user, with a JWT issued before the run.
+    The JSON results hold p50/p95/p99 latency, throughput and mean queries per endpoint;
+    --compare exits with an error when an endpoint's p95 regressed by more than --threshold percent.
+    Seeded rows live under BENCH_DOMAIN / BENCH_PREFIX. Point it at a scratch database, not production.
+    """
+    help = 'Benchmark a mix of API requests against the test client or a live server'
+
+    BENCH_DOMAIN = 'api-bench.invalid'
+    BENCH_PREFIX = 'apibench'
+    SEED_BATCH_SIZE = 5000
+
+    SIGNUP_PATH = '/api/v1/auth/signup/'
+    TASK_PATH = '/api/v1/task/'
+    ASSIGN_TASK_PATH = '/api/v1/task/assign-task/'
+    USER_TASK_PATH = '/api/v1/task/user-task/'
+
+    DEFAULT_MIX = 'signup=1,create=2,assign=2,user-task=15'
+
+    SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=('client', 'live'), default='client')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='root URL of the live server')
+        parser.add_argument('--seed-users', type=int, default=0, help='users to seed first')
+        parser.add_argument('--seed-tasks', type=int, default=0, help='tasks to seed first')
+        parser.add_argument('--assignments-per-task', type=int, default=3, help='users assigned to each seeded task')
+        parser.add_argument('--mix', default=self.DEFAULT_MIX, help='endpoint weights, e.g. "%(default)s"')
+        parser.add_argument('--requests', type=int, default=1000, help='requests to replay')
+        parser.add_argument('--concurrency', type=int, default=8, help='client threads, live target only')
+        parser.add_argument('--random-seed', type=int, default=0, help='makes the request sequence repeatable')
+        parser.add_argument('--output', help='JSON results file')
+        parser.add_argument('--compare', help='previous JSON results file to compare with')
+        parser.add_argument('--threshold', type=float, default=10.0, help='p95 regression tolerated, in percent')
+        parser.add_argument('--cleanup', action='store_true', help='delete the seeded rows and exit')
+
+    def handle(self, *args, **options):
+        seeded_users = User.objects.filter(email__endswith=f'@{self.BENCH_DOMAIN}')
+        seeded_tasks = Task.objects.filter(name__startswith=self.BENCH_PREFIX)
+        if options['cleanup']:
+            tasks_deleted, _ = seeded_tasks.delete()
+            users_deleted, _ = seeded_users.delete()
+            self.stdout.write(f'{tasks_deleted + users_deleted} rows deleted')
+            return
+
+        self.random = random.Random(options['random_seed'])
+        self.run_id = uuid.uuid4().hex[:8]
+        self.mix = self._parse_mix(options['mix'])
+        if options['seed_users'] or options['seed_tasks']:
+            self._seed(options['seed_users'], options['seed_tasks'], options['assignments_per_task'])
+
+        self.user_ids = list(seeded_users.values_list('id', flat=True))
+        self.task_ids = list(seeded_tasks.values_list('id', flat=True))
+        if not self.user_ids or not self.task_ids:
+            raise CommandError('No seeded users or tasks, run with --seed-users and --seed-tasks first')
+        self.tokens = {}
+
+        plan = self.random.choices(list(self.mix), weights=list(self.mix.values()), k=options['requests'])
+        calls = [(endpoint, self._build_request(endpoint, index)) for index, endpoint in enumerate(plan)]
+        if options['target'] == 'client':
+            samples, elapsed = self._run_client(calls)
+        else:
+            samples, elapsed = self._run_live(calls, options['base_url'].rstrip('/'), options['concurrency'])
+
+        results = {
+            'meta': {
+                'target': options['target'],
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': 1 if options['target'] == 'client' else options['concurrency'],
+                'mix': self.mix,
+                'users': len(self.user_ids),
+                'tasks': len(self.task_ids),
+                'assignments': TaskAssignment.objects.filter(task__name__startswith=self.BENCH_PREFIX).count(),
+                'started_at': timezone.now().isoformat(),
+                'elapsed_s': round(elapsed, 3),
+            },
+            'endpoints': self._summarize(samples, elapsed),
+        }
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self._compare(json.load(previous), results, options['threshold'])
+
+    def _parse_mix(self, mix):
+        """
+        "signup=1,user-task=10" -> {'signup': 1, 'user-task': 10}
+        """
+        weights = {}
+        for part in mix.split(','):
+            endpoint, _, weight = part.partition('=')
+            endpoint = endpoint.strip()
+            if endpoint not in ('signup', 'create', 'assign', 'user-task') or not weight.strip().isdigit():
+                raise CommandError(f'Invalid mix entry "{part}"')
+            weights[endpoint] = int(weight)
+        if not any(weights.values()):
+            raise CommandError('The mix needs at least one endpoint with a positive weight')
+        return weights
+
+    def _seed(self, user_count, task_count, assignments_per_task):
+        """
+        Insert users (with an unusable password), tasks and assignments in batches
+        """
+        start = User.objects.filter(email__endswith=f'@{self.BENCH_DOMAIN}').count()
+        for offset in range(0, user_count, self.SEED_BATCH_SIZE):
+            size = min(self.SEED_BATCH_SIZE, user_count - offset)
+            User.objects.bulk_create(
+                User(email=f'seed{start + offset + index}@{self.BENCH_DOMAIN}', name='bench', password='!')
+                for index in range(size)
+            )
+        user_ids = list(User.objects.filter(email__endswith=f'@{self.BENCH_DOMAIN}').values_list('id', flat=True))
+        if task_count and not user_ids:
+            raise CommandError('Seed users before tasks')
+
+        statuses = TaskAssignment.TaskStatus.values
+        for offset in range(0, task_count, self.SEED_BATCH_SIZE):
+            size = min(self.SEED_BATCH_SIZE, task_count - offset)
+            tasks = Task.objects.bulk_create(
+                Task(name=f'{self.BENCH_PREFIX} {offset + index}', description='seeded task')
+                for index in range(size)
+            )
+            TaskAssignment.objects.bulk_create(
+                (
+                    TaskAssignment(
+                        task=task, user_id=user_id, is_primary_assignee=(position == 0),
+                        status=self.random.choice(statuses)
+                    )
+                    for task in tasks
+                    for position, user_id in enumerate(
+                        self.random.sample(user_ids, min(assignments_per_task, len(user_ids)))
+                    )
+                ),
+                batch_size=self.SEED_BATCH_SIZE
+            )
+            self.stdout.write(f'seeded {offset + size}/{task_count} tasks', ending='\r')
+        self.stdout.write(f'{user_count} users and {task_count} tasks seeded')
+
+    def _build_request(self, endpoint, index):
+        """
+        (method, path, payload, Authorization header) of one request of the mix
+        """
+        if endpoint == 'signup':
+            email = f'signup-{self.run_id}-{index}@{self.BENCH_DOMAIN}'
+            return 'post', self.SIGNUP_PATH, {'email': email, 'name': 'bench', 'password': 'bench-password'}, None
+        authorization = self._get_authorization(self.random.choice(self.user_ids))
+        if endpoint == 'create':
+            return 'post', self.TASK_PATH, {
+                'name': f'{self.BENCH_PREFIX} created {self.run_id} {index}',
+                'description': 'created by the benchmark',
+                'assigned_users': self.random.sample(self.user_ids, min(2, len(self.user_ids))),
+            }, authorization
+        if endpoint == 'assign':
+            return 'post', self.ASSIGN_TASK_PATH, {
+                'task': self.random.choice(self.task_ids),
+                'assigned_users': self.random.sample(self.user_ids, min(3, len(self.user_ids))),
+            }, authorization
+        return 'get', self.USER_TASK_PATH, {}, authorization
+
+    def _get_authorization(self, user_id):
+        """
+        Bearer access token of a seeded user, issued once per run
+        """
+        if user_id not in self.tokens:
+            user = User.objects.only('id', 'name', 'email', 'token_version').get(pk=user_id)
+            self.tokens[user_id] = f'Bearer {TokenService.issue_tokens(user).access_token}'
+        return self.tokens[user_id]
+
+    def _run_client(self, calls):
+        """
+        Replay the requests in-process, one at a time, counting their queries
+        return list of (endpoint, status code, latency, queries), elapsed time
+        """
+        try:
+            setup_test_environment()
+            in_test_environment = False
+        except RuntimeError:
+            # already set up, e.g. when run from the test suite
+            in_test_environment = True
+        try:
+            client = Client()
+            samples = []
+            started = time.perf_counter()
+            for endpoint, (method, path, payload, authorization) in calls:
+                headers = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+                with CaptureQueriesContext(connection) as queries:
+                    request_started = time.perf_counter()
+                    if method == 'get':
+                        response = client.get(path, payload, **headers)
+                    else:
+                        response = client.post(path, payload, content_type='application/json', **headers)
+                    latency = time.perf_counter() - request_started
+                samples.append((endpoint, response.status_code, latency, len(queries)))
+            return samples, time.perf_counter() - started
+        finally:
+            if not in_test_environment:
+                teardown_test_environment()
+
+    def _run_live(self, calls, base_url, concurrency):
+        """
+        Replay the requests against a running server, every thread keeping one connection alive
+        return list of (endpoint, status code, latency, queries or None), elapsed time
+        """
+        local = threading.local()
+
+        def send(call):
+            endpoint, (method, path, payload, authorization) = call
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            headers = {'Authorization': authorization} if authorization else {}
+            request_started = time.perf_counter()
+            try:
+                if method == 'get':
+                    response = local.session.get(f'{base_url}{path}', params=payload, headers=headers)
+                else:
+                    response = local.session.post(f'{base_url}{path}', json=payload, headers=headers)
+            except requests.RequestException:
+                return endpoint, 0, time.perf_counter() - request_started, None
+            latency = time.perf_counter() - request_started
+            match = self.SERVER_TIMING_QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+            return endpoint, response.status_code, latency, int(match.group(1)) if match else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(send, calls))
+        return samples, time.perf_counter() - started
+
+    @staticmethod
+    def _summarize(samples, elapsed):
+        """
+        Per endpoint statistics of the successful requests
+        """
+        summary = {}
+        for endpoint in sorted({sample[0] for sample in samples}):
+            endpoint_samples = [sample for sample in samples if sample[0] == endpoint]
+            ok = [sample for sample in endpoint_samples if 0 < sample[1] < 400]
+            latencies = sorted(sample[2] * 1000 for sample in ok)
+            queries = [sample[3] for sample in ok if sample[3] is not None]
+            stats = {
+                'requests': len(endpoint_samples),
+                'errors': len(endpoint_samples) - len(ok),
+                'throughput_rps': round(len(ok) / elapsed, 2),
+            }
+            if latencies:
+                quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+                stats.update({
+                    'p50_ms': round(quantiles[49], 3),
+                    'p95_ms': round(quantiles[94], 3),
+                    'p99_ms': round(quantiles[98], 3),
+                    'mean_ms': round(statistics.fmean(latencies), 3),
+                })
+            stats['mean_queries'] = round(statistics.fmean(queries), 2) if queries else None
+            summary[endpoint] = stats
+        return summary
+
+    def _report(self, results):
+        meta = results['meta']
+        self.stdout.write(
+            f"{meta['requests']} requests on {meta['target']} ({meta['database']}), "
+            f"{meta['users']} users, {meta['tasks']} tasks, {meta['assignments']} assignments, "
+            f"{meta['elapsed_s']} s"
+        )
+        self.stdout.write(f'{"endpoint":<10} {"req":>6} {"err":>5} {"req/s":>8} {"p50":>8} {"p95":>8} '
+                          f'{"p99":>8} {"queries":>8}')
+        for endpoint, stats in results['endpoints'].items():
+            self.stdout.write(
+                f'{endpoint:<10} {stats["requests"]:>6} {stats["errors"]:>5} {stats["throughput_rps"]:>8} '
+                f'{stats.get("p50_ms", "-"):>8} {stats.get("p95_ms", "-"):>8} {stats.get("p99_ms", "-"):>8} '
+                f'{stats["mean_queries"] if stats["mean_queries"] is not None else "-":>8}'
+            )
+
+    def _compare(self, previous, current, threshold):
+        """
+        Print the p95 and query count changes per endpoint, fail on a p95 regression above threshold
+        """
+        regressions = []
+        self.stdout.write(self.style.MIGRATE_HEADING('Compared with the previous run'))
+        for endpoint, stats in current['endpoints'].items():
+            before = previous.get('endpoints', {}).get(endpoint)
+            if not before or 'p95_ms' not in before or 'p95_ms' not in stats:
+                continue
+            change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            line = f'{endpoint:<10} p95 {before["p95_ms"]} -> {stats["p95_ms"]} ms ({change:+.1f}%)'
+            if before.get('mean_queries') != stats['mean_queries']:
+                line += f', queries {before.get("mean_queries")} -> {stats["mean_queries"]}'
+            if change > threshold:
+                regressions.append(endpoint)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'p95 regressed by more than {threshold}% on: {", ".join(regressions)}')
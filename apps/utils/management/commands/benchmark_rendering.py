@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from apps.tasks.serializer import FastGetTaskSerializer
+from apps.utils.management.commands.benchmark_serializers import build_rows
+from apps.utils.renderers import FastJSONRenderer, orjson
+from apps.utils.utils import CustomAPIResponseMixin
+
+
+class Command(BaseCommand):
+    """
+    Compare the cost of building and rendering a large task list response: legacy (double) or single
+    envelope, DRF's JSONRenderer or FastJSONRenderer
+
+        python manage.py benchmark_rendering
+        python manage.py benchmark_rendering --tasks 50000 --repeat 5
+
+    The task list is serialized once, in memory, so only the response envelope and the JSON
+    encoding are measured. The output of both renderers is compared byte for byte first.
+    """
+    help = 'Benchmark the response envelope and JSON rendering of large task lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000, help='tasks in the rendered list')
+        parser.add_argument('--repeat', type=int, default=5, help='runs per case, the best one is reported')
+
+    def handle(self, *args, **options):
+        users, _, tasks = build_rows(options['tasks'])
+        data = FastGetTaskSerializer.many(tasks, context={'user_id': users[0].id})
+        cursors = {'next': 'bmV4dA', 'prev': None}
+        renderers = {'drf json': JSONRenderer(), 'fast json': FastJSONRenderer()}
+
+        self.stdout.write(
+            f'{len(data)} tasks per response, best of {options["repeat"]} runs, '
+            f'orjson {"installed" if orjson is not None else "not installed"}'
+        )
+        for envelope, legacy in (('legacy envelope', True), ('single envelope', False)):
+            with override_settings(LEGACY_RESPONSE_ENVELOPE=legacy):
+                rendered = {}
+                for name, renderer in renderers.items():
+                    def respond():
+                        response = CustomAPIResponseMixin.success_response(data=data, cursors=cursors)
+                        return renderer.render(response.data)
+
+                    rendered[name] = respond()
+                    elapsed = self._best_time(respond, options['repeat']) * 1000
+                    self.stdout.write(
+                        f'{envelope:<16} {name:<10} {elapsed:8.2f} ms/response  {len(rendered[name]):>9} bytes'
+                    )
+                if len(set(rendered.values())) != 1:
+                    raise CommandError(f'{envelope}: the renderers produced different bytes')
+
+    @staticmethod
+    def _best_time(function, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.tasks.models import Task, TaskAssignment
+from apps.tasks.serializer import (
+    FastGetTaskSerializer, FastTaskAssignmentSerializer, GetTaskSerializer, TaskAssignmentSerializer
+)
+from apps.users.models import User
+from apps.users.serializer import FastGetUserSerializer, GetUserSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare the per-row cost of the DRF serializers of the read endpoints with their FastSerializer
+    counterparts, on lists of model instances and of `.values()` dicts
+
+        python manage.py benchmark_serializers
+        python manage.py benchmark_serializers --rows 10000 --repeat 5
+
+    Rows are built in memory, shaped like TaskService.get_user_tasks returns them, so no database is
+    needed and nothing is written. The rendered JSON of both sides is compared byte for byte first,
+    the command fails when they differ.
+    """
+    help = 'Benchmark the DRF read serializers against their fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='rows per serialized list')
+        parser.add_argument('--repeat', type=int, default=3, help='runs per serializer, the best one is reported')
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        users, assignments, tasks = build_rows(count)
+        user_values = [
+            {field: getattr(user, field) for field in FastGetUserSerializer.values_fields()} for user in users
+        ]
+        assignment_values = [
+            {'user': assignment.user_id, 'user__name': assignment.user.name,
+             'is_primary_assignee': assignment.is_primary_assignee, 'status': assignment.status}
+            for assignment in assignments
+        ]
+        context = {'user_id': users[0].id}
+
+        cases = (
+            ('GetTaskSerializer', lambda: GetTaskSerializer(tasks, context=context, many=True).data,
+             lambda: FastGetTaskSerializer.many(tasks, context=context)),
+            ('GetUserSerializer', lambda: GetUserSerializer(users, many=True).data,
+             lambda: FastGetUserSerializer.many(users)),
+            ('GetUserSerializer .values()', lambda: GetUserSerializer(users, many=True).data,
+             lambda: FastGetUserSerializer.many(user_values)),
+            ('TaskAssignmentSerializer', lambda: TaskAssignmentSerializer(assignments, many=True).data,
+             lambda: FastTaskAssignmentSerializer.many(assignments)),
+            ('TaskAssignmentSerializer .values()', lambda: TaskAssignmentSerializer(assignments, many=True).data,
+             lambda: FastTaskAssignmentSerializer.many(assignment_values)),
+        )
+        renderer = JSONRenderer()
+        self.stdout.write(f'{count} rows per list, best of {options["repeat"]} runs')
+        for name, drf, fast in cases:
+            if renderer.render(drf()) != renderer.render(fast()):
+                raise CommandError(f'{name}: the fast path output differs from the DRF serializer')
+            drf_time = self._best_time(drf, options['repeat']) / count * 10 ** 6
+            fast_time = self._best_time(fast, options['repeat']) / count * 10 ** 6
+            self.stdout.write(
+                f'{name:<36} drf {drf_time:7.2f} µs/row  fast {fast_time:7.2f} µs/row  x{drf_time / fast_time:.1f}'
+            )
+
+    @staticmethod
+    def _best_time(serialize, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+
+def build_rows(count):
+    """
+    Unsaved users, assignments and tasks, each task carrying its assignment in `user_assignments`
+    like TaskService.get_user_tasks returns them
+    """
+    now = timezone.now()
+    users = [
+        User(id=index + 1, email=f'user{index}@serializer-bench.invalid', name=f'user {index}', mobile='9876543210')
+        for index in range(count)
+    ]
+    tasks = []
+    assignments = []
+    statuses = TaskAssignment.TaskStatus.values
+    for index in range(count):
+        task = Task(id=index + 1, name=f'task {index}', description='benchmark task', priority=index % 3 + 1)
+        status = statuses[index % len(statuses)]
+        assignment = TaskAssignment(
+            id=index + 1, task=task, user=users[0], status=status, is_primary_assignee=index % 2 == 0,
+            completed_at=now - timedelta(minutes=index) if status == TaskAssignment.TaskStatus.COMPLETED else None,
+        )
+        task.user_assignments = [assignment]
+        tasks.append(task)
+        assignments.append(assignment)
+    return users, assignments, tasks
@@ -0,0 +1,109 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Measure requests/sec of a running server on the signup and user task endpoints
+
+    Run it once against each runtime profile to compare them, e.g.
+        python manage.py runserver 127.0.0.1:8000
+        python manage.py benchmark_server --base-url http://127.0.0.1:8000 --label runserver
+
+        gunicorn -c gunicorn.conf.py
+        python manage.py benchmark_server --base-url http://127.0.0.1:8000 --label gunicorn
+
+    Every client thread keeps one HTTP connection alive, so the numbers reflect the server and
+    its database connection handling rather than TCP setup on the client side.
+    """
+    help = 'Benchmark requests/sec of the signup and user task endpoints of a running server'
+
+    SIGNUP_PATH = '/api/v1/auth/signup/'
+    TOKEN_PATH = '/api/v1/auth/token/'
+    USER_TASK_PATH = '/api/v1/task/user-task/'
+    PASSWORD = 'bench-password'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='root URL of the server')
+        parser.add_argument('--label', default='', help='name of the profile being measured')
+        parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=16, help='number of client threads')
+        parser.add_argument('--token', help='access token of the user whose tasks are listed '
+                                            '(default: a token of the first user created by the signup run)')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.label = f"[{options['label']}] " if options['label'] else ''
+        self.local = threading.local()
+        run_id = uuid.uuid4().hex[:8]
+
+        signup_results, elapsed = self._run(
+            lambda index: self._signup(f'bench-{run_id}-{index}@example.com'), options
+        )
+        self._report('signup', signup_results, elapsed)
+
+        token = options['token'] or self._login(
+            next((email for status_code, latency, email in signup_results if email), None)
+        )
+        if token is None:
+            raise CommandError('No user to query, signup failed and --token was not given')
+        user_task_results, elapsed = self._run(lambda index: self._user_task(token), options)
+        self._report('user-task', user_task_results, elapsed)
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _signup(self, email):
+        started = time.perf_counter()
+        response = self._session().post(
+            f'{self.base_url}{self.SIGNUP_PATH}',
+            json={'email': email, 'name': 'bench', 'password': self.PASSWORD},
+        )
+        latency = time.perf_counter() - started
+        return response.status_code, latency, email if response.ok else None
+
+    def _login(self, email):
+        """
+        Access token of a user created by the signup run, None when there is none
+        """
+        if email is None:
+            return None
+        response = self._session().post(
+            f'{self.base_url}{self.TOKEN_PATH}', json={'email': email, 'password': self.PASSWORD}
+        )
+        if not response.ok:
+            return None
+        return response.json().get('data', {}).get('access')
+
+    def _user_task(self, token):
+        started = time.perf_counter()
+        response = self._session().get(
+            f'{self.base_url}{self.USER_TASK_PATH}', headers={'Authorization': f'Bearer {token}'}
+        )
+        return response.status_code, time.perf_counter() - started, None
+
+    def _run(self, call, options):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(call, range(options['requests'])))
+        return results, time.perf_counter() - started
+
+    def _report(self, name, results, elapsed):
+        latencies = sorted(latency for status_code, latency, _ in results if status_code < 400)
+        errors = len(results) - len(latencies)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{self.label}{name}'))
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'  all {errors} requests failed'))
+            return
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(f'  requests/sec : {len(latencies) / elapsed:.1f}')
+        self.stdout.write(f'  p50 / p95 (ms) : {quantiles[49] * 1000:.1f} / {quantiles[94] * 1000:.1f}')
+        self.stdout.write(f'  errors : {errors}')
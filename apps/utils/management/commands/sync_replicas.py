@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    """
+    Copy the SQLite primary database into the SQLite replicas of settings.DATABASE_REPLICAS, to try
+    the read-replica routing locally without a replicated PostgreSQL
+
+        python manage.py sync_replicas
+
+    The replicas only change when the command runs, in between they lag behind the primary like a
+    real replica, so a write followed by a read shows which database served it.
+    """
+    help = 'Copy the SQLite primary database into its SQLite replicas'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replica in settings.DATABASE_REPLICAS')
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in (DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f'{alias} is not a SQLite database, the replicas of a PostgreSQL primary are fed by replication'
+                )
+
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.ensure_connection()
+            # the online backup API copies a consistent snapshot, schema included
+            primary.connection.backup(replica.connection)
+            self.stdout.write(f'{alias} synced from {DEFAULT_DB_ALIAS}')
@@ -20,11 +20,27 @@ class CustomError:
     SERVER_NOT_ABLE_PROCESS_REQUEST = 'Not able to process your request at this moment.please try after some time'
     SOMETHING_WENT_WRONG = "Oops! Something went wrong."
 
+    # Bulk import messages
+    INVALID_IMPORT_ROW = 'Row could not be parsed'
+    IMPORT_FORMAT_REQUIRED = 'File format must be csv or jsonl'
+    IMPORT_TOO_MANY_ROWS = 'File has more than {max_rows} rows'
+
     # AUTH Message
     INVALID_EMAIL = 'Email not exists in our system'
+    TOKEN_REVOKED = 'Token was revoked or the user is inactive'
+    TOKEN_WITHOUT_USER = 'Token contains no user identification'
+    USER_MISMATCH = 'Tasks of other users cannot be accessed'
 
     # Views validation
     USER_ID_REQUIRED = 'User ID is required to fetch a specific user task details'
+    USER_NOT_FOUND = 'User does not exist'
+    TASK_NOT_FOUND = 'Task does not exist'
+    INVALID_CURSOR = 'Invalid pagination cursor'
+    INVALID_PAGE_SIZE = 'Page size must be a positive integer'
+    TRANSITION_CONFLICT = 'Assignments were modified since they were read, reload them and retry'
+    DUPLICATE_TRANSITION = 'An assignment can only be moved once per batch'
+    JOB_NOT_FOUND = 'Job does not exist'
+    IDEMPOTENCY_KEY_REUSED = 'This Idempotency-Key was already used for a different request'
 
     @staticmethod
     def get_error_message(error_key):
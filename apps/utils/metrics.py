@@ -0,0 +1,95 @@
+"""
+Prometheus metrics of the API, exposed at /metrics
+
+Request metrics are recorded by apps.utils.middleware.PerformanceMiddleware and labelled by route
+name (the URL name, e.g. `task-user-task`, `task-assign-task`, `signup-list`), never by raw path,
+so the number of series stays bounded.
+
+A single process keeps everything in memory. Under gunicorn every worker is a separate process:
+set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers (gunicorn.conf.py does it)
+and each worker writes its values to memory-mapped files there, which /metrics aggregates on scrape.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# route label of requests that did not match any URL
+UNMATCHED_ROUTE = 'unmatched'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route',
+    ['route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter('http_requests', 'Responses sent, by route and status code', ['route', 'method', 'status'])
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being processed, by route', ['route'], multiprocess_mode='livesum'
+)
+
+DB_QUERIES = Counter('db_queries', 'Queries run while serving a route', ['route', 'database'])
+DB_QUERY_SECONDS = Counter('db_query_seconds', 'Time spent in queries while serving a route', ['route', 'database'])
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened', 'New database connections, stays flat when persistent connections are reused',
+    ['database']
+)
+
+TASK_SERVICE_OPERATIONS = Counter(
+    'task_service_operations', 'TaskService operations, by outcome (assigned, conflict...)', ['operation', 'outcome']
+)
+
+
+# (metric, label values) -> labelled child; labels() validates and locks on every call, a dict lookup does not
+_children = {}
+
+
+def child(metric, *labels):
+    """
+    Labelled child of a metric, cached
+    """
+    key = (metric, labels)
+    try:
+        return _children[key]
+    except KeyError:
+        return _children.setdefault(key, metric.labels(*labels))
+
+
+def observe_request(route, method, status, duration, db_usage):
+    """
+    Record a served request
+    :param db_usage: dict of database alias -> (query count, query time)
+    """
+    child(REQUEST_LATENCY, route, method).observe(duration)
+    child(REQUESTS, route, method, status).inc()
+    for database, (queries, query_time) in db_usage.items():
+        child(DB_QUERIES, route, database).inc(queries)
+        child(DB_QUERY_SECONDS, route, database).inc(query_time)
+
+
+def record_task_operation(operation, outcome='ok', count=1):
+    """
+    Count TaskService operations
+    """
+    if count:
+        child(TASK_SERVICE_OPERATIONS, operation, outcome).inc(count)
+
+
+def record_connection_created(sender, connection, **kwargs):
+    """
+    connection_created signal receiver
+    """
+    child(DB_CONNECTIONS_OPENED, connection.alias).inc()
+
+
+def export():
+    """
+    Current metrics in the text exposition format, aggregated over the workers in multiprocess mode
+    return (body, content type)
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
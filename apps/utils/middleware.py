@@ -0,0 +1,314 @@
+import functools
+import json
+import logging
+import random
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from apps.utils import metrics as prometheus_metrics
+from apps.utils.db_router import request_routing
+
+logger = logging.getLogger('apps.performance')
+slow_query_logger = logging.getLogger('apps.performance.slow_query')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+APPS_DIR = str(Path(__file__).resolve().parent.parent)
+# shared plumbing (pagination, responses...), the interesting call site is the code using it
+UTILS_DIR = str(Path(__file__).resolve().parent)
+
+
+class RequestMetrics:
+    """
+    Where the time of one request went, filled while the request is processed
+    """
+    __slots__ = (
+        'route', 'db_queries', 'db_time', 'db_usage', 'serialization_time', 'cache_hits', 'cache_misses',
+        'serialization_depth',
+    )
+
+    def __init__(self):
+        # URL name of the matched view, set once the URL is resolved
+        self.route = None
+        self.db_queries = 0
+        self.db_time = 0.0
+        # database alias -> [query count, query time]
+        self.db_usage = {}
+        self.serialization_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # nested serializers are timed once, by the outermost one
+        self.serialization_depth = 0
+
+
+def record_cache_access(hit):
+    """
+    Count a cache hit or miss against the current request, no-op outside of a request
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+@contextmanager
+def track_serialization():
+    """
+    Add the time spent in the block to the serialization time of the current request
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serialization_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialization_depth -= 1
+        if not metrics.serialization_depth:
+            metrics.serialization_time += time.perf_counter() - started
+
+
+def _timed_property(prop):
+    """
+    Wrap a property getter with track_serialization
+    """
+    @functools.wraps(prop.fget)
+    def getter(self):
+        with track_serialization():
+            return prop.fget(self)
+    getter.track_serialization = True
+    return property(getter)
+
+
+def _timed_function(function):
+    """
+    Wrap a function with track_serialization
+    """
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        with track_serialization():
+            return function(*args, **kwargs)
+    timed_function.track_serialization = True
+    return timed_function
+
+
+def instrument_serializers():
+    """
+    Time DRF serializers (`.data`), their fast path and the JSON renderers into the current request's
+    serialization time
+    Called once from UtilsConfig.ready() when PerformanceMiddleware is installed
+    """
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.serializers import ListSerializer, Serializer
+
+    from apps.utils.renderers import FastJSONRenderer
+    from apps.utils.serializer import FastSerializer
+
+    for serializer_class in (Serializer, ListSerializer):
+        if not getattr(serializer_class.data.fget, 'track_serialization', False):
+            serializer_class.data = _timed_property(serializer_class.data)
+
+    for renderer_class in (JSONRenderer, FastJSONRenderer):
+        render = renderer_class.__dict__['render']
+        if not getattr(render, 'track_serialization', False):
+            renderer_class.render = _timed_function(render)
+
+    for name in ('many', 'to_representation'):
+        method = FastSerializer.__dict__[name].__func__
+        if not getattr(method, 'track_serialization', False):
+            setattr(FastSerializer, name, classmethod(_timed_function(method)))
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper of every database connection, times the query against the current request
+    Installed by instrument_connection, a no-op outside of a request
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.db_queries += 1
+        metrics.db_time += duration
+        usage = metrics.db_usage.setdefault(context['connection'].alias, [0, 0.0])
+        usage[0] += 1
+        usage[1] += duration
+        if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            slow_query_logger.warning(json.dumps({
+                'duration_ms': round(duration * 1000, 2),
+                'sql': sql,
+                'call_site': get_call_site(),
+                'database': context['connection'].alias,
+            }))
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """
+    connection_created signal receiver, installs record_query
+    Connected by UtilsConfig.ready() when PerformanceMiddleware is installed. A wrapper per connection
+    rather than per request, since async views query through connections of the sync_to_async threads.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_call_site():
+    """
+    Innermost frame of the project code (a TaskService method, a serializer, a view...) on the stack
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(APPS_DIR) and not frame.filename.startswith(UTILS_DIR):
+            return f'{Path(frame.filename).relative_to(Path(APPS_DIR).parent)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class PerformanceMiddleware:
+    """
+    Records per request the view name, DB query count and time, serialization time,
+    cache hits and misses, and response size.
+
+    Sampled requests (settings.PERFORMANCE_SAMPLE_RATE, from 0 to 1) get a `Server-Timing` header
+    and one JSON log line on the `apps.performance` logger. Independently of sampling, any query
+    slower than settings.SLOW_QUERY_THRESHOLD_MS is logged with its SQL and the project code that
+    ran it on `apps.performance.slow_query`.
+    Every request is also recorded in the Prometheus metrics (apps.utils.metrics), labelled by route name.
+    Keep it first in MIDDLEWARE so the queries of the other middlewares are counted too.
+    Sync and async, so under ASGI the async views run without a thread held for the request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PERFORMANCE_SAMPLE_RATE
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # the handler picks the view middleware by its kind, a sync one would go through sync_to_async
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._end(metrics, token)
+        return self._record(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._end(metrics, token)
+        return self._record(request, response, metrics, time.perf_counter() - started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        The route is known once the URL is resolved
+        """
+        self._set_route(request)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        """
+        process_view of the async mode
+        """
+        self._set_route(request)
+
+    @staticmethod
+    def _set_route(request):
+        metrics = _current_metrics.get()
+        if metrics is not None and metrics.route is None:
+            metrics.route = request.resolver_match.view_name
+            prometheus_metrics.child(prometheus_metrics.REQUESTS_IN_FLIGHT, metrics.route).inc()
+
+    @staticmethod
+    def _end(metrics, token):
+        _current_metrics.reset(token)
+        if metrics.route is not None:
+            prometheus_metrics.child(prometheus_metrics.REQUESTS_IN_FLIGHT, metrics.route).dec()
+
+    def _record(self, request, response, metrics, total_time):
+        """
+        Record the request in the Prometheus metrics, and in the log and Server-Timing header when sampled
+        """
+        prometheus_metrics.observe_request(
+            metrics.route or prometheus_metrics.UNMATCHED_ROUTE, request.method, response.status_code,
+            total_time, metrics.db_usage
+        )
+
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            self._emit(request, response, metrics, total_time)
+        return response
+
+    def _emit(self, request, response, metrics, total_time):
+        """
+        Attach the Server-Timing header and write the structured log line
+        """
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = resolver_match.view_name if resolver_match else None
+        response_size = None if response.streaming else len(response.content)
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.db_queries} queries"',
+            f'serialization;dur={metrics.serialization_time * 1000:.2f}',
+            f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+            f'total;dur={total_time * 1000:.2f}',
+        ))
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'duration_ms': round(total_time * 1000, 2),
+            'db_queries': metrics.db_queries,
+            'db_time_ms': round(metrics.db_time * 1000, 2),
+            'serialization_ms': round(metrics.serialization_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'response_size': response_size,
+        }))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Scopes the read-replica routing (apps.utils.db_router) to the request: its reads go to one replica,
+    or to the primary once its user wrote. Keep it before the middlewares reading the database.
+    Sync and async: the routing state is a context variable, seen by the ORM calls of async views too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_routing():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_routing():
+            return await self.get_response(request)
@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a client sends a cursor that was not produced by KeysetPagination
+    """
+    pass
+
+
+class KeysetPagination:
+    """
+    Keyset (cursor) pagination over `(created_at, id)`, newest first.
+
+    Instead of OFFSET scans every page is fetched with a `WHERE (created_at, id) < (<last seen>)`
+    condition, so deep pages cost the same as the first one. Cursors are opaque to clients:
+    a base64 encoded `{"c": <created_at>, "i": <id>, "d": <direction>}` payload.
+
+    Usage:
+        paginator = KeysetPagination(page_size=request.query_params.get('page_size'))
+        rows, cursors = paginator.paginate(queryset, cursor=request.query_params.get('cursor'))
+    """
+    NEXT = 'n'
+    PREV = 'p'
+
+    def __init__(self, page_size=None):
+        """
+        :param page_size: requested page size, defaults to settings.DEFAULT_PAGE_SIZE
+                          and is clamped to settings.MAX_PAGE_SIZE
+        """
+        if page_size in (None, ''):
+            page_size = settings.DEFAULT_PAGE_SIZE
+        page_size = int(page_size)
+        if page_size < 1:
+            raise ValueError('page_size must be positive')
+        self.page_size = min(page_size, settings.MAX_PAGE_SIZE)
+
+    @classmethod
+    def encode_cursor(cls, obj, direction):
+        """
+        Build an opaque cursor pointing at the given row
+        """
+        payload = {'c': obj.created_at.isoformat(), 'i': obj.pk, 'd': direction}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+    @classmethod
+    def decode_cursor(cls, cursor):
+        """
+        Decode a cursor into (created_at, id, direction)
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            direction = payload['d']
+            if direction not in (cls.NEXT, cls.PREV):
+                raise ValueError(direction)
+            return datetime.fromisoformat(payload['c']), int(payload['i']), direction
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise InvalidCursor(str(e))
+
+    def get_page_queryset(self, queryset, cursor=None):
+        """
+        Return the queryset of one page (plus one extra row telling whether more rows follow)
+        and the direction it was read in
+        """
+        if not cursor:
+            return queryset.order_by('-created_at', '-id')[:self.page_size + 1], None
+
+        created_at, pk, direction = self.decode_cursor(cursor)
+        if direction == self.NEXT:
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')
+        else:
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        return queryset[:self.page_size + 1], direction
+
+    def build_page(self, rows, direction):
+        """
+        Trim the rows fetched from `get_page_queryset` to a page and compute its cursors
+        return (rows, {'next': <cursor or None>, 'prev': <cursor or None>})
+        """
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if direction is None:
+            return rows, {
+                'next': self.encode_cursor(rows[-1], self.NEXT) if has_more else None,
+                'prev': None,
+            }
+        if direction == self.NEXT:
+            return rows, {
+                'next': self.encode_cursor(rows[-1], self.NEXT) if has_more else None,
+                'prev': self.encode_cursor(rows[0], self.PREV) if rows else None,
+            }
+
+        # rows were read oldest first when walking backwards
+        rows = rows[::-1]
+        return rows, {
+            'next': self.encode_cursor(rows[-1], self.NEXT) if rows else None,
+            'prev': self.encode_cursor(rows[0], self.PREV) if has_more else None,
+        }
+
+    def paginate(self, queryset, cursor=None):
+        """
+        Return one page of the queryset and the cursors around it
+        :param queryset: queryset of rows having `created_at` and `id`
+        :param cursor: cursor received from a previous page (optional)
+        return (rows, {'next': <cursor or None>, 'prev': <cursor or None>})
+        """
+        page_queryset, direction = self.get_page_queryset(queryset, cursor)
+        return self.build_page(list(page_queryset), direction)
+
+    async def apaginate(self, queryset, cursor=None):
+        """
+        Async version of `paginate`, reads the page with the async ORM
+        """
+        page_queryset, direction = self.get_page_queryset(queryset, cursor)
+        return self.build_page([row async for row in page_queryset], direction)
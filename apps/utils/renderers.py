@@ -0,0 +1,57 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed, the bytes are the ones of DRF's JSONRenderer
+
+    Types orjson does not know natively (Decimal, timedelta, lazy translations, querysets, ...) go
+    through DRF's JSONEncoder.default, and DRF's own rendering is used without orjson, for indented
+    output (`Accept: application/json; indent=4`), with non default UNICODE_JSON / COMPACT_JSON settings
+    and for the values orjson rejects (e.g. integers over 64 bits).
+    """
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z if orjson is not None else 0
+    # integer keys (e.g. assignment results by user id) are written as strings like json.dumps does,
+    # the option slows every dict down so it is only used when orjson rejected the data without it
+    ORJSON_NON_STR_KEYS_OPTIONS = ORJSON_OPTIONS | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    # DRF escapes these for embedding in JavaScript, orjson writes them as UTF-8
+    LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact \
+                or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = self._dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for character, escaped in self.LINE_SEPARATORS:
+            if character in ret:
+                ret = ret.replace(character, escaped)
+        return ret
+
+    def _dumps(self, data):
+        try:
+            return orjson.dumps(data, default=self._encoder.default, option=self.ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return orjson.dumps(data, default=self._encoder.default, option=self.ORJSON_NON_STR_KEYS_OPTIONS)
+
+
+def get_json_renderer():
+    """
+    The JSON renderer of REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'], for the responses built outside of DRF views
+    """
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if renderer_class.format == 'json':
+            return renderer_class()
+    return JSONRenderer()
@@ -0,0 +1,52 @@
+"""
+Fixtures shared by the endpoint tests of the apps
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.users.managers.token_manager import TokenService
+from apps.users.models import User
+
+TEST_PASSWORD = 'password'
+
+
+def create_test_user(name, **extra_fields):
+    """
+    User `<name>@example.com` with the password TEST_PASSWORD
+    """
+    return User.objects.create_user(email=f'{name}@example.com', password=TEST_PASSWORD, name=name, **extra_fields)
+
+
+def authenticated_client(user, token=False):
+    """
+    APIClient of the user, with an access token in the Authorization header when `token` (the request goes
+    through CachedJWTAuthentication), otherwise with force_authenticate
+    """
+    client = APIClient()
+    if token:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenService.issue_tokens(user).access_token}')
+    else:
+        client.force_authenticate(user)
+    return client
+
+
+class APITestCase(TestCase):
+    """
+    Base of the endpoint tests: `cls.user` (owner@example.com) and `self.client` authenticated as it,
+    the task listing and user state caches are emptied before every test
+    Set `token_authentication` to authenticate the clients with a real JWT.
+    """
+    token_authentication = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_test_user('owner')
+
+    def setUp(self):
+        cache.clear()
+        TokenService.cache.clear()
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        return authenticated_client(user, token=self.token_authentication)
@@ -1,3 +1,494 @@
-from django.test import TestCase
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from prometheus_client import REGISTRY
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.jobs.models import Job
+from apps.tasks.manager.task_manager import TaskService
+from apps.tasks.models import Task, TaskAssignment
+from apps.tasks.serializer import (
+    FastGetTaskSerializer, FastTaskAssignmentSerializer, GetTaskSerializer, TaskAssignmentSerializer
+)
+from apps.users.managers.token_manager import TokenService
+from apps.users.models import User
+from apps.users.serializer import FastGetUserSerializer, GetUserSerializer
+from apps.utils import metrics as prometheus_metrics
+from apps.utils.db_router import ReplicaRouter, read_from_primary, request_routing, set_request_user
+from apps.utils.middleware import ReplicaRoutingMiddleware
+from apps.utils.renderers import FastJSONRenderer
+from apps.utils.serializer import FastSerializer
+from apps.utils.testing import APITestCase, authenticated_client, create_test_user
+from apps.utils.utils import CustomAPIResponseMixin
+
+
+class PerformanceMiddlewareTest(APITestCase):
+    """
+    Per-request instrumentation: Server-Timing header, structured log line and slow queries
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+    token_authentication = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        TaskService.create_task('task', '', [cls.user])
+
+    def _get(self):
+        # the middleware reads its settings when the client loads it, on its first request
+        return self.client_for(self.user).get(self.USER_TASK_URL)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1, SLOW_QUERY_THRESHOLD_MS=10 ** 6)
+    def test_sampled_request_metrics(self):
+        with self.assertLogs('apps.performance', 'INFO') as logs:
+            response = self._get()
+        self.assertIn('serialization;dur=', response['Server-Timing'])
+        self.assertIn('cache;desc="0 hits 1 misses"', response['Server-Timing'])
+
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'task-user-task')
+        self.assertEqual(line['status'], 200)
+        # token user state, etag aggregate, tasks, prefetched assignments
+        self.assertEqual(line['db_queries'], 4)
+        self.assertEqual((line['cache_hits'], line['cache_misses']), (0, 1))
+        self.assertEqual(line['response_size'], len(response.content))
+        self.assertGreater(line['serialization_ms'], 0)
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0, SLOW_QUERY_THRESHOLD_MS=10 ** 6)
+    def test_unsampled_request(self):
+        with self.assertNoLogs('apps.performance', 'INFO'):
+            response = self._get()
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0, SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_query_logged_with_call_site(self):
+        with self.assertLogs('apps.performance.slow_query', 'WARNING') as logs:
+            self._get()
+        queries = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual(len(queries), 4)
+        self.assertIn('tasks_taskassignment', queries[-1]['sql'])
+        self.assertTrue(all(query['call_site'].startswith('apps/') for query in queries))
+        self.assertIn('apps/tasks/manager/task_manager.py', queries[-1]['call_site'])
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1, SLOW_QUERY_THRESHOLD_MS=10 ** 6)
+    async def test_async_view_holds_no_thread(self):
+        access = TokenService.issue_tokens(self.user).access_token
+        # a sync-only middleware would run the rest of the request through async_to_sync, in a blocked thread
+        with mock.patch('django.core.handlers.base.async_to_sync', wraps=async_to_sync) as adapted:
+            with self.assertLogs('apps.performance', 'INFO') as logs:
+                response = await AsyncClient().get(
+                    '/api/v1/task/async/user-task/', headers={'Authorization': f'Bearer {access}'}
+                )
+        self.assertEqual(response.status_code, 200)
+        adapted.assert_not_called()
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'task-async-user-task')
+        # token user state, tasks, prefetched assignments: run by the async ORM in threads, counted too
+        self.assertEqual(line['db_queries'], 3)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    async def test_async_request_metrics_by_route(self):
+        route = 'task-async-user-task'
+        labels = {'route': route, 'method': 'GET'}
+        requests_before = REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) or 0
+        access = TokenService.issue_tokens(self.user).access_token
+        with mock.patch.object(prometheus_metrics, 'child', wraps=prometheus_metrics.child) as child:
+            response = await AsyncClient().get(
+                '/api/v1/task/async/user-task/', headers={'Authorization': f'Bearer {access}'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(REGISTRY.get_sample_value('http_request_duration_seconds_count', labels), requests_before + 1)
+        # counted in flight under its route while it ran
+        in_flight = [call for call in child.call_args_list if call.args[0] is prometheus_metrics.REQUESTS_IN_FLIGHT]
+        self.assertEqual([call.args[1] for call in in_flight], [route, route])
+        self.assertEqual(REGISTRY.get_sample_value('http_requests_in_flight', {'route': route}), 0)
+
+
+class MetricsTest(APITestCase):
+    """
+    Prometheus metrics labelled by route, and their aggregation over worker processes
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    def _sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_and_task_service_operations_by_route(self):
+        requests_before = self._sample(
+            'http_request_duration_seconds_count', route='task-assign-task', method='POST'
+        )
+        assigned_before = self._sample('task_service_operations_total', operation='assign', outcome='assigned')
+
+        task = TaskService.create_task('task', '')
+        response = self.client.post(
+            '/api/v1/task/assign-task/', {'task': task.id, 'assigned_users': [self.user.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self._sample('http_request_duration_seconds_count', route='task-assign-task', method='POST'),
+            requests_before + 1
+        )
+        self.assertEqual(
+            self._sample('task_service_operations_total', operation='assign', outcome='assigned'),
+            assigned_before + 1
+        )
+        self.assertEqual(self._sample('http_requests_in_flight', route='task-assign-task'), 0)
+
+        body = APIClient().get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="POST",route="task-assign-task"}', body)
+        self.assertIn('db_queries_total{database="default",route="task-assign-task"}', body)
+
+    def test_unmatched_routes_share_a_label(self):
+        APIClient().get('/no/such/path/1')
+        APIClient().get('/no/such/path/2')
+        self.assertGreaterEqual(
+            self._sample('http_requests_total', route='unmatched', method='GET', status='404'), 2
+        )
+
+    def test_multiprocess_aggregation(self):
+        worker = (
+            'from apps.utils import metrics; '
+            'metrics.record_task_operation("create_task", count=3); '
+            'metrics.REQUEST_LATENCY.labels("task-user-task", "GET").observe(0.02)'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', worker], env=env, check=True)
+            scrape = subprocess.run(
+                [sys.executable, '-c', 'from apps.utils import metrics; print(metrics.export()[0].decode())'],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+        self.assertIn('task_service_operations_total{operation="create_task",outcome="ok"} 6.0', scrape)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="task-user-task"} 2.0', scrape)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PERFORMANCE_SAMPLE_RATE=0)
+class BenchmarkApiCommandTest(TestCase):
+    """
+    benchmark_api seeds, replays the request mix through the test client and writes comparable results
+    """
+
+    def test_results_file_and_comparison(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'benchmark_api', seed_users=5, seed_tasks=10, requests=40, output=output, stdout=io.StringIO()
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+            self.assertEqual((results['meta']['users'], results['meta']['tasks']), (5, 10))
+            self.assertEqual(sum(stats['requests'] for stats in results['endpoints'].values()), 40)
+            user_task = results['endpoints']['user-task']
+            self.assertEqual(sum(stats['errors'] for stats in results['endpoints'].values()), 0)
+            self.assertTrue({'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'} <= set(user_task))
+            self.assertGreater(user_task['mean_queries'], 0)
+
+            # a baseline much faster than anything reachable is a regression
+            for stats in results['endpoints'].values():
+                stats['p95_ms'] = 0.001
+            with open(output, 'w') as results_file:
+                json.dump(results, results_file)
+            with self.assertRaises(CommandError):
+                call_command('benchmark_api', requests=10, compare=output, stdout=io.StringIO())
+
+
+class FastSerializerTest(APITestCase):
+    """
+    The fast path renders exactly the JSON of the DRF serializers it replaces
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_user = create_test_user('other', mobile='9876543210')
+        for index in range(3):
+            TaskService.create_task(f'task {index}', f'description {index}', [cls.user, cls.other_user])
+        TaskService.transition(cls.user.id, [{
+            'assignment': TaskAssignment.objects.filter(user=cls.user).first().id,
+            'from_status': 'pending', 'to_status': 'completed',
+        }])
+
+    def assertSameJSON(self, drf_data, fast_data):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(drf_data), renderer.render(fast_data))
+
+    def test_user_task_listing(self):
+        tasks = list(TaskService.get_user_tasks(self.user.id))
+        for context in ({'user_id': self.user.id}, {}):
+            self.assertSameJSON(
+                GetTaskSerializer(tasks, context=context, many=True).data, FastGetTaskSerializer.many(tasks, context)
+            )
+        self.assertSameJSON(
+            GetTaskSerializer(tasks[0], context={'user_id': self.user.id}).data,
+            FastGetTaskSerializer.to_representation(tasks[0], {'user_id': self.user.id})
+        )
+
+    def test_instances_and_values_rows(self):
+        users = User.objects.order_by('id')
+        drf_users = GetUserSerializer(users, many=True).data
+        self.assertSameJSON(drf_users, FastGetUserSerializer.many(users))
+        self.assertSameJSON(drf_users, FastGetUserSerializer.many(users.values(*FastGetUserSerializer.values_fields())))
+
+        assignments = TaskAssignment.objects.select_related('user').order_by('id')
+        drf_assignments = TaskAssignmentSerializer(assignments, many=True).data
+        self.assertSameJSON(drf_assignments, FastTaskAssignmentSerializer.many(assignments))
+        values_fields = FastTaskAssignmentSerializer.values_fields()
+        self.assertEqual(values_fields, ['user', 'user__name', 'is_primary_assignee', 'status'])
+        self.assertSameJSON(drf_assignments, FastTaskAssignmentSerializer.many(assignments.values(*values_fields)))
+
+    def test_method_fields_must_be_overridden(self):
+        class IncompleteSerializer(FastSerializer):
+            serializer_class = GetTaskSerializer
+
+        with self.assertRaises(ImproperlyConfigured):
+            IncompleteSerializer.many(TaskService.get_user_tasks(self.user.id))
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_serializers', rows=50, repeat=1, stdout=out)
+        self.assertIn('GetTaskSerializer', out.getvalue())
+
+
+class ResponseRenderingTest(APITestCase):
+    """
+    Single response envelope with the real status code, legacy envelope behind the flag, orjson rendering
+    """
+    TASK_URL = '/api/v1/task/'
+
+    def test_fast_renderer_writes_the_bytes_of_drf(self):
+        data = {
+            'utc': timezone.now(),
+            'naive': datetime(2026, 1, 2, 3, 4, 5),
+            'offset': datetime(2026, 1, 2, 3, 4, 5, 123, tzinfo=dt_timezone(timedelta(hours=5, minutes=30))),
+            'day': timezone.now().date(),
+            'decimal': Decimal('1.50'),
+            'duration': timedelta(hours=1, microseconds=5),
+            'uuid': uuid.uuid4(),
+            'lazy': gettext_lazy('Task does not exist'),
+            'error': [ErrorDetail('This field is required.', code='required')],
+            'by_user_id': {4: 'assigned', 7: 'already_assigned'},
+            'text': 'na\u00efve \u2028 \u2029 "quoted" \U0001f600',
+            'numbers': [0, -1, 2 ** 63 - 1, 0.1, 1.5, True, None],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # orjson rejects integers over 64 bits, DRF renders them
+        self.assertEqual(FastJSONRenderer().render({'big': 2 ** 70}), JSONRenderer().render({'big': 2 ** 70}))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2')
+        )
+
+    def test_single_envelope_with_the_status_code(self):
+        response = self.client.post(self.TASK_URL, {'name': 'task'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(response.data), {'status', 'status_code', 'data'})
+        self.assertEqual(response.data['status_code'], 201)
+        self.assertEqual(response.data['data']['name'], 'task')
+        self.assertEqual(json.loads(response.content)['data']['name'], 'task')
+
+    @override_settings(LEGACY_RESPONSE_ENVELOPE=True)
+    def test_legacy_envelope(self):
+        response = self.client.post(self.TASK_URL, {'name': 'task'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status_code'], 201)
+        self.assertEqual(response.data['data']['status'], 'success')
+        self.assertEqual(response.data['data']['data']['name'], 'task')
+
+        async_response = CustomAPIResponseMixin.json_success_response(data={'id': 1}, status_code=201)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(
+            json.loads(async_response.content),
+            {'status_code': 201, 'data': {'status': 'success', 'status_code': 201, 'data': {'id': 1}}}
+        )
+        # failures always had a single envelope
+        response = self.client.post(self.TASK_URL, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['status'], 'failure')
+
+    def test_async_views_render_like_the_drf_views(self):
+        TaskService.create_task('task', '', [self.user])
+        drf_response = self.client.get('/api/v1/task/user-task/')
+        async_response = authenticated_client(self.user, token=True).get('/api/v1/task/async/user-task/')
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.content, drf_response.content)
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_rendering', tasks=20, repeat=1, stdout=out)
+        self.assertIn('single envelope', out.getvalue())
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_1', 'replica_2'], DB_REPLICA_SELECTION='round_robin', DB_READ_YOUR_WRITES_WINDOW=5
+)
+class ReplicaRouterTest(SimpleTestCase):
+    """
+    Routing decisions of ReplicaRouter, no database involved
+    """
+    REPLICAS = {'replica_1', 'replica_2'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        cache.clear()
+
+    def test_round_robin(self):
+        first, second = self.router.db_for_read(Task), self.router.db_for_read(Task)
+        self.assertEqual({first, second}, self.REPLICAS)
+        # a request keeps the replica of its first read
+        with request_routing():
+            self.assertEqual(len({self.router.db_for_read(Task) for _ in range(4)}), 1)
+
+    @override_settings(DB_REPLICA_SELECTION='least_connections')
+    def test_least_connections(self):
+        busy = self.router.db_for_read(Task)
+
+        def read_while_busy(*args):
+            return [self.router.db_for_read(Task) for _ in range(3)]
+
+        context = {'connection': SimpleNamespace(alias=busy)}
+        selected = ReplicaRouter._execute(read_while_busy, 'SELECT 1', None, False, context)
+        self.assertEqual(set(selected), self.REPLICAS - {busy})
+        self.assertEqual(ReplicaRouter._in_flight[busy], 0)
+
+    def test_write_pins_the_user_to_the_primary(self):
+        with request_routing():
+            set_request_user(1)
+            self.assertIn(self.router.db_for_read(Task), self.REPLICAS)
+            self.assertEqual(self.router.db_for_write(Task), 'default')
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+        with request_routing():
+            set_request_user(1)
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        with request_routing():
+            set_request_user(2)
+            self.assertIn(self.router.db_for_read(Task), self.REPLICAS)
+
+    def test_reads_kept_on_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Job), 'default')
+        with read_from_primary():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        task = Task(name='task')
+        task._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(TaskAssignment, instance=task), 'default')
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_middleware_scopes_async_requests(self):
+        async def get_response(request):
+            return {self.router.db_for_read(Task) for _ in range(4)}
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        # one replica for the whole request, instead of one per read
+        self.assertEqual(len(async_to_sync(middleware)(None)), 1)
+
+    @override_settings(DB_REPLICA_SELECTION='random')
+    def test_unknown_selection(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.router.db_for_read(Task)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'sync_replicas copies SQLite databases')
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReadReplicaTest(TransactionTestCase):
+    """
+    Reads served by a SQLite replica updated by sync_replicas, lagging behind the primary in between
+    """
+    USER_TASK_URL = '/api/v1/task/user-task/'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # registered once the test case is set up, the test runner only knows the configured databases
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        replica_path = os.path.join(cls.replica_dir.name, 'replica.sqlite3')
+        connections.settings['replica_1'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica_1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': replica_path},
+        })['replica_1']
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del connections.settings['replica_1']
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        TokenService.cache.clear()
+        self.owner = create_test_user('owner')
+        self.other = create_test_user('other')
+        TaskService.create_task('synced', '', [self.owner, self.other])
+        self._sync()
+
+    def _sync(self):
+        call_command('sync_replicas', stdout=io.StringIO())
+        # the pins of the writes above are over, and so are the cached listings
+        cache.clear()
+
+    def _read_task_names(self, client):
+        """
+        names of the tasks listed for the user, and whether the replica served them
+        """
+        queries = []
+        with connections['replica_1'].execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+            response = client.get(self.USER_TASK_URL)
+        self.assertEqual(response.status_code, 200)
+        return {task['name'] for task in response.data['data']}, bool(queries)
+
+    def test_replica_lags_until_synced(self):
+        TaskService.create_task('written', '', [self.owner])
+        cache.clear()
+        client = authenticated_client(self.owner, token=True)
+        self.assertEqual(self._read_task_names(client), ({'synced'}, True))
+        self._sync()
+        self.assertEqual(self._read_task_names(client), ({'synced', 'written'}, True))
+
+    def test_read_your_writes(self):
+        owner, other = authenticated_client(self.owner, token=True), authenticated_client(self.other, token=True)
+        response = owner.post(
+            '/api/v1/task/', {'name': 'written', 'assigned_users': [self.owner.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._read_task_names(owner), ({'synced', 'written'}, False))
+        # not involved in the write, reads from the replica
+        self.assertEqual(self._read_task_names(other), ({'synced'}, True))
+
+        response = owner.post('/api/v1/task/', {'name': 'assigned', 'assigned_users': [self.other.id]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # the listing of the assignee changed, it is rebuilt from the primary
+        self.assertEqual(self._read_task_names(other), ({'synced', 'assigned'}, False))
+
+        cache.clear()
+        self.assertEqual(self._read_task_names(owner), ({'synced'}, True))
+
+    def test_login_after_signup(self):
+        client = APIClient()
+        payload = {'email': 'new@example.com', 'name': 'new', 'password': 'password'}
+        self.assertEqual(client.post('/api/v1/auth/signup/', payload, format='json').status_code, 201)
+        response = client.post('/api/v1/auth/token/', {'email': 'new@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.using('replica_1').filter(email='new@example.com').exists())
@@ -1,30 +1,68 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from rest_framework.response import Response
 from rest_framework import status, mixins
 from rest_framework.viewsets import GenericViewSet
 
+from apps.utils.renderers import get_json_renderer
+
 
 class CustomResponse(Response):
     """
     Custom Response class to standardize the format of responses.
 
-    This subclass of the `Response` class modifies the default response format to include:
-    - `status_code`: The HTTP status code.
-    - `data`: The actual data returned in the response.
+    The body built by `CustomAPIResponseMixin` (`status`, `status_code`, `message`, `data`, ...) is sent
+    as is, with its `status_code` as the HTTP status.
 
-    It ensures that every response from the API follows a consistent format, regardless of success or failure.
+    With settings.LEGACY_RESPONSE_ENVELOPE the body is wrapped once more in `{'status_code', 'data'}`
+    and sent with a 200, the wire format of the clients predating the single envelope.
     """
 
     def __init__(self, data=None, status_code=None, **kwargs):
         """
         Initializes the custom response with a standardized structure.
 
-        :param data: The main data to return in the response.
+        :param data: The response body.
         :param status_code: The HTTP status code for the response (e.g., 200 for success).
         :param kwargs: Additional keyword arguments passed to the base `Response` class.
         """
-        # Modify the data structure to include status_code and data
-        data = {'status_code': status_code, 'data': data}
-        # Call the parent constructor with the formatted data
+        if settings.LEGACY_RESPONSE_ENVELOPE:
+            data = {'status_code': status_code, 'data': data}
+        else:
+            kwargs.setdefault('status', status_code)
+        super().__init__(data, **kwargs)
+
+
+class RenderedJsonResponse(HttpResponse):
+    """
+    Plain Django response rendered by the JSON renderer of the DRF views, for the async views which
+    cannot return DRF responses: same bytes, and the same renderer (see REST_FRAMEWORK settings).
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(get_json_renderer().render(data), **kwargs)
+
+
+class CustomJsonResponse(RenderedJsonResponse):
+    """
+    Plain Django counterpart of `CustomResponse`, including its legacy envelope
+    """
+
+    def __init__(self, data=None, status_code=None, **kwargs):
+        """
+        :param data: The response body.
+        :param status_code: The HTTP status code for the response (e.g., 200 for success).
+        :param kwargs: Additional keyword arguments passed to `HttpResponse`.
+        """
+        if settings.LEGACY_RESPONSE_ENVELOPE:
+            data = {'status_code': status_code, 'data': data}
+        else:
+            kwargs.setdefault('status', status_code)
         super().__init__(data, **kwargs)
 
 
@@ -45,22 +83,25 @@ class CustomAPIResponseMixin:
     __FAILURE = "failure"
 
     @classmethod
-    def success_response(cls, data=None, message=None, status_code=status.HTTP_200_OK):
+    def get_success_data(cls, data=None, message=None, status_code=status.HTTP_200_OK, cursors=None):
         """
-        Returns a standardized success response.
+        Builds the body of a standardized success response.
 
-        The response includes the following structure:
+        The body has the following structure:
         {
             "status": "success",
             "status_code": <HTTP status code>,
             "message": <Optional message>,
-            "data": <Optional data>
+            "data": <Optional data>,
+            "next": <Next page cursor, paginated responses only>,
+            "prev": <Previous page cursor, paginated responses only>
         }
 
         :param data: The data to include in the response (optional).
         :param message: A message to include in the response (optional).
         :param status_code: The HTTP status code (default is 200 OK).
-        :return: A custom response object with success status.
+        :param cursors: `{'next': ..., 'prev': ...}` returned by KeysetPagination (optional).
+        :return: The response body as a dict.
         """
         # Construct the response data structure
         response_data = {
@@ -75,15 +116,18 @@ class CustomAPIResponseMixin:
         if data is not None:
             response_data['data'] = data
 
-        # Return a CustomResponse object with the formatted data
-        return CustomResponse(data=response_data, status_code=status_code)
+        if cursors is not None:
+            response_data['next'] = cursors.get('next')
+            response_data['prev'] = cursors.get('prev')
+
+        return response_data
 
     @classmethod
-    def failure_response(cls, data=None, message=None, status_code=status.HTTP_400_BAD_REQUEST):
+    def get_failure_data(cls, data=None, message=None, status_code=status.HTTP_400_BAD_REQUEST):
         """
-        Returns a standardized failure response.
+        Builds the body of a standardized failure response.
 
-        The response includes the following structure:
+        The body has the following structure:
         {
             "status": "failure",
             "status_code": <HTTP status code>,
@@ -94,7 +138,7 @@ class CustomAPIResponseMixin:
         :param data: The data to include in the response (optional).
         :param message: A message to include in the response (optional).
         :param status_code: The HTTP status code (default is 400 Bad Request).
-        :return: A Response object with failure status.
+        :return: The response body as a dict.
         """
         # Construct the response data structure for failure
         response_data = {
@@ -109,9 +153,121 @@ class CustomAPIResponseMixin:
         if data is not None:
             response_data["data"] = data
 
+        return response_data
+
+    @classmethod
+    def success_response(cls, data=None, message=None, status_code=status.HTTP_200_OK, cursors=None):
+        """
+        Returns a standardized success response, see `get_success_data` for its structure.
+
+        :return: A custom response object with success status.
+        """
+        response_data = cls.get_success_data(data=data, message=message, status_code=status_code, cursors=cursors)
+        # Return a CustomResponse object with the formatted data
+        return CustomResponse(data=response_data, status_code=status_code)
+
+    @classmethod
+    def accepted_response(cls, data=None, message=None):
+        """
+        Returns a standardized success response for work left to a background job.
+
+        The HTTP status is the 202 even with the legacy envelope: clients tell
+        a queued request from a finished one by the status code.
+
+        :return: A custom response object with success status.
+        """
+        response_data = cls.get_success_data(data=data, message=message, status_code=status.HTTP_202_ACCEPTED)
+        return CustomResponse(data=response_data, status_code=status.HTTP_202_ACCEPTED, status=status.HTTP_202_ACCEPTED)
+
+    @classmethod
+    def failure_response(cls, data=None, message=None, status_code=status.HTTP_400_BAD_REQUEST):
+        """
+        Returns a standardized failure response, see `get_failure_data` for its structure.
+
+        :return: A Response object with failure status.
+        """
+        response_data = cls.get_failure_data(data=data, message=message, status_code=status_code)
         # Return a standard Response object with failure data
         return Response(response_data, status=status_code)
 
+    @classmethod
+    def json_success_response(cls, data=None, message=None, status_code=status.HTTP_200_OK, cursors=None):
+        """
+        Same as `success_response` for plain Django (async) views.
+        """
+        response_data = cls.get_success_data(data=data, message=message, status_code=status_code, cursors=cursors)
+        return CustomJsonResponse(data=response_data, status_code=status_code)
+
+    @classmethod
+    def json_failure_response(cls, data=None, message=None, status_code=status.HTTP_400_BAD_REQUEST):
+        """
+        Same as `failure_response` for plain Django (async) views.
+        """
+        response_data = cls.get_failure_data(data=data, message=message, status_code=status_code)
+        return RenderedJsonResponse(response_data, status=status_code)
+
+
+class ConditionalGetMixin:
+    """
+    Mixin that adds strong ETags and `If-None-Match` handling to read endpoints.
+
+    The ETag is derived from an aggregate over the rows the response is built from
+    (row count and latest `updated_at`), so it costs one cheap query and no serialization.
+    Views opt in by returning that queryset from `get_etag_queryset` and calling
+    `check_not_modified` before doing any work:
+
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
+
+    The ETag header is then added to the successful response by `finalize_response`.
+    """
+
+    # Fields of the ETag queryset whose latest value changes whenever the response does
+    etag_timestamp_fields = ('updated_at',)
+
+    def get_etag_queryset(self):
+        """
+        Return the queryset the current response depends on, or None to disable ETags.
+        """
+        return None
+
+    def get_etag(self, request):
+        """
+        Compute a strong ETag for the current request, or None when the view does not support it.
+        """
+        queryset = self.get_etag_queryset()
+        if queryset is None:
+            return None
+        aggregates = {f'last_{index}': Max(field) for index, field in enumerate(self.etag_timestamp_fields)}
+        state = queryset.aggregate(row_count=Count('pk'), **aggregates)
+        # the same rows render differently per page, filter, etc.
+        state['path'] = request.get_full_path()
+        digest = hashlib.sha1(repr(sorted(state.items())).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def check_not_modified(self, request):
+        """
+        Return a 304 response when the client already holds the current representation, otherwise None.
+        """
+        self.etag = self.get_etag(request)
+        if self.etag is None:
+            return None
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (self.etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': self.etag})
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Attach the ETag computed by `check_not_modified` to successful responses.
+        """
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
 
 class ModelViewSet(mixins.CreateModelMixin,
                    GenericViewSet):
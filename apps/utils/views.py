@@ -1,3 +1,12 @@
-from django.shortcuts import render
+from django.http import HttpResponse
 
-# Create your views here.
+from apps.utils import metrics as prometheus_metrics
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint, text exposition format
+    Expose it to the monitoring network only (e.g. deny /metrics at the reverse proxy)
+    """
+    body, content_type = prometheus_metrics.export()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,60 @@
+"""
+Gunicorn configuration of the production runtime profile
+
+    gunicorn -c gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS=sync (default) serves task_management.wsgi, while
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker serves task_management.asgi so the
+async read path (/api/v1/task/async/) runs on an event loop.
+
+Workers write their Prometheus metrics to PROMETHEUS_MULTIPROC_DIR, emptied at startup,
+so /metrics reports the sum over every worker whichever one serves the scrape.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+UVICORN_WORKER = 'uvicorn.workers.UvicornWorker'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+wsgi_app = 'task_management.asgi:application' if worker_class == UVICORN_WORKER else 'task_management.wsgi:application'
+
+# sync workers block on I/O, so run more of them than cores; an event loop worker per core is enough
+if worker_class == UVICORN_WORKER:
+    default_workers = multiprocessing.cpu_count()
+else:
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# recycle workers now and then so a slow leak cannot grow forever
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+# set before the workers import prometheus_client
+prometheus_multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'task_management_metrics')
+)
+
+
+def on_starting(server):
+    """
+    Drop the metric files of a previous run
+    """
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir)
+
+
+def child_exit(server, worker):
+    """
+    Stop reporting the live gauges (in-flight requests) of a dead worker
+    """
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
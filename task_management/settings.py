@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,10 +44,14 @@ INSTALLED_APPS = [
     'drf_yasg',
     'apps.users',
     'apps.utils',
-    'apps.tasks'
+    'apps.tasks',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
+    # first, so the queries of every other middleware are counted
+    'apps.utils.middleware.PerformanceMiddleware',
+    'apps.utils.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,9 +93,73 @@ DATABASES = {
         'PASSWORD': os.environ.get("DB_PASSWORD"),
         'HOST': os.environ.get("DB_HOST"),
         'PORT': os.environ.get("DB_PORT"),
+        # keep connections open across requests, checked before reuse so a dropped one is replaced
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DB_POOLER=pgbouncer when DB_HOST/DB_PORT point at PgBouncer in transaction pooling mode.
+# Server-side cursors do not survive a transaction-pooled connection, so they are turned off.
+DB_POOLER = os.environ.get('DB_POOLER')
+if DB_POOLER == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas of `default`, DB_REPLICA_HOSTS=host[:port],... with the credentials of the primary.
+# apps.utils.db_router.ReplicaRouter sends the task and user reads to them, see its module docstring.
+# DB_REPLICA_SELECTION: round_robin or least_connections (fewest queries in flight in the process).
+# After a user writes, their reads stay on the primary for DB_READ_YOUR_WRITES_WINDOW seconds,
+# longer than the replication lag.
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica_host.strip().partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # tests read and write the test database of the primary through the replica aliases
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_ROUTERS = ['apps.utils.db_router.ReplicaRouter']
+DB_REPLICA_SELECTION = os.environ.get('DB_REPLICA_SELECTION', 'round_robin')
+DB_READ_YOUR_WRITES_WINDOW = int(os.environ.get('DB_READ_YOUR_WRITES_WINDOW', 5))
+
+
+# Bulk user import (apps.users.managers.import_manager.UserImportService) from the API, staff only,
+# uploads of more than USER_IMPORT_MAX_ROWS rows are refused;
+# the import_users command takes its own --batch-size and --processes and has no row limit
+USER_IMPORT_BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', 500))
+USER_IMPORT_PROCESSES = int(os.environ.get('USER_IMPORT_PROCESSES', 1))
+USER_IMPORT_MAX_ROWS = int(os.environ.get('USER_IMPORT_MAX_ROWS', 10000))
+
+# Cache
+# Redis when REDIS_URL is set, otherwise an in-process cache so local runs and tests need no Redis
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Lifetime in seconds of a cached user task page (apps.tasks.manager.cache_manager.UserTaskCache)
+USER_TASK_CACHE_TIMEOUT = int(os.environ.get('USER_TASK_CACHE_TIMEOUT', 300))
+
+# Keyset pagination (apps.utils.pagination.KeysetPagination)
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
 
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -118,6 +188,93 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER_PROFILE picks the hasher used for new passwords, 'pbkdf2' (default) or 'argon2'
+# (needs argon2-cffi). Hashes made by the other hashers of the list are still accepted and upgraded
+# to the preferred one on the next successful login.
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+
+PASSWORD_HASHERS = [
+    'apps.users.hashers.TunedPBKDF2PasswordHasher',
+    'apps.users.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER_PROFILE == 'argon2':
+    PASSWORD_HASHERS[0], PASSWORD_HASHERS[1] = PASSWORD_HASHERS[1], PASSWORD_HASHERS[0]
+
+
+# Authentication: JWT bearer tokens (POST /api/v1/auth/token/) resolved from their claims,
+# see apps.users.authentication.CachedJWTAuthentication
+# Rendering: orjson when installed, same bytes as DRF's JSONRenderer (also used by the async views)
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ('apps.users.authentication.CachedJWTAuthentication',),
+    'DEFAULT_RENDERER_CLASSES': (
+        'apps.utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+# Responses carry a single {"status", "status_code", "data", ...} envelope sent with its status code.
+# LEGACY_RESPONSE_ENVELOPE=1 restores the former wire format: that envelope wrapped again
+# in {"status_code", "data"}, sent with a 200
+LEGACY_RESPONSE_ENVELOPE = os.environ.get('LEGACY_RESPONSE_ENVELOPE', '0').lower() in ('1', 'true', 'yes')
+SIMPLE_JWT = {
+    'USER_ID_CLAIM': 'id',
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', 7))),
+    'SIGNING_KEY': os.environ.get('JWT_SIGNING_KEY', SECRET_KEY),
+    'TOKEN_USER_CLASS': 'apps.users.authentication.TokenUser',
+}
+# per-process cache of the users' active / revoked state, a deactivation or revocation
+# reaches the other processes after at most JWT_USER_CACHE_TTL seconds
+JWT_USER_CACHE_SIZE = int(os.environ.get('JWT_USER_CACHE_SIZE', 10000))
+JWT_USER_CACHE_TTL = float(os.environ.get('JWT_USER_CACHE_TTL', 30))
+
+# Background jobs (apps.jobs), run by `python manage.py run_jobs`
+# database: workers poll the jobs table; redis: the table stays the source of truth, and a Redis
+# list (REDIS_URL) wakes the workers up as soon as a job is queued
+JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'database')
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+# seconds before the first retry, doubled at every attempt
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 5))
+# seconds after which a running job whose worker died is run again
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 300))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+
+# Request instrumentation (apps.utils.middleware.PerformanceMiddleware)
+# share of requests getting a Server-Timing header and a log line, from 0 to 1
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', 0.1))
+# queries slower than this are logged with their SQL and call site, whatever the sampling
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+
+# silent under `manage.py test`, the request lines would bury the test output (tests read them with assertLogs)
+PERFORMANCE_LOG_HANDLER = 'null' if sys.argv[1:2] == ['test'] else 'console'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'null': {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'apps.performance': {
+            'handlers': [PERFORMANCE_LOG_HANDLER],
+            'level': os.environ.get('PERFORMANCE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -23,6 +23,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 
 from apps.utils.constant import API_VERSION, API_BASE_VERSION
+from apps.utils.views import metrics
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -39,7 +40,9 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path(API_BASE_VERSION, include('apps.users.urls')),
     path(API_BASE_VERSION, include('apps.tasks.urls')),
+    path(API_BASE_VERSION, include('apps.jobs.urls')),
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file